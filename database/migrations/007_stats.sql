@@ -0,0 +1,65 @@
+-- Migration 007: Add trigger-maintained document and blob totals
+
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'document_count', COUNT(*) FROM document WHERE is_deleted = 0;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'document_size', COALESCE(SUM(file_size), 0) FROM document WHERE is_deleted = 0;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'document_count_all', COUNT(*) FROM document;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'document_size_all', COALESCE(SUM(file_size), 0) FROM document;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'blob_count', COUNT(*) FROM file_blob;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'blob_size', COALESCE(SUM(file_size), 0) FROM file_blob;
+
+CREATE TRIGGER IF NOT EXISTS document_stats_ai AFTER INSERT ON document BEGIN
+    UPDATE stats SET value = value + CASE key
+        WHEN 'document_count' THEN new.is_deleted = 0
+        WHEN 'document_size' THEN IIF(new.is_deleted = 0, COALESCE(new.file_size, 0), 0)
+        WHEN 'document_count_all' THEN 1
+        WHEN 'document_size_all' THEN COALESCE(new.file_size, 0)
+    END
+    WHERE key IN ('document_count', 'document_size', 'document_count_all', 'document_size_all');
+END;
+
+CREATE TRIGGER IF NOT EXISTS document_stats_ad AFTER DELETE ON document BEGIN
+    UPDATE stats SET value = value - CASE key
+        WHEN 'document_count' THEN old.is_deleted = 0
+        WHEN 'document_size' THEN IIF(old.is_deleted = 0, COALESCE(old.file_size, 0), 0)
+        WHEN 'document_count_all' THEN 1
+        WHEN 'document_size_all' THEN COALESCE(old.file_size, 0)
+    END
+    WHERE key IN ('document_count', 'document_size', 'document_count_all', 'document_size_all');
+END;
+
+CREATE TRIGGER IF NOT EXISTS document_stats_au AFTER UPDATE OF is_deleted, file_size ON document BEGIN
+    UPDATE stats SET value = value + CASE key
+        WHEN 'document_count' THEN (new.is_deleted = 0) - (old.is_deleted = 0)
+        WHEN 'document_size' THEN IIF(new.is_deleted = 0, COALESCE(new.file_size, 0), 0)
+                                - IIF(old.is_deleted = 0, COALESCE(old.file_size, 0), 0)
+        WHEN 'document_size_all' THEN COALESCE(new.file_size, 0) - COALESCE(old.file_size, 0)
+    END
+    WHERE key IN ('document_count', 'document_size', 'document_size_all');
+END;
+
+CREATE TRIGGER IF NOT EXISTS file_blob_stats_ai AFTER INSERT ON file_blob BEGIN
+    UPDATE stats SET value = value + IIF(key = 'blob_count', 1, new.file_size)
+    WHERE key IN ('blob_count', 'blob_size');
+END;
+
+CREATE TRIGGER IF NOT EXISTS file_blob_stats_ad AFTER DELETE ON file_blob BEGIN
+    UPDATE stats SET value = value - IIF(key = 'blob_count', 1, old.file_size)
+    WHERE key IN ('blob_count', 'blob_size');
+END;
+
+CREATE TRIGGER IF NOT EXISTS file_blob_stats_au AFTER UPDATE OF file_size ON file_blob BEGIN
+    UPDATE stats SET value = value + new.file_size - old.file_size WHERE key = 'blob_size';
+END;
+
+UPDATE db_metadata SET value = '7' WHERE key = 'schema_version';
@@ -0,0 +1,20 @@
+-- Migration 008: Composite indexes for per-drive listings and per-run event queries
+-- Documents by drive are filtered on is_deleted and ordered by path; events by
+-- run are ordered by logged_at (optionally filtered or grouped by event_type).
+-- The single-column indexes they replace are prefixes of the new ones, and
+-- idx_file_blob_hash duplicates the automatic index on the UNIQUE hash column.
+
+CREATE INDEX IF NOT EXISTS idx_document_drive_path
+    ON document(sharepoint_drive_id, is_deleted, path);
+DROP INDEX IF EXISTS idx_document_drive_id;
+
+CREATE INDEX IF NOT EXISTS idx_sync_event_run_logged ON sync_event(sync_run_id, logged_at);
+CREATE INDEX IF NOT EXISTS idx_sync_event_run_type
+    ON sync_event(sync_run_id, event_type, logged_at);
+DROP INDEX IF EXISTS idx_sync_event_run;
+
+DROP INDEX IF EXISTS idx_file_blob_hash;
+
+ANALYZE;
+
+UPDATE db_metadata SET value = '8' WHERE key = 'schema_version';
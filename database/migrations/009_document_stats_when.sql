@@ -0,0 +1,19 @@
+-- Migration 009: Fire document_stats_au only when is_deleted or file_size change
+-- Document.update() sets every column, so "UPDATE OF is_deleted, file_size"
+-- alone matched every update (renames, metadata refreshes) and rewrote the
+-- stats rows with a zero delta.
+
+DROP TRIGGER IF EXISTS document_stats_au;
+
+CREATE TRIGGER IF NOT EXISTS document_stats_au AFTER UPDATE OF is_deleted, file_size ON document
+WHEN old.is_deleted IS NOT new.is_deleted OR old.file_size IS NOT new.file_size BEGIN
+    UPDATE stats SET value = value + CASE key
+        WHEN 'document_count' THEN (new.is_deleted = 0) - (old.is_deleted = 0)
+        WHEN 'document_size' THEN IIF(new.is_deleted = 0, COALESCE(new.file_size, 0), 0)
+                                - IIF(old.is_deleted = 0, COALESCE(old.file_size, 0), 0)
+        WHEN 'document_size_all' THEN COALESCE(new.file_size, 0) - COALESCE(old.file_size, 0)
+    END
+    WHERE key IN ('document_count', 'document_size', 'document_size_all');
+END;
+
+UPDATE db_metadata SET value = '9' WHERE key = 'schema_version';
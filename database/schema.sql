@@ -9,7 +9,7 @@ CREATE TABLE IF NOT EXISTS db_metadata (
     value TEXT NOT NULL
 );
 
-INSERT OR IGNORE INTO db_metadata (key, value) VALUES ('schema_version', '6');
+INSERT OR IGNORE INTO db_metadata (key, value) VALUES ('schema_version', '9');
 
 -- Application settings
 CREATE TABLE IF NOT EXISTS app_setting (
@@ -29,8 +29,6 @@ CREATE TABLE IF NOT EXISTS file_blob (
     created_at TEXT NOT NULL
 );
 
-CREATE INDEX IF NOT EXISTS idx_file_blob_hash ON file_blob(sha256_hash);
-
 -- SharePoint documents
 CREATE TABLE IF NOT EXISTS document (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -61,7 +59,8 @@ CREATE TABLE IF NOT EXISTS document (
 );
 
 CREATE INDEX IF NOT EXISTS idx_document_item_id ON document(sharepoint_item_id);
-CREATE INDEX IF NOT EXISTS idx_document_drive_id ON document(sharepoint_drive_id);
+CREATE INDEX IF NOT EXISTS idx_document_drive_path
+    ON document(sharepoint_drive_id, is_deleted, path);
 CREATE INDEX IF NOT EXISTS idx_document_path ON document(path);
 CREATE INDEX IF NOT EXISTS idx_document_name ON document(name);
 CREATE INDEX IF NOT EXISTS idx_document_is_deleted ON document(is_deleted);
@@ -130,7 +129,9 @@ CREATE TABLE IF NOT EXISTS sync_event (
     FOREIGN KEY (file_blob_id) REFERENCES file_blob(id) ON DELETE SET NULL
 );
 
-CREATE INDEX IF NOT EXISTS idx_sync_event_run ON sync_event(sync_run_id);
+CREATE INDEX IF NOT EXISTS idx_sync_event_run_logged ON sync_event(sync_run_id, logged_at);
+CREATE INDEX IF NOT EXISTS idx_sync_event_run_type
+    ON sync_event(sync_run_id, event_type, logged_at);
 CREATE INDEX IF NOT EXISTS idx_sync_event_document ON sync_event(document_id);
 CREATE INDEX IF NOT EXISTS idx_sync_event_type ON sync_event(event_type);
 CREATE INDEX IF NOT EXISTS idx_sync_event_logged ON sync_event(logged_at);
@@ -167,6 +168,71 @@ CREATE INDEX IF NOT EXISTS idx_docmeta_field ON document_metadata(field_name);
 CREATE UNIQUE INDEX IF NOT EXISTS idx_docmeta_doc_field_value
     ON document_metadata(document_id, field_name, field_value);
 
+-- Running document/blob totals, kept current by triggers so dashboard
+-- counts and sizes are a primary-key lookup instead of a table scan
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'document_count', COUNT(*) FROM document WHERE is_deleted = 0;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'document_size', COALESCE(SUM(file_size), 0) FROM document WHERE is_deleted = 0;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'document_count_all', COUNT(*) FROM document;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'document_size_all', COALESCE(SUM(file_size), 0) FROM document;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'blob_count', COUNT(*) FROM file_blob;
+INSERT OR IGNORE INTO stats (key, value)
+    SELECT 'blob_size', COALESCE(SUM(file_size), 0) FROM file_blob;
+
+CREATE TRIGGER IF NOT EXISTS document_stats_ai AFTER INSERT ON document BEGIN
+    UPDATE stats SET value = value + CASE key
+        WHEN 'document_count' THEN new.is_deleted = 0
+        WHEN 'document_size' THEN IIF(new.is_deleted = 0, COALESCE(new.file_size, 0), 0)
+        WHEN 'document_count_all' THEN 1
+        WHEN 'document_size_all' THEN COALESCE(new.file_size, 0)
+    END
+    WHERE key IN ('document_count', 'document_size', 'document_count_all', 'document_size_all');
+END;
+
+CREATE TRIGGER IF NOT EXISTS document_stats_ad AFTER DELETE ON document BEGIN
+    UPDATE stats SET value = value - CASE key
+        WHEN 'document_count' THEN old.is_deleted = 0
+        WHEN 'document_size' THEN IIF(old.is_deleted = 0, COALESCE(old.file_size, 0), 0)
+        WHEN 'document_count_all' THEN 1
+        WHEN 'document_size_all' THEN COALESCE(old.file_size, 0)
+    END
+    WHERE key IN ('document_count', 'document_size', 'document_count_all', 'document_size_all');
+END;
+
+CREATE TRIGGER IF NOT EXISTS document_stats_au AFTER UPDATE OF is_deleted, file_size ON document
+WHEN old.is_deleted IS NOT new.is_deleted OR old.file_size IS NOT new.file_size BEGIN
+    UPDATE stats SET value = value + CASE key
+        WHEN 'document_count' THEN (new.is_deleted = 0) - (old.is_deleted = 0)
+        WHEN 'document_size' THEN IIF(new.is_deleted = 0, COALESCE(new.file_size, 0), 0)
+                                - IIF(old.is_deleted = 0, COALESCE(old.file_size, 0), 0)
+        WHEN 'document_size_all' THEN COALESCE(new.file_size, 0) - COALESCE(old.file_size, 0)
+    END
+    WHERE key IN ('document_count', 'document_size', 'document_size_all');
+END;
+
+CREATE TRIGGER IF NOT EXISTS file_blob_stats_ai AFTER INSERT ON file_blob BEGIN
+    UPDATE stats SET value = value + IIF(key = 'blob_count', 1, new.file_size)
+    WHERE key IN ('blob_count', 'blob_size');
+END;
+
+CREATE TRIGGER IF NOT EXISTS file_blob_stats_ad AFTER DELETE ON file_blob BEGIN
+    UPDATE stats SET value = value - IIF(key = 'blob_count', 1, old.file_size)
+    WHERE key IN ('blob_count', 'blob_size');
+END;
+
+CREATE TRIGGER IF NOT EXISTS file_blob_stats_au AFTER UPDATE OF file_size ON file_blob BEGIN
+    UPDATE stats SET value = value + new.file_size - old.file_size WHERE key = 'blob_size';
+END;
+
 -- Default app settings
 INSERT OR IGNORE INTO app_setting (key, value, description) VALUES
     ('sync_in_progress', '0', 'Flag to prevent concurrent syncs');
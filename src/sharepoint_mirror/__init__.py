@@ -1,25 +1,161 @@
 """SharePoint Mirror - Mirror SharePoint documents locally for vector database ingestion."""
 
-import configparser
+import functools
 import logging
 import os
 import sys
+from collections.abc import Callable
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
 from zoneinfo import ZoneInfo
 
-from flask import Flask, render_template, request
-from werkzeug.middleware.proxy_fix import ProxyFix
-
-from sharepoint_mirror.db import close_db, init_db_command, migrate_db_command
-
-
-def create_app(test_config: dict[str, Any] | None = None) -> Flask:
-    """Application factory for SharePoint Mirror."""
+from flask import Blueprint, Flask, g, render_template, request
+
+from sharepoint_mirror.db import (
+    close_db,
+    get_expected_schema_version,
+    init_db_command,
+    migrate_db_command,
+)
+from sharepoint_mirror.fastini import parse_bool, parse_ini
+
+# (section, option, config key, type, default) for each supported config.ini
+# setting. A default of None means the key gets no fixed default here
+# (DEBUG comes from Flask, the database/blob paths from the instance path).
+CONFIG_MAP: list[tuple[str, str, str, Callable[[str], Any], Any]] = [
+    ("server", "SECRET_KEY", "SECRET_KEY", str, "dev"),
+    ("server", "DEBUG", "DEBUG", parse_bool, None),
+    ("server", "HOST", "HOST", str, "0.0.0.0"),
+    ("server", "PORT", "PORT", int, 5001),
+    ("server", "DEV_HOST", "DEV_HOST", str, "127.0.0.1"),
+    ("server", "DEV_PORT", "DEV_PORT", int, 5001),
+    ("database", "PATH", "DATABASE_PATH", str, None),
+    ("database", "BULK_MODE", "SQLITE_BULK_MODE", parse_bool, True),
+    ("blobs", "DIRECTORY", "BLOBS_DIRECTORY", str, None),
+    ("blobs", "X_SENDFILE", "USE_X_SENDFILE", parse_bool, False),
+    ("blobs", "X_ACCEL_REDIRECT", "BLOBS_X_ACCEL_REDIRECT", str, ""),
+    ("sharepoint", "TENANT_ID", "SHAREPOINT_TENANT_ID", str, ""),
+    ("sharepoint", "CLIENT_ID", "SHAREPOINT_CLIENT_ID", str, ""),
+    ("sharepoint", "CLIENT_SECRET", "SHAREPOINT_CLIENT_SECRET", str, ""),
+    ("sharepoint", "SITE_HOSTNAME", "SHAREPOINT_SITE_HOSTNAME", str, ""),
+    ("sharepoint", "SITE_PATH", "SHAREPOINT_SITE_PATH", str, ""),
+    ("sharepoint", "LIBRARY_NAME", "SHAREPOINT_LIBRARY_NAME", str, ""),
+    ("sync", "INTERVAL", "SYNC_INTERVAL", int, 300),
+    ("sync", "METADATA_REFRESH_INTERVAL", "METADATA_REFRESH_INTERVAL", int, 1800),
+    ("sync", "DOWNLOAD_TIMEOUT", "SYNC_DOWNLOAD_TIMEOUT", int, 300),
+    ("sync", "DOWNLOAD_WORKERS", "SYNC_DOWNLOAD_WORKERS", int, 4),
+    ("sync", "MAX_FILE_SIZE_MB", "SYNC_MAX_FILE_SIZE_MB", int, 100),
+    ("sync", "INCLUDE_EXTENSIONS", "SYNC_INCLUDE_EXTENSIONS", str, ""),
+    ("sync", "EXCLUDE_EXTENSIONS", "SYNC_EXCLUDE_EXTENSIONS", str, ""),
+    ("sync", "INCLUDE_PATHS", "SYNC_INCLUDE_PATHS", str, ""),
+    ("sync", "PATH_PATTERNS", "SYNC_PATH_PATTERNS", str, ""),
+    ("sync", "METADATA_ONLY", "SYNC_METADATA_ONLY", parse_bool, False),
+    ("sync", "VERIFY_QUICKXOR_HASH", "SYNC_VERIFY_QUICKXOR_HASH", parse_bool, False),
+    ("sync", "EXCLUDE_METADATA_FIELDS", "SYNC_EXCLUDE_METADATA_FIELDS", str, ""),
+    ("gatekeeper", "DB_PATH", "GATEKEEPER_DB_PATH", str, ""),
+    ("gatekeeper", "URL", "GATEKEEPER_URL", str, ""),
+    ("gatekeeper", "API_KEY", "GATEKEEPER_API_KEY", str, ""),
+    ("proxy", "X_FORWARDED_FOR", "PROXY_X_FOR", int, 1),
+    ("proxy", "X_FORWARDED_PROTO", "PROXY_X_PROTO", int, 1),
+    ("proxy", "X_FORWARDED_HOST", "PROXY_X_HOST", int, 1),
+    ("proxy", "X_FORWARDED_PREFIX", "PROXY_X_PREFIX", int, 1),
+]
+
+_CONFIG_DEFAULTS = {key: default for _, _, key, _, default in CONFIG_MAP if default is not None}
+
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+
+@functools.lru_cache(maxsize=64)
+def _zoneinfo(name: str) -> ZoneInfo:
+    """Return a (memoized) ZoneInfo for *name*."""
+    return ZoneInfo(name)
+
+
+def _parse_iso_utc(iso_string: str) -> datetime:
+    """Parse an ISO 8601 string (Z suffix accepted), treating a missing offset as UTC."""
+    dt = datetime.fromisoformat(iso_string)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt
+
+
+# Directories already created by this process
+_ENSURED_DIRS: set[str] = set()
+
+
+def _ensure_dir(path: str) -> None:
+    """Create *path* (and parents) once per process."""
+    if path not in _ENSURED_DIRS:
+        Path(path).mkdir(parents=True, exist_ok=True)
+        _ENSURED_DIRS.add(path)
+
+
+def get_user_timezone() -> ZoneInfo:
+    """Get user timezone from X-Timezone header or tz cookie, default UTC.
+
+    Resolved once per request and cached on ``g``.
+    """
+    tz = g.get("_user_tz")
+    if tz is None:
+        tz = _zoneinfo("UTC")
+        tz_name = request.headers.get("X-Timezone") or request.cookies.get("tz")
+        if tz_name:
+            try:
+                tz = _zoneinfo(tz_name)
+            except (KeyError, ValueError):
+                pass
+        g._user_tz = tz
+    return tz
+
+
+# Jinja filters for date formatting
+def _localdate_filter(iso_string: str | None) -> str:
+    """Format ISO date string (date only) in browser timezone."""
+    if not iso_string:
+        return ""
+    try:
+        dt = _parse_iso_utc(iso_string)
+        return dt.astimezone(get_user_timezone()).strftime("%Y-%m-%d")
+    except Exception:
+        return iso_string[:10] if iso_string else ""
+
+
+def _localdatetime_filter(iso_string: str | None) -> str:
+    """Format ISO datetime string (with time) in browser timezone."""
+    if not iso_string:
+        return ""
+    try:
+        dt = _parse_iso_utc(iso_string)
+        return dt.astimezone(get_user_timezone()).strftime("%Y-%m-%d %H:%M %Z")
+    except Exception:
+        return iso_string[:16].replace("T", " ") if iso_string else ""
+
+
+def _filesize_filter(size: int | None) -> str:
+    """Format file size in human-readable format."""
+    if size is None:
+        return ""
+    if size < 1024:
+        return f"{int(size)} B"
+    # Integer log2 / 10 picks the unit exactly (no float log rounding)
+    idx = min((int(size).bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size / (1 << (10 * idx)):.1f} {_SIZE_UNITS[idx]}"
+
+
+def _detect_htmx() -> None:
+    """Record once per request whether it came from HTMX (read as g.is_htmx)."""
+    g.is_htmx = request.headers.get("HX-Request") == "true"
+
+
+@functools.lru_cache(maxsize=4)
+def _resolve_project_root(env_root: str | None, cwd: str) -> Path:
+    """Locate the project root, cached per (SHAREPOINT_MIRROR_ROOT, CWD)."""
     # Project root: use SHAREPOINT_MIRROR_ROOT env var, or CWD, or relative to __file__
-    if "SHAREPOINT_MIRROR_ROOT" in os.environ:
-        project_root = Path(os.environ["SHAREPOINT_MIRROR_ROOT"])
+    if env_root:
+        project_root = Path(env_root)
     else:
         # Check if running from source (src/sharepoint_mirror/__init__.py exists relative to __file__)
         source_root = Path(__file__).parent.parent.parent
@@ -27,7 +163,73 @@ def create_app(test_config: dict[str, Any] | None = None) -> Flask:
             project_root = source_root
         else:
             # Installed as package, use current working directory
-            project_root = Path.cwd()
+            project_root = Path(cwd)
+    return project_root
+
+
+def _read_config_text(project_root: Path) -> str | None:
+    """Read config.ini (instance/ first, then project root), or None if there is none.
+
+    Read on every create_app() so edits to config.ini are always picked up.
+    """
+    # Open directly rather than exists() + open(): one syscall chain per candidate
+    for config_path in (project_root / "instance" / "config.ini", project_root / "config.ini"):
+        try:
+            return config_path.read_bytes().decode("utf-8")
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def _load_ini_config(app: Flask, config_text: str, project_root: Path) -> None:
+    """Apply config.ini settings (see CONFIG_MAP) to app.config."""
+    cfg = parse_ini(config_text)
+    parsed: dict[str, Any] = {}
+    for section, option, key, cast, _ in CONFIG_MAP:
+        raw = cfg.get(section, {}).get(option)
+        if raw is not None:
+            parsed[key] = cast(raw)
+
+    # Relative database/blob paths are resolved against the project root
+    for key in ("DATABASE_PATH", "BLOBS_DIRECTORY"):
+        if key in parsed and not os.path.isabs(parsed[key]):
+            parsed[key] = str(project_root / parsed[key])
+
+    app.config.update(parsed)
+
+
+def _apply_proxy_fix(app: Flask) -> None:
+    """Wrap the WSGI app in ProxyFix using the configured trust levels."""
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    app.wsgi_app = ProxyFix(  # type: ignore[assignment]
+        app.wsgi_app,
+        x_for=app.config.get("PROXY_X_FOR", 1),
+        x_proto=app.config.get("PROXY_X_PROTO", 1),
+        x_host=app.config.get("PROXY_X_HOST", 1),
+        x_prefix=app.config.get("PROXY_X_PREFIX", 1),
+    )
+
+
+# Blueprint singletons, imported on first app creation and reused afterwards
+_BLUEPRINTS: tuple[Blueprint, ...] | None = None
+
+
+def _register_blueprints(app: Flask) -> None:
+    """Import (once per process) and register the web UI blueprints."""
+    global _BLUEPRINTS
+    if _BLUEPRINTS is None:
+        from sharepoint_mirror.blueprints import auth, documents, sql, sync, viewer
+
+        _BLUEPRINTS = (auth.bp, documents.bp, sync.bp, viewer.bp, sql.bp)
+
+    for bp in _BLUEPRINTS:
+        app.register_blueprint(bp)
+
+
+def create_app(test_config: dict[str, Any] | None = None) -> Flask:
+    """Application factory for SharePoint Mirror."""
+    project_root = _resolve_project_root(os.environ.get("SHAREPOINT_MIRROR_ROOT"), os.getcwd())
     instance_path = project_root / "instance"
 
     app = Flask(
@@ -38,149 +240,23 @@ def create_app(test_config: dict[str, Any] | None = None) -> Flask:
 
     # Default configuration
     app.config.from_mapping(
-        SECRET_KEY="dev",
+        _CONFIG_DEFAULTS,
         DATABASE_PATH=str(instance_path / "sharepoint_mirror.sqlite3"),
         BLOBS_DIRECTORY=str(instance_path / "blobs"),
-        HOST="0.0.0.0",
-        PORT=5001,
-        DEV_HOST="127.0.0.1",
-        DEV_PORT=5001,
-        # SharePoint defaults
-        SHAREPOINT_TENANT_ID="",
-        SHAREPOINT_CLIENT_ID="",
-        SHAREPOINT_CLIENT_SECRET="",
-        SHAREPOINT_SITE_HOSTNAME="",
-        SHAREPOINT_SITE_PATH="",
-        SHAREPOINT_LIBRARY_NAME="",
-        # Sync defaults
-        SYNC_INTERVAL=300,
-        METADATA_REFRESH_INTERVAL=1800,
-        SYNC_DOWNLOAD_TIMEOUT=300,
-        SYNC_MAX_FILE_SIZE_MB=100,
-        SYNC_INCLUDE_EXTENSIONS="",
-        SYNC_EXCLUDE_EXTENSIONS="",
-        SYNC_INCLUDE_PATHS="",
-        SYNC_PATH_PATTERNS="",
-        SYNC_METADATA_ONLY=False,
-        SYNC_VERIFY_QUICKXOR_HASH=False,
-        SYNC_EXCLUDE_METADATA_FIELDS="",
     )
 
     if test_config is None:
         # Load config.ini if it exists
-        config_path = instance_path / "config.ini"
-        if not config_path.exists():
-            config_path = project_root / "config.ini"
-
-        if config_path.exists():
-            config = configparser.ConfigParser()
-            config.read(config_path)
-
-            if config.has_section("server"):
-                if config.has_option("server", "SECRET_KEY"):
-                    app.config["SECRET_KEY"] = config.get("server", "SECRET_KEY")
-                if config.has_option("server", "DEBUG"):
-                    app.config["DEBUG"] = config.getboolean("server", "DEBUG")
-                if config.has_option("server", "HOST"):
-                    app.config["HOST"] = config.get("server", "HOST")
-                if config.has_option("server", "PORT"):
-                    app.config["PORT"] = config.getint("server", "PORT")
-                if config.has_option("server", "DEV_HOST"):
-                    app.config["DEV_HOST"] = config.get("server", "DEV_HOST")
-                if config.has_option("server", "DEV_PORT"):
-                    app.config["DEV_PORT"] = config.getint("server", "DEV_PORT")
-
-            if config.has_section("database"):
-                if config.has_option("database", "PATH"):
-                    db_path = config.get("database", "PATH")
-                    if not os.path.isabs(db_path):
-                        db_path = str(project_root / db_path)
-                    app.config["DATABASE_PATH"] = db_path
-
-            if config.has_section("blobs"):
-                if config.has_option("blobs", "DIRECTORY"):
-                    blobs_dir = config.get("blobs", "DIRECTORY")
-                    if not os.path.isabs(blobs_dir):
-                        blobs_dir = str(project_root / blobs_dir)
-                    app.config["BLOBS_DIRECTORY"] = blobs_dir
-
-            if config.has_section("sharepoint"):
-                app.config["SHAREPOINT_TENANT_ID"] = config.get(
-                    "sharepoint", "TENANT_ID", fallback=""
-                )
-                app.config["SHAREPOINT_CLIENT_ID"] = config.get(
-                    "sharepoint", "CLIENT_ID", fallback=""
-                )
-                app.config["SHAREPOINT_CLIENT_SECRET"] = config.get(
-                    "sharepoint", "CLIENT_SECRET", fallback=""
-                )
-                app.config["SHAREPOINT_SITE_HOSTNAME"] = config.get(
-                    "sharepoint", "SITE_HOSTNAME", fallback=""
-                )
-                app.config["SHAREPOINT_SITE_PATH"] = config.get(
-                    "sharepoint", "SITE_PATH", fallback=""
-                )
-                app.config["SHAREPOINT_LIBRARY_NAME"] = config.get(
-                    "sharepoint", "LIBRARY_NAME", fallback=""
-                )
-
-            if config.has_section("sync"):
-                app.config["SYNC_INTERVAL"] = config.getint("sync", "INTERVAL", fallback=300)
-                app.config["METADATA_REFRESH_INTERVAL"] = config.getint(
-                    "sync", "METADATA_REFRESH_INTERVAL", fallback=1800
-                )
-                app.config["SYNC_DOWNLOAD_TIMEOUT"] = config.getint(
-                    "sync", "DOWNLOAD_TIMEOUT", fallback=300
-                )
-                app.config["SYNC_MAX_FILE_SIZE_MB"] = config.getint(
-                    "sync", "MAX_FILE_SIZE_MB", fallback=100
-                )
-                app.config["SYNC_INCLUDE_EXTENSIONS"] = config.get(
-                    "sync", "INCLUDE_EXTENSIONS", fallback=""
-                )
-                app.config["SYNC_EXCLUDE_EXTENSIONS"] = config.get(
-                    "sync", "EXCLUDE_EXTENSIONS", fallback=""
-                )
-                app.config["SYNC_INCLUDE_PATHS"] = config.get("sync", "INCLUDE_PATHS", fallback="")
-                app.config["SYNC_PATH_PATTERNS"] = config.get("sync", "PATH_PATTERNS", fallback="")
-                app.config["SYNC_METADATA_ONLY"] = config.getboolean(
-                    "sync", "METADATA_ONLY", fallback=False
-                )
-                app.config["SYNC_VERIFY_QUICKXOR_HASH"] = config.getboolean(
-                    "sync", "VERIFY_QUICKXOR_HASH", fallback=False
-                )
-                app.config["SYNC_EXCLUDE_METADATA_FIELDS"] = config.get(
-                    "sync", "EXCLUDE_METADATA_FIELDS", fallback=""
-                )
-
-            if config.has_section("gatekeeper"):
-                app.config["GATEKEEPER_DB_PATH"] = config.get("gatekeeper", "DB_PATH", fallback="")
-                app.config["GATEKEEPER_URL"] = config.get("gatekeeper", "URL", fallback="")
-                app.config["GATEKEEPER_API_KEY"] = config.get("gatekeeper", "API_KEY", fallback="")
-
-            if config.has_section("proxy"):
-                app.config["PROXY_X_FOR"] = config.getint("proxy", "X_FORWARDED_FOR", fallback=1)
-                app.config["PROXY_X_PROTO"] = config.getint(
-                    "proxy", "X_FORWARDED_PROTO", fallback=1
-                )
-                app.config["PROXY_X_HOST"] = config.getint("proxy", "X_FORWARDED_HOST", fallback=1)
-                app.config["PROXY_X_PREFIX"] = config.getint(
-                    "proxy", "X_FORWARDED_PREFIX", fallback=1
-                )
-
+        config_text = _read_config_text(project_root)
+        if config_text is not None:
+            _load_ini_config(app, config_text, project_root)
     else:
         app.config.from_mapping(test_config)
 
     # Always apply ProxyFix - harmless without forwarding headers, required when
     # behind Caddy/nginx for correct URL generation (especially X-Forwarded-Prefix).
     if test_config is None:
-        app.wsgi_app = ProxyFix(  # type: ignore[assignment]
-            app.wsgi_app,
-            x_for=app.config.get("PROXY_X_FOR", 1),
-            x_proto=app.config.get("PROXY_X_PROTO", 1),
-            x_host=app.config.get("PROXY_X_HOST", 1),
-            x_prefix=app.config.get("PROXY_X_PREFIX", 1),
-        )
+        _apply_proxy_fix(app)
 
     # Validate configuration
     if app.config["SYNC_METADATA_ONLY"] and app.config["SYNC_VERIFY_QUICKXOR_HASH"]:
@@ -196,80 +272,29 @@ def create_app(test_config: dict[str, Any] | None = None) -> Flask:
     )
 
     # Ensure directories exist
-    instance_path.mkdir(parents=True, exist_ok=True)
-    Path(app.config["BLOBS_DIRECTORY"]).mkdir(parents=True, exist_ok=True)
+    _ensure_dir(str(instance_path))
+    _ensure_dir(app.config["BLOBS_DIRECTORY"])
 
     # Register database teardown and CLI command
     app.teardown_appcontext(close_db)
+    app.before_request(_detect_htmx)
     app.cli.add_command(init_db_command)
     app.cli.add_command(migrate_db_command)
 
-    # Timezone helper
-    def get_user_timezone() -> ZoneInfo:
-        """Get user timezone from X-Timezone header or tz cookie, default UTC."""
-        tz_name = request.headers.get("X-Timezone") or request.cookies.get("tz")
-        if tz_name:
-            try:
-                return ZoneInfo(tz_name)
-            except (KeyError, ValueError):
-                pass
-        return ZoneInfo("UTC")
-
-    # Jinja filters for date formatting
-    @app.template_filter("localdate")
-    def localdate_filter(iso_string: str | None) -> str:
-        """Format ISO date string (date only) in browser timezone."""
-        if not iso_string:
-            return ""
-        try:
-            dt = datetime.fromisoformat(iso_string.replace("Z", "+00:00"))
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=UTC)
-            return dt.astimezone(get_user_timezone()).strftime("%Y-%m-%d")
-        except Exception:
-            return iso_string[:10] if iso_string else ""
-
-    @app.template_filter("localdatetime")
-    def localdatetime_filter(iso_string: str | None) -> str:
-        """Format ISO datetime string (with time) in browser timezone."""
-        if not iso_string:
-            return ""
-        try:
-            dt = datetime.fromisoformat(iso_string.replace("Z", "+00:00"))
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=UTC)
-            return dt.astimezone(get_user_timezone()).strftime("%Y-%m-%d %H:%M %Z")
-        except Exception:
-            return iso_string[:16].replace("T", " ") if iso_string else ""
-
-    @app.template_filter("filesize")
-    def filesize_filter(size: int | None) -> str:
-        """Format file size in human-readable format."""
-        if size is None:
-            return ""
-        fsize = float(size)
-        for unit in ["B", "KB", "MB", "GB", "TB"]:
-            if fsize < 1024:
-                return f"{fsize:.1f} {unit}" if unit != "B" else f"{int(fsize)} {unit}"
-            fsize /= 1024
-        return f"{fsize:.1f} PB"
+    # Jinja filters (module-level functions, see above)
+    for name, template_filter in (
+        ("localdate", _localdate_filter),
+        ("localdatetime", _localdatetime_filter),
+        ("filesize", _filesize_filter),
+    ):
+        app.add_template_filter(template_filter, name)
 
     # Register CLI commands
     from sharepoint_mirror.cli import register_cli_commands
 
     register_cli_commands(app)
 
-    # Register blueprints
-    from sharepoint_mirror.blueprints import auth, documents, sync, viewer
-
-    app.register_blueprint(auth.bp)
-    app.register_blueprint(documents.bp)
-    app.register_blueprint(sync.bp)
-    app.register_blueprint(viewer.bp)
-
-    from sharepoint_mirror.blueprints import sql
-
-    app.register_blueprint(sql.bp)
+    _register_blueprints(app)
 
     # Initialize Gatekeeper client (if configured)
     gk_db_path = app.config.get("GATEKEEPER_DB_PATH", "")
@@ -289,8 +314,10 @@ def create_app(test_config: dict[str, Any] | None = None) -> Flask:
         gk.init_app(app, cookie_name="gk_session")
         app.config["GATEKEEPER_CLIENT"] = gk
 
+    from sharepoint_mirror.blueprints.auth import login_required
+
     @app.route("/")
-    @auth.login_required
+    @login_required
     def index() -> str:
         from sharepoint_mirror.models import Document, SyncRun
 
@@ -303,32 +330,30 @@ def create_app(test_config: dict[str, Any] | None = None) -> Flask:
         }
         return render_template("index.html", stats=stats)
 
-    # Ensure database schema exists (safe to run every startup — uses IF NOT EXISTS)
-    with app.app_context():
-        from sharepoint_mirror.db import (
-            get_db,
-            get_expected_schema_version,
-            get_schema_version,
-        )
+    # Ensure database schema exists (safe to run every startup — uses IF NOT EXISTS).
+    # A database already at the expected version (read from db_metadata, one
+    # query) has every table, so the schema script only runs when it is not.
+    database_dir = project_root / "database"
+    schema_path = database_dir / "schema.sql"
+    expected = get_expected_schema_version(database_dir / "migrations")
 
-        schema_path = project_root / "database" / "schema.sql"
-        if schema_path.exists():
-            db = get_db()
-            with open(schema_path) as f:
-                for _ in db.execute(f.read()):
-                    pass
-
-        # Check schema version matches expected (from migration files)
-        # Skip when running migrate-db or init-db to avoid a catch-22
-        cli_cmd = sys.argv[-1] if sys.argv else ""
-        if cli_cmd not in ("migrate-db", "init-db"):
-            migrations_dir = project_root / "database" / "migrations"
-            expected = get_expected_schema_version(migrations_dir)
-            current = get_schema_version()
-            if expected and current < expected:
-                raise RuntimeError(
-                    f"Database schema is at version {current} but version {expected} is required. "
-                    f"Back up your database and run: flask --app wsgi migrate-db"
-                )
+    with app.app_context():
+        from sharepoint_mirror.db import execute_script, get_schema_version
+
+        if not expected or get_schema_version() < expected:
+            if schema_path.exists():
+                execute_script(schema_path)
+
+            # Check schema version matches expected (from migration files)
+            # Skip when running migrate-db or init-db to avoid a catch-22
+            cli_cmd = sys.argv[-1] if sys.argv else ""
+            if cli_cmd not in ("migrate-db", "init-db"):
+                current = get_schema_version()
+                if expected and current < expected:
+                    raise RuntimeError(
+                        f"Database schema is at version {current} but version {expected} "
+                        f"is required. Back up your database and run: "
+                        f"flask --app wsgi migrate-db"
+                    )
 
     return app
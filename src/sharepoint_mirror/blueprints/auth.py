@@ -3,6 +3,7 @@
 import functools
 from collections.abc import Callable
 from typing import Any
+from urllib.parse import urlencode
 
 from flask import (
     Blueprint,
@@ -18,20 +19,32 @@ from werkzeug.wrappers import Response
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
 
+# Constant part of the Gatekeeper login query string
+_LOGIN_APP_QUERY = urlencode({"app_name": "SharePoint Mirror"})
+
 
 @bp.before_app_request
 def load_logged_in_user() -> None:
     """Load user from Gatekeeper cookie before each request.
 
-    If Gatekeeper is not configured, g.user remains None and the
-    login_required decorator is a no-op (open access).
+    If Gatekeeper is not configured, g.user is left unset (read via
+    g.get("user")) and the login_required decorator is a no-op (open access).
     """
-    if not hasattr(g, "user"):
-        g.user = None
+    if current_app.config.get("GATEKEEPER_CLIENT") is None:
+        return
+    g.setdefault("user", None)
 
 
-def _is_htmx() -> bool:
-    return request.headers.get("HX-Request") == "true"
+def _cached_url(endpoint: str) -> str:
+    """url_for() an argument-less endpoint, memoized per app and script root."""
+    cache: dict[tuple[str, str], str] = current_app.extensions.setdefault(
+        "sharepoint_mirror_url_cache", {}
+    )
+    key = (endpoint, request.script_root)
+    url = cache.get(key)
+    if url is None:
+        url = cache[key] = url_for(endpoint)
+    return url
 
 
 def login_required(view: Callable[..., Any]) -> Callable[..., Any]:
@@ -44,12 +57,15 @@ def login_required(view: Callable[..., Any]) -> Callable[..., Any]:
     @functools.wraps(view)
     def wrapped_view(*args: Any, **kwargs: Any) -> Any:
         # If gatekeeper is not configured, allow all requests
-        if not current_app.config.get("GATEKEEPER_CLIENT"):
+        if current_app.config.get("GATEKEEPER_CLIENT") is None:
             return view(*args, **kwargs)
         if g.get("user") is None:
-            if _is_htmx():
+            if g.is_htmx:
                 return "", 401
-            return redirect(url_for("auth.login", next=request.url))
+            # Same-origin path + query; skips rebuilding scheme/host from environ
+            next_url = request.script_root + request.full_path.rstrip("?")
+            login_url = _cached_url("auth.login")
+            return redirect(f"{login_url}?{urlencode({'next': next_url})}")
         return view(*args, **kwargs)
 
     return wrapped_view
@@ -59,7 +75,7 @@ def login_required(view: Callable[..., Any]) -> Callable[..., Any]:
 def login() -> str | Response:
     """Redirect to Gatekeeper SSO login, or show fallback page."""
     if g.get("user"):
-        return redirect(url_for("index"))
+        return redirect(_cached_url("index"))
 
     gk = current_app.config.get("GATEKEEPER_CLIENT")
     if not gk:
@@ -69,12 +85,11 @@ def login() -> str | Response:
     if not login_url:
         return render_template("auth/login.html", login_url=None)
 
-    next_url = request.args.get("next", url_for("index"))
+    next_url = request.args.get("next") or _cached_url("index")
     callback_url = url_for("auth.verify", _external=True)
+    query = urlencode((("callback_url", callback_url), ("next", next_url)))
 
-    return redirect(
-        f"{login_url}?app_name=SharePoint+Mirror&callback_url={callback_url}&next={next_url}"
-    )
+    return redirect(f"{login_url}?{_LOGIN_APP_QUERY}&{query}")
 
 
 @bp.route("/verify")
@@ -83,18 +98,18 @@ def verify() -> Response:
     gk = current_app.config.get("GATEKEEPER_CLIENT")
     if not gk:
         flash("Authentication is not configured.", "error")
-        return redirect(url_for("index"))
+        return redirect(_cached_url("index"))
 
     token = request.args.get("token", "")
     result = gk.verify_magic_link(token)
 
     if not result:
         flash("Invalid or expired login link. Please request a new one.", "error")
-        return redirect(url_for("auth.login"))
+        return redirect(_cached_url("auth.login"))
 
     user, redirect_url = result
 
-    response = redirect(redirect_url or url_for("index"))
+    response = redirect(redirect_url or _cached_url("index"))
     gk.set_session_cookie(response, user)
 
     flash(f"Welcome, {user.username}!", "success")
@@ -104,7 +119,7 @@ def verify() -> Response:
 @bp.route("/logout")
 def logout() -> Response:
     """Log out the current user."""
-    response = redirect(url_for("auth.login"))
+    response = redirect(_cached_url("auth.login"))
     response.delete_cookie("gk_session")
     flash("You have been logged out.", "info")
     return response
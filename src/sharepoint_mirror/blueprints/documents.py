@@ -1,43 +1,63 @@
 """Document browsing blueprint."""
 
-from io import BytesIO
-
-from flask import Blueprint, abort, render_template, request, send_file
-from openpyxl import Workbook
-from openpyxl.styles import Font
+import tempfile
+
+from flask import (
+    Blueprint,
+    abort,
+    current_app,
+    g,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    url_for,
+)
+from werkzeug.utils import send_from_directory
 from werkzeug.wrappers import Response
 
 from sharepoint_mirror.blueprints.auth import login_required
-from sharepoint_mirror.models import Document, DocumentMetadata, Drive
+from sharepoint_mirror.models import Document, DocumentMetadata, FileBlob
 from sharepoint_mirror.services import StorageService
+from sharepoint_mirror.services.export import CATALOG_HEADERS, catalog_row, write_xlsx
 
 bp = Blueprint("documents", __name__, url_prefix="/documents")
 
 
 @bp.route("/")
 @login_required
-def index() -> str:
+def index() -> str | Response:
     """List all documents with search."""
     search = request.args.get("search", "").strip()
     page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor", type=int)
     per_page = 50
 
     search_filter = search if search else None
+    total = Document.count_all(search=search_filter)
+
+    # Out-of-range pages would only scan and discard rows; send them to the last page
+    last_page = max(1, -(-total // per_page))
+    if cursor is None and not 1 <= page <= last_page:
+        return redirect(
+            url_for("documents.index", search=search_filter, page=min(max(page, 1), last_page))
+        )
+
     docs = Document.get_all(
         search=search_filter,
         limit=per_page,
         offset=(page - 1) * per_page,
+        after_id=cursor,
     )
-
-    total = Document.count_all(search=search_filter)
-    drives = {d.id: d for d in Drive.get_all()}
+    # A stale cursor (its document since removed) finds nothing; fall back to the offset
+    if not docs and cursor is not None:
+        docs = Document.get_all(search=search_filter, limit=per_page, offset=(page - 1) * per_page)
 
     # Check if HTMX request
-    if request.headers.get("HX-Request"):
+    if g.is_htmx:
         return render_template(
             "documents/_list.html",
             documents=docs,
-            drives=drives,
             search=search,
             page=page,
             per_page=per_page,
@@ -47,7 +67,6 @@ def index() -> str:
     return render_template(
         "documents/index.html",
         documents=docs,
-        drives=drives,
         search=search,
         page=page,
         per_page=per_page,
@@ -59,137 +78,108 @@ def index() -> str:
 @login_required
 def view(doc_id: int) -> str:
     """View document details."""
-    doc = Document.get_by_id(doc_id)
-    if doc is None:
+    found = Document.get_with_blob(doc_id)
+    if found is None:
         abort(404)
-    assert doc is not None
+    assert found is not None
+    doc, blob = found
 
-    blob = doc.get_blob()
-    drive = Drive.get_by_id(doc.sharepoint_drive_id)
     metadata = DocumentMetadata.get_for_document(doc.id)
 
     return render_template(
         "documents/view.html",
         document=doc,
         blob=blob,
-        drive=drive,
         metadata=metadata,
     )
 
 
+def _send_blob(doc: Document, blob: FileBlob, as_attachment: bool = False) -> Response:
+    """Send a document's blob, delegating the transfer to the web server when configured.
+
+    With USE_X_SENDFILE the response is an empty body plus an X-Sendfile header;
+    with BLOBS_X_ACCEL_REDIRECT that header is swapped for nginx's
+    X-Accel-Redirect pointing into the internal blobs location. The accel
+    setting applies to blobs only, so static files are still sent normally.
+    """
+    storage = StorageService()
+    relative_path = storage.get_blob_relative_path(blob)
+    config = current_app.config
+    accel_prefix = config["BLOBS_X_ACCEL_REDIRECT"]
+
+    # Raises NotFound if the blob is missing from storage (no separate exists() check).
+    # No long max_age: these URLs are per document, and a document's blob changes
+    # when SharePoint content does, so clients revalidate with the ETag instead.
+    # This is werkzeug's send_from_directory with the arguments Flask's wrapper
+    # adds, except that X-Sendfile is decided here rather than app-wide.
+    response = send_from_directory(
+        storage.blobs_directory,
+        relative_path,
+        request.environ,
+        mimetype=doc.mime_type or "application/octet-stream",
+        as_attachment=as_attachment,
+        download_name=doc.name if as_attachment else None,
+        # Blobs are content-addressed, so the hash is a strong validator for
+        # If-None-Match (answered with a bodyless 304)
+        conditional=True,
+        etag=blob.sha256_hash,
+        max_age=current_app.get_send_file_max_age,
+        use_x_sendfile=config["USE_X_SENDFILE"] or bool(accel_prefix),
+        response_class=current_app.response_class,
+        _root_path=current_app.root_path,
+    )
+
+    if accel_prefix and response.headers.pop("X-Sendfile", None) is not None:
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{relative_path}"
+    return response
+
+
 @bp.route("/<int:doc_id>/download")
 @login_required
 def download(doc_id: int) -> Response:
     """Download document file."""
-    doc = Document.get_by_id(doc_id)
-    if doc is None:
+    found = Document.get_with_blob(doc_id)
+    if found is None:
         abort(404)
-    assert doc is not None
+    assert found is not None
+    doc, blob = found
 
-    blob = doc.get_blob()
     if blob is None:
         abort(404, "File content not available")
     assert blob is not None
 
-    storage = StorageService()
-    blob_path = storage.get_blob_path(blob)
-
-    if not blob_path.exists():
-        abort(404, "File not found in storage")
-
-    return send_file(
-        blob_path,
-        mimetype=doc.mime_type or "application/octet-stream",
-        as_attachment=True,
-        download_name=doc.name,
-    )
+    return _send_blob(doc, blob, as_attachment=True)
 
 
 @bp.route("/<int:doc_id>/content")
 @login_required
 def content(doc_id: int) -> Response:
     """Serve document content (for inline viewing)."""
-    doc = Document.get_by_id(doc_id)
-    if doc is None:
+    found = Document.get_with_blob(doc_id)
+    if found is None:
         abort(404)
-    assert doc is not None
+    assert found is not None
+    doc, blob = found
 
-    blob = doc.get_blob()
     if blob is None:
         abort(404, "File content not available")
     assert blob is not None
 
-    storage = StorageService()
-    blob_path = storage.get_blob_path(blob)
-
-    if not blob_path.exists():
-        abort(404, "File not found in storage")
-
-    return send_file(
-        blob_path,
-        mimetype=doc.mime_type or "application/octet-stream",
-    )
+    return _send_blob(doc, blob)
 
 
 @bp.route("/catalog.xlsx")
 @login_required
 def catalog_xlsx() -> Response:
     """Export full document catalog as XLSX."""
-    docs = Document.get_all(include_deleted=False)
-    drives = {d.id: d for d in Drive.get_all()}
-
-    wb = Workbook()
-    ws = wb.active
-    assert ws is not None
-    ws.title = "Documents"
-
-    headers = [
-        "Library",
-        "Name",
-        "Path",
-        "MIME Type",
-        "File Size",
-        "Web URL",
-        "Created By",
-        "Last Modified By",
-        "SP Created",
-        "SP Modified",
-        "Synced At",
-        "QuickXor Hash",
-        "SharePoint Item ID",
-        "SharePoint Drive ID",
-    ]
-    ws.append(headers)
-
-    bold = Font(bold=True)
-    for cell in ws[1]:
-        cell.font = bold
-
-    for doc in docs:
-        drive = drives.get(doc.sharepoint_drive_id)
-        ws.append(
-            [
-                drive.name if drive else doc.sharepoint_drive_id,
-                doc.name,
-                doc.path,
-                doc.mime_type,
-                doc.file_size,
-                doc.web_url,
-                doc.created_by,
-                doc.last_modified_by,
-                doc.sharepoint_created_at,
-                doc.sharepoint_modified_at,
-                doc.synced_at,
-                doc.quickxor_hash,
-                doc.sharepoint_item_id,
-                doc.sharepoint_drive_id,
-            ]
-        )
-
-    ws.auto_filter.ref = ws.dimensions
-
-    buf = BytesIO()
-    wb.save(buf)
+    # Closed (and deleted) by the response once the file has been sent
+    buf = tempfile.TemporaryFile()
+    write_xlsx(
+        buf,
+        "Documents",
+        CATALOG_HEADERS,
+        (catalog_row(doc) for doc in Document.iter_all(include_deleted=False)),
+    )
     buf.seek(0)
 
     return send_file(
@@ -197,4 +187,5 @@ def catalog_xlsx() -> Response:
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         as_attachment=True,
         download_name="catalog.xlsx",
+        conditional=True,
     )
@@ -1,5 +1,7 @@
 """SQL query blueprint."""
 
+import tempfile
+
 import apsw
 from flask import (
     Blueprint,
@@ -84,6 +86,13 @@ def export() -> str | Response:
         flash(str(exc), "error")
         return render_template("sql.html", schema=_get_schema(), query=sql, columns=[], rows=[])
 
-    data = [list(row) for row in rows]
-    path = write_xlsx(headers, data, "query.xlsx")
-    return send_file(path, as_attachment=True, download_name="query.xlsx")
+    # Closed (and deleted) by the response once the file has been sent
+    buf = tempfile.TemporaryFile()
+    write_xlsx(buf, "query", headers, rows)
+    buf.seek(0)
+    return send_file(
+        buf,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        as_attachment=True,
+        download_name="query.xlsx",
+    )
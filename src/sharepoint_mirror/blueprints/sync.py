@@ -2,8 +2,9 @@
 
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask import Blueprint, current_app, flash, g, redirect, render_template, request, url_for
 from werkzeug.wrappers import Response
 
 from sharepoint_mirror.blueprints.auth import login_required
@@ -17,19 +18,26 @@ bp = Blueprint("sync", __name__, url_prefix="/sync")
 
 @bp.route("/")
 @login_required
-def index() -> str:
+def index() -> str | Response:
     """Show sync history."""
     page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor", type=int)
     per_page = 20
 
-    runs = SyncRun.get_recent(limit=per_page, offset=(page - 1) * per_page)
     total = SyncRun.count_all()
 
+    # Out-of-range pages would only scan and discard rows; send them to the last page
+    last_page = max(1, -(-total // per_page))
+    if cursor is None and not 1 <= page <= last_page:
+        return redirect(url_for("sync.index", page=min(max(page, 1), last_page)))
+
+    runs = SyncRun.get_recent(limit=per_page, offset=(page - 1) * per_page, before_id=cursor)
+
     # Check if sync is in progress
     current_run = SyncRun.get_running()
 
     # Check if HTMX request
-    if request.headers.get("HX-Request"):
+    if g.is_htmx:
         return render_template(
             "sync/_history.html",
             runs=runs,
@@ -66,18 +74,28 @@ def view(run_id: int) -> str | Response:
     )
 
 
+def _sync_executor() -> ThreadPoolExecutor:
+    """Get the app's single-worker executor for syncs triggered from the web UI."""
+    executor = current_app.extensions.get("sync_executor")
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="web-sync")
+        current_app.extensions["sync_executor"] = executor
+    return executor
+
+
 @bp.route("/trigger", methods=["POST"])
 @login_required
-def trigger() -> str | Response:
-    """Trigger a new sync."""
+def trigger() -> str | Response | tuple[str, int]:
+    """Start a sync in the background and return immediately."""
     full_sync = request.form.get("full", "0") == "1"
 
     try:
         service = SyncService()
 
-        # Check if already running
-        if SyncRun.is_sync_in_progress():
-            if request.headers.get("HX-Request"):
+        # Check if already running (a submitted sync has no SyncRun row until it starts)
+        pending = current_app.extensions.get("sync_future")
+        if SyncRun.is_sync_in_progress() or (pending is not None and not pending.done()):
+            if g.is_htmx:
                 return render_template(
                     "sync/_status.html",
                     error="A sync is already in progress",
@@ -85,27 +103,27 @@ def trigger() -> str | Response:
             flash("A sync is already in progress.", "warning")
             return redirect(url_for("sync.index"))
 
-        # Start sync (this blocks until complete)
-        # In production, you'd want to run this in a background task
+        app = current_app._get_current_object()
+
+        def run_sync() -> None:
+            with app.app_context():
+                try:
+                    service.run_sync(full_sync=full_sync)
+                except Exception:
+                    logger.exception("Sync triggered via web UI failed")
+
         logger.info("Sync triggered via web UI (full=%s)", full_sync)
-        run = service.run_sync(full_sync=full_sync)
+        current_app.extensions["sync_future"] = _sync_executor().submit(run_sync)
 
-        if request.headers.get("HX-Request"):
-            return render_template(
-                "sync/_status.html",
-                run=run,
-                success=True,
-            )
+        if g.is_htmx:
+            # Partial polls /sync/status until the run finishes
+            return render_template("sync/_status.html", status={"is_running": True}), 202
 
-        flash(
-            f"Sync completed: +{run.files_added} added, ~{run.files_modified} modified, "
-            f"-{run.files_removed} removed.",
-            "success",
-        )
+        flash("Sync started.", "info")
 
     except Exception as e:
         logger.exception("Sync trigger failed")
-        if request.headers.get("HX-Request"):
+        if g.is_htmx:
             return render_template(
                 "sync/_status.html",
                 error=str(e),
@@ -129,14 +147,14 @@ def refresh_metadata() -> str | Response:
     """Start a background metadata refresh for all synced documents."""
     existing = _get_running_metadata_refresh()
     if existing:
-        if request.headers.get("HX-Request"):
+        if g.is_htmx:
             return render_template("sync/_refresh_metadata.html", run=existing)
         flash("Metadata refresh is already running.", "warning")
         return redirect(url_for("sync.index"))
 
-    docs = Document.get_all(include_deleted=False)
-    if not docs:
-        if request.headers.get("HX-Request"):
+    doc_count = Document.count_all()
+    if not doc_count:
+        if g.is_htmx:
             return render_template("sync/_refresh_metadata.html", error="No documents to process.")
         flash("No documents to process.", "warning")
         return redirect(url_for("sync.index"))
@@ -148,18 +166,18 @@ def refresh_metadata() -> str | Response:
             service = SyncService()
             service.run_metadata_refresh()
 
-    logger.info("Metadata refresh triggered via web UI (%d documents)", len(docs))
+    logger.info("Metadata refresh triggered via web UI (%d documents)", doc_count)
     threading.Thread(target=run_refresh, daemon=True).start()
 
     import time
 
     time.sleep(0.2)  # Brief pause to let the SyncRun record be created
 
-    if request.headers.get("HX-Request"):
+    if g.is_htmx:
         run = _get_running_metadata_refresh()
         return render_template("sync/_refresh_metadata.html", run=run)
 
-    flash(f"Metadata refresh started for {len(docs)} document(s).", "info")
+    flash(f"Metadata refresh started for {doc_count} document(s).", "info")
     return redirect(url_for("sync.index"))
 
 
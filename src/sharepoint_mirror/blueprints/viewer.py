@@ -1,27 +1,54 @@
 """Document viewer blueprint."""
 
-from flask import Blueprint, abort, render_template
+import codecs
+
+from flask import Blueprint, abort, current_app, render_template, send_file, stream_template
+from werkzeug.wrappers import Response
 
 from sharepoint_mirror.blueprints.auth import login_required
 from sharepoint_mirror.models import Document
 
 bp = Blueprint("viewer", __name__, url_prefix="/viewer")
 
+# Larger text files are served raw (text/plain) instead of rendered into the page
+TEXT_VIEWER_MAX_BYTES = 2_000_000
+
+# Bytes that occur in text files; anything else in the first 4 KB marks the file as binary
+_TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+
+
+def _decode_text(content: bytes) -> str | None:
+    """Decode text file content, or return None if it looks binary.
+
+    UTF-16 is recognised by its BOM; everything else is decoded as UTF-8
+    (dropping any BOM), falling back to Windows-1252 for files that are not
+    valid UTF-8, as legacy Office-era text files usually are.
+    """
+    if content.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return content.decode("utf-16", errors="replace")
+    if content[:4096].translate(None, _TEXT_BYTES):
+        return None
+    try:
+        return content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # cp1252 leaves five bytes undefined; replace those rather than raising
+        return content.decode("cp1252", errors="replace")
+
 
 @bp.route("/pdf/<int:doc_id>")
 @login_required
 def pdf(doc_id: int) -> str:
     """PDF viewer page."""
-    doc = Document.get_by_id(doc_id)
-    if doc is None:
+    found = Document.get_with_blob(doc_id)
+    if found is None:
         abort(404)
-    assert doc is not None
+    assert found is not None
+    doc, blob = found
 
     # Check if it's a PDF
     if doc.mime_type != "application/pdf":
         abort(400, "Document is not a PDF")
 
-    blob = doc.get_blob()
     if blob is None:
         abort(404, "File content not available")
 
@@ -33,18 +60,18 @@ def pdf(doc_id: int) -> str:
 
 @bp.route("/text/<int:doc_id>")
 @login_required
-def text(doc_id: int) -> str:
+def text(doc_id: int) -> Response:
     """Text file viewer."""
-    doc = Document.get_by_id(doc_id)
-    if doc is None:
+    found = Document.get_with_blob(doc_id)
+    if found is None:
         abort(404)
-    assert doc is not None
+    assert found is not None
+    doc, blob = found
 
     # Check if it's a text file
     if not doc.mime_type or not doc.mime_type.startswith("text/"):
         abort(400, "Document is not a text file")
 
-    blob = doc.get_blob()
     if blob is None:
         abort(404, "File content not available")
     assert blob is not None
@@ -52,19 +79,38 @@ def text(doc_id: int) -> str:
     from sharepoint_mirror.services import StorageService
 
     storage = StorageService()
+
+    if blob.file_size > TEXT_VIEWER_MAX_BYTES:
+        # Streamed as plain text whatever the stored type, so a large .html or
+        # .svg is never rendered as active content in the app's origin
+        # (werkzeug adds "; charset=utf-8" to text/* types)
+        try:
+            response = send_file(
+                storage.get_blob_path(blob),
+                mimetype="text/plain",
+                conditional=True,
+                etag=blob.sha256_hash,
+            )
+        except FileNotFoundError:
+            abort(404, "File not found in storage")
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        return response
+
     content = storage.get_content(blob)
     if content is None:
         abort(404, "File not found in storage")
     assert content is not None
 
-    # Try to decode as UTF-8
-    try:
-        text_content = content.decode("utf-8")
-    except UnicodeDecodeError:
-        text_content = content.decode("latin-1")
-
-    return render_template(
-        "viewer/text.html",
-        document=doc,
-        content=text_content,
+    text_content = _decode_text(content)
+    if text_content is None:
+        abort(400, "Document is not a text file")
+    assert text_content is not None
+
+    # Stream the rendered page rather than building the whole HTML string
+    return current_app.response_class(
+        stream_template(
+            "viewer/text.html",
+            document=doc,
+            content=text_content,
+        )
     )
@@ -1,8 +1,11 @@
-"""CLI commands for SharePoint Mirror."""
+"""CLI commands for SharePoint Mirror.
+
+Everything beyond click/flask is imported inside the command that needs it,
+so loading the CLI (e.g. for ``flask --help``) stays cheap.
+"""
 
-import json
-import logging
 import sys
+from collections.abc import Iterator
 
 import click
 from flask import Flask, current_app
@@ -18,12 +21,14 @@ def register_cli_commands(app: Flask) -> None:
     @click.option("--verbose", "-v", is_flag=True, help="Enable verbose logging")
     def sync_command(full: bool, dry_run: bool, library: str | None, verbose: bool) -> None:
         """Synchronize documents from SharePoint."""
+        import logging
+
         if verbose:
             logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
         else:
             logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 
-        from sharepoint_mirror.services import SyncService
+        from sharepoint_mirror.services.sync import SyncService
 
         try:
             service = SyncService()
@@ -57,7 +62,7 @@ def register_cli_commands(app: Flask) -> None:
     @app.cli.command("status")
     def status_command() -> None:
         """Show sync status and statistics."""
-        from sharepoint_mirror.services import SyncService
+        from sharepoint_mirror.services.sync import SyncService
 
         service = SyncService()
         status = service.get_status()
@@ -101,6 +106,8 @@ def register_cli_commands(app: Flask) -> None:
     @click.option("--json", "as_json", is_flag=True, help="Output as JSON")
     def list_command(search: str | None, limit: int, deleted: bool, as_json: bool) -> None:
         """List synchronized documents."""
+        import json
+
         from sharepoint_mirror.models import Document
 
         docs = Document.get_all(
@@ -128,20 +135,18 @@ def register_cli_commands(app: Flask) -> None:
                 click.echo("No documents found.")
                 return
 
-            click.echo(f"{'Path':<60} {'Size':>10} {'Synced'}")
-            click.echo("-" * 90)
+            # Build the table and write it in one go rather than one echo per row
+            lines = [f"{'Path':<60} {'Size':>10} {'Synced'}", "-" * 90]
             for doc in docs:
                 size_str = _format_size(doc.file_size) if doc.file_size else "-"
                 synced = doc.synced_at[:10] if doc.synced_at else "-"
-                path = doc.path
-                if len(path) > 58:
-                    path = "..." + path[-55:]
+                path = doc.path if len(doc.path) <= 58 else "..." + doc.path[-55:]
                 if doc.is_deleted:
                     path = f"[DEL] {path}"
-                click.echo(f"{path:<60} {size_str:>10} {synced}")
-
-            click.echo()
-            click.echo(f"Total: {len(docs)} document(s)")
+                lines.append(f"{path:<60} {size_str:>10} {synced}")
+            lines.append("")
+            lines.append(f"Total: {len(docs)} document(s)")
+            click.echo("\n".join(lines))
 
     @app.cli.command("export-metadata")
     @click.option("--output", "-o", help="Output file (default: stdout)")
@@ -149,66 +154,79 @@ def register_cli_commands(app: Flask) -> None:
     @click.option("--include-blob-path", is_flag=True, help="Include local blob file path")
     def export_metadata_command(output: str | None, fmt: str, include_blob_path: bool) -> None:
         """Export document metadata for vector database ingestion."""
+        import json
+
         from sharepoint_mirror.models import Document, DocumentMetadata
 
-        docs = Document.get_all(include_deleted=False)
-
-        records = []
-        for doc in docs:
-            record = {
-                "id": doc.id,
-                "sharepoint_item_id": doc.sharepoint_item_id,
-                "name": doc.name,
-                "path": doc.path,
-                "mime_type": doc.mime_type,
-                "file_size": doc.file_size,
-                "web_url": doc.web_url,
-                "created_by": doc.created_by,
-                "last_modified_by": doc.last_modified_by,
-                "sharepoint_created_at": doc.sharepoint_created_at,
-                "sharepoint_modified_at": doc.sharepoint_modified_at,
-                "synced_at": doc.synced_at,
-            }
-
-            if include_blob_path:
-                blob = doc.get_blob()
-                if blob:
+        def records() -> Iterator[dict]:
+            for doc, blob in Document.iter_all_with_blob(include_deleted=False):
+                record = {
+                    "id": doc.id,
+                    "sharepoint_item_id": doc.sharepoint_item_id,
+                    "name": doc.name,
+                    "path": doc.path,
+                    "mime_type": doc.mime_type,
+                    "file_size": doc.file_size,
+                    "web_url": doc.web_url,
+                    "created_by": doc.created_by,
+                    "last_modified_by": doc.last_modified_by,
+                    "sharepoint_created_at": doc.sharepoint_created_at,
+                    "sharepoint_modified_at": doc.sharepoint_modified_at,
+                    "synced_at": doc.synced_at,
+                }
+
+                if include_blob_path and blob:
                     record["blob_path"] = str(blob.get_path())
                     record["blob_hash"] = blob.sha256_hash
 
-            custom = DocumentMetadata.get_for_document(doc.id)
-            if custom:
-                record["custom_metadata"] = custom
+                custom = DocumentMetadata.get_for_document(doc.id)
+                if custom:
+                    record["custom_metadata"] = custom
 
-            records.append(record)
+                yield record
 
-        if fmt == "json":
-            content = json.dumps(records, indent=2)
-        else:  # jsonl
-            content = "\n".join(json.dumps(r) for r in records)
+        indent = 2 if fmt == "json" else None
+        out = open(output, "wb") if output else click.get_binary_stream("stdout")
+
+        # Same bytes as json.dumps() of the whole list / "\n".join() of the
+        # lines; only stdout gets a trailing newline, as click.echo() added one
+        count = 0
+        try:
+            if fmt == "json":
+                out.write(b"[")
+            for record in records():
+                encoded = json.dumps(record, indent=indent).encode()
+                if fmt == "json":
+                    # Indent each record one level so the array matches indent=2 output
+                    out.write(b",\n  " if count else b"\n  ")
+                    out.write(encoded.replace(b"\n", b"\n  "))
+                else:  # jsonl
+                    out.write(b"\n" if count else b"")
+                    out.write(encoded)
+                count += 1
+            if fmt == "json":
+                out.write(b"\n]" if count else b"]")
+            if not output:
+                out.write(b"\n")
+        finally:
+            if output:
+                out.close()
+            else:
+                out.flush()
 
         if output:
-            with open(output, "w") as f:
-                f.write(content)
-            click.echo(f"Exported {len(records)} document(s) to {output}")
-        else:
-            click.echo(content)
+            click.echo(f"Exported {count} document(s) to {output}")
 
     @app.cli.command("export-catalog")
     @click.option("--output", "-o", default="catalog.xlsx", help="Output file path")
     def export_catalog_command(output: str) -> None:
         """Export full document catalog as XLSX spreadsheet."""
-        from openpyxl import Workbook
-        from openpyxl.styles import Font
-
-        from sharepoint_mirror.models import Document, DocumentMetadata, Drive
-
-        docs = Document.get_all(include_deleted=False)
-        drives = {d.id: d for d in Drive.get_all()}
+        from sharepoint_mirror.models import Document, DocumentMetadata
+        from sharepoint_mirror.services.export import CATALOG_HEADERS, catalog_row, write_xlsx
 
         # Collect custom metadata for all documents and discover field names
         doc_metadata: dict[int, dict[str, list[str]]] = {}
-        for doc in docs:
+        for doc in Document.iter_all(include_deleted=False):
             meta = DocumentMetadata.get_for_document(doc.id)
             if meta:
                 doc_metadata[doc.id] = meta
@@ -216,67 +234,26 @@ def register_cli_commands(app: Flask) -> None:
         # Get all distinct custom field names in sorted order
         custom_fields = sorted({name for meta in doc_metadata.values() for name in meta})
 
-        wb = Workbook()
-        ws = wb.active
-        assert ws is not None
-        ws.title = "Documents"
-
-        headers = [
-            "Library",
-            "Name",
-            "Path",
-            "MIME Type",
-            "File Size",
-            "Web URL",
-            "Created By",
-            "Last Modified By",
-            "SP Created",
-            "SP Modified",
-            "Synced At",
-            "QuickXor Hash",
-            "SharePoint Item ID",
-            "SharePoint Drive ID",
-        ] + custom_fields
-        ws.append(headers)
-
-        bold = Font(bold=True)
-        for cell in ws[1]:
-            cell.font = bold
-
-        for doc in docs:
-            drive = drives.get(doc.sharepoint_drive_id)
-            row = [
-                drive.name if drive else doc.sharepoint_drive_id,
-                doc.name,
-                doc.path,
-                doc.mime_type,
-                doc.file_size,
-                doc.web_url,
-                doc.created_by,
-                doc.last_modified_by,
-                doc.sharepoint_created_at,
-                doc.sharepoint_modified_at,
-                doc.synced_at,
-                doc.quickxor_hash,
-                doc.sharepoint_item_id,
-                doc.sharepoint_drive_id,
-            ]
-            meta = doc_metadata.get(doc.id, {})
-            for field_name in custom_fields:
-                values = meta.get(field_name, [])
-                row.append("; ".join(v for v in values if v is not None) if values else "")
-            ws.append(row)
+        headers = CATALOG_HEADERS + custom_fields
+
+        def rows() -> Iterator[list]:
+            for doc in Document.iter_all(include_deleted=False):
+                row = catalog_row(doc)
+                meta = doc_metadata.get(doc.id, {})
+                for field_name in custom_fields:
+                    values = meta.get(field_name, [])
+                    row.append("; ".join(v for v in values if v is not None) if values else "")
+                yield row
 
-        ws.auto_filter.ref = ws.dimensions
-        wb.save(output)
-        click.echo(f"Exported {len(docs)} document(s) to {output}")
+        count = write_xlsx(output, "Documents", headers, rows())
+        click.echo(f"Exported {count} document(s) to {output}")
 
     @app.cli.command("list-fields")
     @click.option("--library", "-l", help="Specific library (default: all)")
     @click.option("--include-hidden", is_flag=True, help="Include hidden columns")
     def list_fields_command(library: str | None, include_hidden: bool) -> None:
         """List custom metadata fields defined on SharePoint document libraries."""
-        from sharepoint_mirror.services import SharePointClient
+        from sharepoint_mirror.services.sharepoint import SharePointClient
 
         try:
             client = SharePointClient()
@@ -325,13 +302,15 @@ def register_cli_commands(app: Flask) -> None:
     @click.option("--verbose", "-v", is_flag=True, help="Show each document being processed")
     def refresh_metadata_command(library: str | None, verbose: bool) -> None:
         """Re-fetch custom metadata (listItem.fields) for all synced documents."""
+        import logging
+
         if verbose:
             logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
         else:
             logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 
         from sharepoint_mirror.models import Document, Drive
-        from sharepoint_mirror.services import SyncService
+        from sharepoint_mirror.services.sync import SyncService
 
         try:
             service = SyncService()
@@ -372,7 +351,7 @@ def register_cli_commands(app: Flask) -> None:
     @app.cli.command("test-connection")
     def test_connection_command() -> None:
         """Test SharePoint connection."""
-        from sharepoint_mirror.services import SharePointClient
+        from sharepoint_mirror.services.sharepoint import SharePointClient
 
         click.echo("Testing SharePoint connection...")
         try:
@@ -404,7 +383,7 @@ def register_cli_commands(app: Flask) -> None:
     @app.cli.command("verify-storage")
     def verify_storage_command() -> None:
         """Verify integrity of blob storage."""
-        from sharepoint_mirror.services import StorageService
+        from sharepoint_mirror.services.storage import StorageService
 
         click.echo("Verifying storage integrity...")
         service = StorageService()
@@ -418,13 +397,15 @@ def register_cli_commands(app: Flask) -> None:
                 click.echo(f"  [{issue['type']}] {issue['message']}")
 
 
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+
 def _format_size(size: int | None) -> str:
     """Format file size in human-readable format."""
     if size is None:
         return "-"
-    fsize = float(size)
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if fsize < 1024:
-            return f"{fsize:.1f} {unit}" if unit != "B" else f"{int(fsize)} {unit}"
-        fsize /= 1024
-    return f"{fsize:.1f} PB"
+    if size < 1024:
+        return f"{size} B"
+    # Each unit is 2**10 of the previous one, so the unit index is the bit length // 10
+    idx = min((size.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size / (1 << (idx * 10)):.1f} {_SIZE_UNITS[idx]}"
@@ -1,5 +1,9 @@
 """Database connection and transaction handling using APSW."""
 
+import functools
+import re
+import time
+from collections import deque
 from collections.abc import Generator
 from contextlib import contextmanager
 from pathlib import Path
@@ -8,6 +12,28 @@ import apsw
 import click
 from flask import current_app, g
 
+# Prepared statements APSW keeps per connection, keyed by SQL text (its default is 100)
+STATEMENT_CACHE_SIZE = 256
+
+
+# (unix second, its "YYYY-MM-DDTHH:MM:SS" text) for the last utc_now_iso() call
+_ISO_SECOND: tuple[int, str] = (0, "")
+
+
+def utc_now_iso() -> str:
+    """Return the current UTC time as an ISO 8601 string with microseconds.
+
+    Same form as ``datetime.now(UTC).isoformat()`` (always including the
+    microseconds), but the date/time text is only formatted once per second.
+    """
+    global _ISO_SECOND
+    seconds, micros = divmod(time.time_ns() // 1000, 1_000_000)
+    cached = _ISO_SECOND
+    if cached[0] != seconds:
+        cached = (seconds, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)))
+        _ISO_SECOND = cached
+    return f"{cached[1]}.{micros:06d}+00:00"
+
 
 def get_db() -> apsw.Connection:
     """Get the database connection for the current request."""
@@ -15,13 +41,20 @@ def get_db() -> apsw.Connection:
         db_path = current_app.config["DATABASE_PATH"]
         # Ensure parent directory exists
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-        g.db = apsw.Connection(db_path)
+        g.db = apsw.Connection(db_path, statementcachesize=STATEMENT_CACHE_SIZE)
         # Set busy timeout first so other PRAGMAs can wait for locks
         g.db.execute("PRAGMA busy_timeout = 5000;")
         # Enable foreign keys
         g.db.execute("PRAGMA foreign_keys = ON;")
         # Use WAL mode for better concurrency
         g.db.execute("PRAGMA journal_mode = WAL;")
+        if current_app.config.get("SQLITE_BULK_MODE", True):
+            # Sync does many small writes: fsync only at checkpoints (safe with WAL),
+            # keep temp tables and more pages in memory, read via mmap
+            g.db.execute("PRAGMA synchronous = NORMAL;")
+            g.db.execute("PRAGMA temp_store = MEMORY;")
+            g.db.execute("PRAGMA cache_size = -65536;")
+            g.db.execute("PRAGMA mmap_size = 268435456;")
     return g.db
 
 
@@ -38,6 +71,10 @@ def transaction() -> Generator[apsw.Cursor]:
     Context manager for database transactions.
     Automatically commits on success, rolls back on exception.
 
+    A transaction() opened inside another one becomes a savepoint: an
+    exception rolls back only the inner block, and nothing is committed
+    until the outermost block exits.
+
     Usage:
         with transaction() as cursor:
             cursor.execute("INSERT INTO ...")
@@ -46,6 +83,17 @@ def transaction() -> Generator[apsw.Cursor]:
     """
     db = get_db()
     cursor = db.cursor()
+    if db.in_transaction:
+        cursor.execute("SAVEPOINT nested_transaction;")
+        try:
+            yield cursor
+            cursor.execute("RELEASE nested_transaction;")
+        except Exception:
+            cursor.execute("ROLLBACK TO nested_transaction;")
+            cursor.execute("RELEASE nested_transaction;")
+            raise
+        return
+
     cursor.execute("BEGIN IMMEDIATE;")
     try:
         yield cursor
@@ -55,42 +103,92 @@ def transaction() -> Generator[apsw.Cursor]:
         raise
 
 
+# Scripts that switch foreign keys off must run outside a transaction (the
+# PRAGMA is a no-op inside one); scripts with their own BEGIN/COMMIT manage it
+_NO_WRAP_RE = re.compile(
+    r"PRAGMA\s+foreign_keys\s*=\s*(?:OFF|FALSE|NO|0)\b|^\s*(?:BEGIN(?:\s+\w+)*|COMMIT)\s*;",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+_SET_SCHEMA_VERSION_SQL = """
+    INSERT INTO db_metadata (key, value) VALUES ('schema_version', ?)
+    ON CONFLICT(key) DO UPDATE SET value = excluded.value
+"""
+
+
+def execute_script(path: Path, schema_version: int | None = None) -> None:
+    """Execute every statement in a .sql file, in one transaction where possible.
+
+    If ``schema_version`` is given it is recorded in db_metadata, inside the
+    same transaction as the script when the script could be wrapped.
+    """
+    sql = path.read_bytes().decode("utf-8")
+    # APSW pauses at statements that return rows until the cursor is iterated,
+    # so drain it (in C, via a zero-length deque) to run all statements.
+    # The script runs once, so keep it out of the statement cache.
+    if _NO_WRAP_RE.search(sql):
+        deque(get_db().execute(sql, can_cache=False), maxlen=0)
+        if schema_version is not None:
+            with transaction() as cursor:
+                cursor.execute(_SET_SCHEMA_VERSION_SQL, (str(schema_version),))
+        return
+
+    with transaction() as cursor:
+        deque(cursor.execute(sql, can_cache=False), maxlen=0)
+        if schema_version is not None:
+            cursor.execute(_SET_SCHEMA_VERSION_SQL, (str(schema_version),))
+
+
 def init_db() -> None:
     """Initialize the database with the schema."""
-    db = get_db()
-    schema_path = _find_database_dir() / "schema.sql"
-
-    with open(schema_path) as f:
-        # APSW requires iterating over execute() result to run all statements
-        for _ in db.execute(f.read()):
-            pass
+    execute_script(_find_database_dir() / "schema.sql")
 
 
 def get_schema_version() -> int:
     """Get the current schema version from db_metadata."""
-    db = get_db()
-    cursor = db.cursor()
     try:
-        cursor.execute("SELECT value FROM db_metadata WHERE key = 'schema_version'")
-        row = cursor.fetchone()
+        row = next(
+            get_db().execute("SELECT value FROM db_metadata WHERE key = 'schema_version'"), None
+        )
         return int(row[0]) if row else 0
     except apsw.SQLError:
         return 0
 
 
+def get_stat(key: str) -> int:
+    """Get a running total from the trigger-maintained stats table."""
+    row = next(get_db().execute("SELECT value FROM stats WHERE key = ?", (key,)), None)
+    return int(row[0]) if row else 0
+
+
 def get_expected_schema_version(migrations_dir: Path) -> int:
     """Get the highest schema version from migration files."""
-    if not migrations_dir.exists():
-        return 0
-    max_version = 0
+    migrations = list_migrations(migrations_dir)
+    return migrations[-1][0] if migrations else 0
+
+
+def list_migrations(migrations_dir: Path) -> tuple[tuple[int, Path], ...]:
+    """Return the (version, path) of each NNN_description.sql file, in version order."""
+    try:
+        mtime_ns = migrations_dir.stat().st_mtime_ns
+    except FileNotFoundError:
+        return ()
+    return _scan_migrations(migrations_dir, mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def _scan_migrations(migrations_dir: Path, mtime_ns: int) -> tuple[tuple[int, Path], ...]:
+    """Glob the migrations directory (cached until its mtime changes)."""
+    migration_files: list[tuple[int, Path]] = []
     for sql_file in migrations_dir.glob("*.sql"):
         prefix = sql_file.stem.split("_", 1)[0]
         try:
             version = int(prefix)
         except ValueError:
             continue
-        max_version = max(max_version, version)
-    return max_version
+        migration_files.append((version, sql_file))
+    migration_files.sort()
+    return tuple(migration_files)
 
 
 def _find_database_dir() -> Path:
@@ -112,25 +210,15 @@ def migrate_db(migrations_dir: Path | None = None) -> None:
     if not migrations_dir.exists():
         return
 
-    # Find migration files: NNN_description.sql where NNN > current_version
-    migration_files: list[tuple[int, Path]] = []
-    for sql_file in sorted(migrations_dir.glob("*.sql")):
-        prefix = sql_file.stem.split("_", 1)[0]
-        try:
-            version = int(prefix)
-        except ValueError:
-            continue
-        if version > current_version:
-            migration_files.append((version, sql_file))
+    migration_files = [
+        (version, sql_file)
+        for version, sql_file in list_migrations(migrations_dir)
+        if version > current_version
+    ]
 
-    migration_files.sort()
-
-    db = get_db()
     for version, sql_file in migration_files:
         click.echo(f"Applying migration {sql_file.name} (version {version})...")
-        with open(sql_file) as f:
-            for _ in db.execute(f.read()):
-                pass
+        execute_script(sql_file, schema_version=version)
         click.echo(f"  Applied {sql_file.name}")
 
     if not migration_files:
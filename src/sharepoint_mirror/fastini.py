@@ -0,0 +1,69 @@
+"""Minimal INI reader for config.ini.
+
+Reads the file once into nested dicts so config lookups are plain dict
+access. Supports the subset of configparser syntax used by config.ini:
+``[section]`` headers, ``KEY = value`` and ``KEY: value`` options,
+full-line ``#``/``;`` comments, and indented continuation lines for
+multi-line values. As with configparser's default interpolation, ``%%``
+in a value reads as a literal ``%``.
+
+Not supported: ``%(name)s`` interpolation (left as-is, not substituted),
+a ``[DEFAULT]`` section applying to other sections, and inline comments
+(which configparser does not strip by default either).
+
+Option names are case-insensitive (stored upper-cased, like the keys in
+config.ini.example); section names are case-sensitive.
+"""
+
+import re
+
+_SECTION_RE = re.compile(r"^\s*\[([^\]]+)\]\s*$")
+# The option name ends at the first = or : (like configparser's delimiters)
+_OPTION_RE = re.compile(r"^\s*([^=:;#\s][^=:]*?)\s*[=:]\s*(.*?)\s*$")
+
+TRUE_VALUES = frozenset({"1", "true", "yes", "on"})
+FALSE_VALUES = frozenset({"0", "false", "no", "off"})
+
+
+def parse_bool(value: str) -> bool:
+    """Coerce an INI string to bool, like configparser's getboolean().
+
+    Accepts 1/true/yes/on and 0/false/no/off (case-insensitive); anything
+    else raises ValueError rather than silently reading as False.
+    """
+    normalized = value.strip().lower()
+    if normalized in TRUE_VALUES:
+        return True
+    if normalized in FALSE_VALUES:
+        return False
+    raise ValueError(f"Not a boolean: {value}")
+
+
+def parse_ini(text: str) -> dict[str, dict[str, str]]:
+    """Parse INI text into ``{section: {OPTION: value}}``."""
+    sections: dict[str, dict[str, str]] = {}
+    current: dict[str, str] | None = None
+    last_key: str | None = None
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped[0] in "#;":
+            continue
+
+        # Indented line following an option continues its value
+        if line[0].isspace() and current is not None and last_key is not None:
+            current[last_key] += "\n" + stripped.replace("%%", "%")
+            continue
+
+        m = _SECTION_RE.match(line)
+        if m:
+            current = sections.setdefault(m.group(1).strip(), {})
+            last_key = None
+            continue
+
+        m = _OPTION_RE.match(line)
+        if m and current is not None:
+            last_key = m.group(1).upper()
+            current[last_key] = m.group(2).replace("%%", "%")
+
+    return sections
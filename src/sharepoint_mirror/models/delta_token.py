@@ -1,12 +1,31 @@
 """Delta token model for Graph API delta queries."""
 
+from collections.abc import Iterator
 from dataclasses import dataclass
-from datetime import UTC, datetime
 
-from sharepoint_mirror.db import get_db, transaction
+from sharepoint_mirror.db import get_db, transaction, utc_now_iso
 
+# Kept as fixed strings so APSW's per-connection statement cache can reuse
+# the prepared statements across calls
+_SQL_GET_BY_DRIVE = """
+    SELECT id, drive_id, delta_link, updated_at
+    FROM delta_token WHERE drive_id = ?
+"""
+_SQL_UPSERT = """
+    INSERT INTO delta_token (drive_id, delta_link, updated_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(drive_id) DO UPDATE SET
+        delta_link = excluded.delta_link,
+        updated_at = excluded.updated_at
+    RETURNING id, drive_id, delta_link, updated_at
+"""
+_SQL_GET_ALL = """
+    SELECT id, drive_id, delta_link, updated_at
+    FROM delta_token ORDER BY updated_at DESC
+"""
 
-@dataclass
+
+@dataclass(slots=True)
 class DeltaToken:
     """Stores delta link for Graph API delta queries per drive."""
 
@@ -17,49 +36,27 @@ class DeltaToken:
 
     @classmethod
     def from_row(cls, row: tuple) -> DeltaToken:
-        """Create a DeltaToken from a database row."""
-        return cls(
-            id=row[0],
-            drive_id=row[1],
-            delta_link=row[2],
-            updated_at=row[3],
-        )
+        """Create a DeltaToken from a database row (columns in field order)."""
+        return cls(row[0], row[1], row[2], row[3])
 
     @classmethod
     def get_by_drive_id(cls, drive_id: str) -> DeltaToken | None:
         """Get delta token for a drive."""
         db = get_db()
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT id, drive_id, delta_link, updated_at
-            FROM delta_token WHERE drive_id = ?
-            """,
-            (drive_id,),
-        )
+        cursor.execute(_SQL_GET_BY_DRIVE, (drive_id,))
         row = cursor.fetchone()
         return cls.from_row(row) if row else None
 
     @classmethod
     def upsert(cls, drive_id: str, delta_link: str) -> DeltaToken:
         """Create or update delta token for a drive."""
-        now = datetime.now(UTC).isoformat()
+        now = utc_now_iso()
 
         with transaction() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO delta_token (drive_id, delta_link, updated_at)
-                VALUES (?, ?, ?)
-                ON CONFLICT(drive_id) DO UPDATE SET
-                    delta_link = excluded.delta_link,
-                    updated_at = excluded.updated_at
-                """,
-                (drive_id, delta_link, now),
-            )
+            row = cursor.execute(_SQL_UPSERT, (drive_id, delta_link, now)).fetchone()
 
-        result = cls.get_by_drive_id(drive_id)
-        assert result is not None
-        return result
+        return cls.from_row(row)
 
     @classmethod
     def delete_by_drive_id(cls, drive_id: str) -> None:
@@ -76,12 +73,12 @@ class DeltaToken:
     @classmethod
     def get_all(cls) -> list[DeltaToken]:
         """Get all delta tokens."""
+        return list(cls.iter_all())
+
+    @classmethod
+    def iter_all(cls) -> Iterator[DeltaToken]:
+        """Yield all delta tokens, most recently updated first."""
         db = get_db()
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT id, drive_id, delta_link, updated_at
-            FROM delta_token ORDER BY updated_at DESC
-            """
-        )
-        return [cls.from_row(row) for row in cursor.fetchall()]
+        for row in cursor.execute(_SQL_GET_ALL):
+            yield cls.from_row(row)
@@ -1,13 +1,76 @@
 """Document model for SharePoint documents."""
 
+import json
+import time
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
-from datetime import UTC, datetime
 
-from sharepoint_mirror.db import get_db, transaction
+from flask import current_app
+
+from sharepoint_mirror.db import get_db, get_stat, transaction, utc_now_iso
 from sharepoint_mirror.models.file_blob import FileBlob
 
+# Document counts keyed by (database path, include_deleted, search). Documents
+# only change during a sync, which clears this cache; the TTL bounds staleness
+# when the sync runs in another process (the background worker).
+_COUNT_CACHE: dict[tuple[str, bool, str | None], tuple[float, int]] = {}
+_COUNT_CACHE_TTL = 30.0
+_COUNT_CACHE_MAX = 256
+
+# One fixed statement for every update so SQLite reuses the prepared plan;
+# a NULL parameter leaves that column unchanged.
+_SQL_UPDATE = """
+    UPDATE document SET
+        name = COALESCE(?, name),
+        path = COALESCE(?, path),
+        mime_type = COALESCE(?, mime_type),
+        file_size = COALESCE(?, file_size),
+        web_url = COALESCE(?, web_url),
+        created_by = COALESCE(?, created_by),
+        last_modified_by = COALESCE(?, last_modified_by),
+        sharepoint_created_at = COALESCE(?, sharepoint_created_at),
+        sharepoint_modified_at = COALESCE(?, sharepoint_modified_at),
+        quickxor_hash = COALESCE(?, quickxor_hash),
+        file_blob_id = COALESCE(?, file_blob_id),
+        is_deleted = COALESCE(?, is_deleted),
+        synced_at = ?,
+        updated_at = ?
+    WHERE id = ?
+"""
+
+
+# Listing statements with the include_deleted filter baked in, chosen per call
+# rather than concatenated, so each variant is one fixed string
+_SELECT_WITH_BLOB = """
+    SELECT d.id, d.sharepoint_item_id, d.sharepoint_drive_id, d.name, d.path,
+           d.mime_type, d.file_size, d.web_url, d.created_by, d.last_modified_by,
+           d.sharepoint_created_at, d.sharepoint_modified_at, d.quickxor_hash,
+           d.file_blob_id, d.is_deleted, d.synced_at, d.created_at, d.updated_at,
+           drive.name,
+           b.id, b.sha256_hash, b.file_size, b.mime_type, b.reference_count,
+           b.created_at
+    FROM document d
+    LEFT JOIN drive ON drive.id = d.sharepoint_drive_id
+    LEFT JOIN file_blob b ON b.id = d.file_blob_id
+"""
+_SQL_ALL_WITH_BLOB_ALL = _SELECT_WITH_BLOB + " ORDER BY d.path, d.id"
+_SQL_ALL_WITH_BLOB_ACTIVE = _SELECT_WITH_BLOB + " WHERE d.is_deleted = 0 ORDER BY d.path, d.id"
+
+_SELECT_BY_DRIVE = """
+    SELECT id, sharepoint_item_id, sharepoint_drive_id, name, path,
+           mime_type, file_size, web_url, created_by, last_modified_by,
+           sharepoint_created_at, sharepoint_modified_at, quickxor_hash,
+           file_blob_id, is_deleted, synced_at, created_at, updated_at
+    FROM document WHERE sharepoint_drive_id = ?
+"""
+_SQL_BY_DRIVE_ALL = _SELECT_BY_DRIVE + " ORDER BY path"
+_SQL_BY_DRIVE_ACTIVE = _SELECT_BY_DRIVE + " AND is_deleted = 0 ORDER BY path"
+
+_SQL_COUNT_SEARCH_ALL = "SELECT COUNT(*) FROM document WHERE (name LIKE ? OR path LIKE ?)"
+_SQL_COUNT_SEARCH_ACTIVE = _SQL_COUNT_SEARCH_ALL + " AND is_deleted = 0"
 
-@dataclass
+
+@dataclass(slots=True)
 class Document:
     """Represents a SharePoint document."""
 
@@ -29,29 +92,34 @@ class Document:
     synced_at: str
     created_at: str
     updated_at: str
+    # Library name, only populated by queries that join the drive table
+    drive_name: str | None = None
 
     @classmethod
     def from_row(cls, row: tuple) -> Document:
-        """Create a Document from a database row."""
+        """Create a Document from a database row (optionally followed by drive name)."""
+        # Positional construction: columns are selected in field order, and this
+        # runs once per row of every listing
         return cls(
-            id=row[0],
-            sharepoint_item_id=row[1],
-            sharepoint_drive_id=row[2],
-            name=row[3],
-            path=row[4],
-            mime_type=row[5],
-            file_size=row[6],
-            web_url=row[7],
-            created_by=row[8],
-            last_modified_by=row[9],
-            sharepoint_created_at=row[10],
-            sharepoint_modified_at=row[11],
-            quickxor_hash=row[12],
-            file_blob_id=row[13],
-            is_deleted=bool(row[14]),
-            synced_at=row[15],
-            created_at=row[16],
-            updated_at=row[17],
+            row[0],
+            row[1],
+            row[2],
+            row[3],
+            row[4],
+            row[5],
+            row[6],
+            row[7],
+            row[8],
+            row[9],
+            row[10],
+            row[11],
+            row[12],
+            row[13],
+            bool(row[14]),
+            row[15],
+            row[16],
+            row[17],
+            row[18] if len(row) > 18 else None,
         )
 
     @classmethod
@@ -72,6 +140,33 @@ class Document:
         row = cursor.fetchone()
         return cls.from_row(row) if row else None
 
+    @classmethod
+    def get_with_blob(cls, doc_id: int) -> tuple[Document, FileBlob | None] | None:
+        """Get a document (with drive_name) and its file blob in a single query."""
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            SELECT d.id, d.sharepoint_item_id, d.sharepoint_drive_id, d.name, d.path,
+                   d.mime_type, d.file_size, d.web_url, d.created_by, d.last_modified_by,
+                   d.sharepoint_created_at, d.sharepoint_modified_at, d.quickxor_hash,
+                   d.file_blob_id, d.is_deleted, d.synced_at, d.created_at, d.updated_at,
+                   drive.name,
+                   b.id, b.sha256_hash, b.file_size, b.mime_type, b.reference_count,
+                   b.created_at
+            FROM document d
+            LEFT JOIN drive ON drive.id = d.sharepoint_drive_id
+            LEFT JOIN file_blob b ON b.id = d.file_blob_id
+            WHERE d.id = ?
+            """,
+            (doc_id,),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        blob = FileBlob.from_row(row[19:]) if row[19] is not None else None
+        return cls.from_row(row[:19]), blob
+
     @classmethod
     def get_by_item_id(cls, sharepoint_item_id: str, sharepoint_drive_id: str) -> Document | None:
         """Get a document by SharePoint item ID and drive ID."""
@@ -90,6 +185,28 @@ class Document:
         row = cursor.fetchone()
         return cls.from_row(row) if row else None
 
+    @classmethod
+    def get_by_item_ids(
+        cls, sharepoint_drive_id: str, sharepoint_item_ids: Iterable[str]
+    ) -> dict[str, Document]:
+        """Get the documents for many SharePoint item IDs in one drive, keyed by item ID."""
+        db = get_db()
+        cursor = db.cursor()
+        # The IDs go in as one JSON array, so any number fits a single cached statement
+        cursor.execute(
+            """
+            SELECT id, sharepoint_item_id, sharepoint_drive_id, name, path,
+                   mime_type, file_size, web_url, created_by, last_modified_by,
+                   sharepoint_created_at, sharepoint_modified_at, quickxor_hash,
+                   file_blob_id, is_deleted, synced_at, created_at, updated_at
+            FROM document
+            WHERE sharepoint_drive_id = ?
+              AND sharepoint_item_id IN (SELECT value FROM json_each(?))
+            """,
+            (sharepoint_drive_id, json.dumps(list(sharepoint_item_ids))),
+        )
+        return {row[1]: cls.from_row(row) for row in cursor}
+
     @classmethod
     def create(
         cls,
@@ -106,12 +223,13 @@ class Document:
         sharepoint_modified_at: str | None = None,
         quickxor_hash: str | None = None,
         file_blob_id: int | None = None,
+        now: str | None = None,
     ) -> Document:
-        """Create a new document."""
-        now = datetime.now(UTC).isoformat()
+        """Create a new document (``now`` lets a caller share one timestamp across a batch)."""
+        now = now or utc_now_iso()
 
         with transaction() as cursor:
-            cursor.execute(
+            row = cursor.execute(
                 """
                 INSERT INTO document (
                     sharepoint_item_id, sharepoint_drive_id, name, path,
@@ -119,6 +237,10 @@ class Document:
                     sharepoint_created_at, sharepoint_modified_at, quickxor_hash,
                     file_blob_id, is_deleted, synced_at, created_at, updated_at
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+                RETURNING id, sharepoint_item_id, sharepoint_drive_id, name, path,
+                          mime_type, file_size, web_url, created_by, last_modified_by,
+                          sharepoint_created_at, sharepoint_modified_at, quickxor_hash,
+                          file_blob_id, is_deleted, synced_at, created_at, updated_at
                 """,
                 (
                     sharepoint_item_id,
@@ -138,14 +260,9 @@ class Document:
                     now,
                     now,
                 ),
-            )
-            row = cursor.execute("SELECT last_insert_rowid()").fetchone()
-            assert row is not None
-            doc_id = row[0]
+            ).fetchone()
 
-        result = cls.get_by_id(doc_id)
-        assert result is not None
-        return result
+        return cls.from_row(row)
 
     def update(
         self,
@@ -161,68 +278,58 @@ class Document:
         quickxor_hash: str | None = None,
         file_blob_id: int | None = None,
         is_deleted: bool | None = None,
+        now: str | None = None,
     ) -> Document:
-        """Update document fields."""
-        now = datetime.now(UTC).isoformat()
-
-        updates = []
-        params = []
-
-        if name is not None:
-            updates.append("name = ?")
-            params.append(name)
-        if path is not None:
-            updates.append("path = ?")
-            params.append(path)
-        if mime_type is not None:
-            updates.append("mime_type = ?")
-            params.append(mime_type)
-        if file_size is not None:
-            updates.append("file_size = ?")
-            params.append(file_size)
-        if web_url is not None:
-            updates.append("web_url = ?")
-            params.append(web_url)
-        if created_by is not None:
-            updates.append("created_by = ?")
-            params.append(created_by)
-        if last_modified_by is not None:
-            updates.append("last_modified_by = ?")
-            params.append(last_modified_by)
-        if sharepoint_created_at is not None:
-            updates.append("sharepoint_created_at = ?")
-            params.append(sharepoint_created_at)
-        if sharepoint_modified_at is not None:
-            updates.append("sharepoint_modified_at = ?")
-            params.append(sharepoint_modified_at)
-        if quickxor_hash is not None:
-            updates.append("quickxor_hash = ?")
-            params.append(quickxor_hash)
-        if file_blob_id is not None:
-            updates.append("file_blob_id = ?")
-            params.append(file_blob_id)
-        if is_deleted is not None:
-            updates.append("is_deleted = ?")
-            params.append(1 if is_deleted else 0)
-
-        updates.append("synced_at = ?")
-        params.append(now)
-        updates.append("updated_at = ?")
-        params.append(now)
-
-        params.append(self.id)
+        """Update document fields (None leaves a field unchanged) and return self."""
+        now = now or utc_now_iso()
 
         with transaction() as cursor:
             cursor.execute(
-                f"UPDATE document SET {', '.join(updates)} WHERE id = ?",
-                params,
+                _SQL_UPDATE,
+                (
+                    name,
+                    path,
+                    mime_type,
+                    file_size,
+                    web_url,
+                    created_by,
+                    last_modified_by,
+                    sharepoint_created_at,
+                    sharepoint_modified_at,
+                    quickxor_hash,
+                    file_blob_id,
+                    is_deleted,
+                    now,
+                    now,
+                    self.id,
+                ),
             )
 
-        return self.get_by_id(self.id)  # type: ignore
+        # Mirror the write on this instance rather than re-reading the row
+        changes = {
+            "name": name,
+            "path": path,
+            "mime_type": mime_type,
+            "file_size": file_size,
+            "web_url": web_url,
+            "created_by": created_by,
+            "last_modified_by": last_modified_by,
+            "sharepoint_created_at": sharepoint_created_at,
+            "sharepoint_modified_at": sharepoint_modified_at,
+            "quickxor_hash": quickxor_hash,
+            "file_blob_id": file_blob_id,
+            "is_deleted": is_deleted,
+        }
+        for field, value in changes.items():
+            if value is not None:
+                setattr(self, field, value)
+        self.synced_at = now
+        self.updated_at = now
+        return self
 
-    def soft_delete(self) -> Document:
+    def soft_delete(self, now: str | None = None) -> Document:
         """Mark document as deleted."""
-        return self.update(is_deleted=True)
+        return self.update(is_deleted=True, now=now)
 
     def get_blob(self) -> FileBlob | None:
         """Get the associated file blob."""
@@ -230,6 +337,63 @@ class Document:
             return None
         return FileBlob.get_by_id(self.file_blob_id)
 
+    @staticmethod
+    def _all_query(
+        include_deleted: bool,
+        search: str | None,
+        limit: int | None,
+        offset: int,
+        after_id: int | None,
+    ) -> tuple[str, list]:
+        """Build the SELECT (and parameters) shared by get_all and iter_all."""
+        conditions = []
+        params: list = []
+
+        if search:
+            search_pattern = f"%{search}%"
+            conditions.append("(d.name LIKE ? OR d.path LIKE ?)")
+            params.extend([search_pattern, search_pattern])
+        if not include_deleted:
+            conditions.append("d.is_deleted = 0")
+        if after_id is not None:
+            conditions.append("(d.path, d.id) > (SELECT path, id FROM document WHERE id = ?)")
+            params.append(after_id)
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+        if limit:
+            if after_id is not None:
+                page_clause = "LIMIT ?"
+                params.append(limit)
+            else:
+                page_clause = "LIMIT ? OFFSET ?"
+                params.extend([limit, offset])
+            query = f"""
+                WITH ids AS (
+                    SELECT d.id FROM document d{where} ORDER BY d.path, d.id {page_clause}
+                )
+                SELECT d.id, d.sharepoint_item_id, d.sharepoint_drive_id, d.name, d.path,
+                       d.mime_type, d.file_size, d.web_url, d.created_by, d.last_modified_by,
+                       d.sharepoint_created_at, d.sharepoint_modified_at, d.quickxor_hash,
+                       d.file_blob_id, d.is_deleted, d.synced_at, d.created_at, d.updated_at,
+                       drive.name
+                FROM document d JOIN ids USING (id)
+                LEFT JOIN drive ON drive.id = d.sharepoint_drive_id
+                ORDER BY d.path, d.id
+            """
+        else:
+            query = f"""
+                SELECT d.id, d.sharepoint_item_id, d.sharepoint_drive_id, d.name, d.path,
+                       d.mime_type, d.file_size, d.web_url, d.created_by, d.last_modified_by,
+                       d.sharepoint_created_at, d.sharepoint_modified_at, d.quickxor_hash,
+                       d.file_blob_id, d.is_deleted, d.synced_at, d.created_at, d.updated_at,
+                       drive.name
+                FROM document d
+                LEFT JOIN drive ON drive.id = d.sharepoint_drive_id{where}
+                ORDER BY d.path, d.id
+            """
+        return query, params
+
     @classmethod
     def get_all(
         cls,
@@ -237,94 +401,96 @@ class Document:
         search: str | None = None,
         limit: int | None = None,
         offset: int = 0,
+        after_id: int | None = None,
     ) -> list[Document]:
-        """Get all documents with optional filtering."""
+        """Get all documents with optional filtering.
+
+        Results are ordered by path, with drive_name filled in. Pass
+        ``after_id`` (the id of the last document on the previous page) to
+        seek directly to the next page instead of skipping ``offset`` rows.
+        Paged queries pick the page's ids first and only then fetch the full
+        rows for those ids.
+        """
         db = get_db()
         cursor = db.cursor()
+        query, params = cls._all_query(include_deleted, search, limit, offset, after_id)
+        return [cls.from_row(row) for row in cursor.execute(query, params)]
 
-        if search:
-            search_pattern = f"%{search}%"
-            query = """
-                SELECT id, sharepoint_item_id, sharepoint_drive_id, name, path,
-                       mime_type, file_size, web_url, created_by, last_modified_by,
-                       sharepoint_created_at, sharepoint_modified_at, quickxor_hash,
-                       file_blob_id, is_deleted, synced_at, created_at, updated_at
-                FROM document
-                WHERE (name LIKE ? OR path LIKE ?)
-            """
-            params: list = [search_pattern, search_pattern]
-            if not include_deleted:
-                query += " AND is_deleted = 0"
-            query += " ORDER BY path"
-        else:
-            query = """
-                SELECT id, sharepoint_item_id, sharepoint_drive_id, name, path,
-                       mime_type, file_size, web_url, created_by, last_modified_by,
-                       sharepoint_created_at, sharepoint_modified_at, quickxor_hash,
-                       file_blob_id, is_deleted, synced_at, created_at, updated_at
-                FROM document
-            """
-            params = []
-            if not include_deleted:
-                query += " WHERE is_deleted = 0"
-            query += " ORDER BY path"
-
-        if limit:
-            query += " LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
+    @classmethod
+    def iter_all(
+        cls, include_deleted: bool = False, search: str | None = None
+    ) -> Iterator[Document]:
+        """Yield documents like get_all, stepping one cursor instead of building a list."""
+        db = get_db()
+        cursor = db.cursor()
+        query, params = cls._all_query(include_deleted, search, None, 0, None)
+        for row in cursor.execute(query, params):
+            yield cls.from_row(row)
 
-        cursor.execute(query, params)
-        return [cls.from_row(row) for row in cursor.fetchall()]
+    @classmethod
+    def iter_all_with_blob(
+        cls, include_deleted: bool = False
+    ) -> Iterator[tuple[Document, FileBlob | None]]:
+        """Yield (document, blob) pairs in path order from a single joined query."""
+        db = get_db()
+        cursor = db.cursor()
+        query = _SQL_ALL_WITH_BLOB_ALL if include_deleted else _SQL_ALL_WITH_BLOB_ACTIVE
+        for row in cursor.execute(query):
+            blob = FileBlob.from_row(row[19:]) if row[19] is not None else None
+            yield cls.from_row(row[:19]), blob
 
     @classmethod
     def count_all(cls, include_deleted: bool = False, search: str | None = None) -> int:
-        """Count total number of documents."""
+        """Count total number of documents.
+
+        Unfiltered counts come from the stats table; search counts are cached
+        briefly (see invalidate_count_cache).
+        """
+        if not search:
+            return get_stat("document_count_all" if include_deleted else "document_count")
+
+        key = (current_app.config["DATABASE_PATH"], include_deleted, search)
+        now = time.monotonic()
+        cached = _COUNT_CACHE.get(key)
+        if cached is not None and now - cached[0] < _COUNT_CACHE_TTL:
+            return cached[1]
+
         db = get_db()
         cursor = db.cursor()
 
-        if search:
-            search_pattern = f"%{search}%"
-            query = "SELECT COUNT(*) FROM document WHERE (name LIKE ? OR path LIKE ?)"
-            params: list = [search_pattern, search_pattern]
-            if not include_deleted:
-                query += " AND is_deleted = 0"
-            cursor.execute(query, params)
-        elif include_deleted:
-            cursor.execute("SELECT COUNT(*) FROM document")
-        else:
-            cursor.execute("SELECT COUNT(*) FROM document WHERE is_deleted = 0")
+        search_pattern = f"%{search}%"
+        query = _SQL_COUNT_SEARCH_ALL if include_deleted else _SQL_COUNT_SEARCH_ACTIVE
+        cursor.execute(query, (search_pattern, search_pattern))
 
         row = cursor.fetchone()
         assert row is not None
-        return int(row[0])
+        count = int(row[0])
+
+        if len(_COUNT_CACHE) >= _COUNT_CACHE_MAX:
+            _COUNT_CACHE.clear()
+        _COUNT_CACHE[key] = (now, count)
+        return count
+
+    @staticmethod
+    def invalidate_count_cache() -> None:
+        """Drop cached document counts (call after documents are added or removed)."""
+        _COUNT_CACHE.clear()
 
     @classmethod
     def total_size(cls, include_deleted: bool = False) -> int:
-        """Get total size of all documents."""
-        db = get_db()
-        cursor = db.cursor()
-        if include_deleted:
-            cursor.execute("SELECT COALESCE(SUM(file_size), 0) FROM document")
-        else:
-            cursor.execute("SELECT COALESCE(SUM(file_size), 0) FROM document WHERE is_deleted = 0")
-        row = cursor.fetchone()
-        assert row is not None
-        return int(row[0])
+        """Get total size of all documents (from the stats table)."""
+        return get_stat("document_size_all" if include_deleted else "document_size")
 
     @classmethod
     def get_by_drive(cls, drive_id: str, include_deleted: bool = False) -> list[Document]:
         """Get all documents for a specific drive."""
+        return list(cls.iter_by_drive(drive_id, include_deleted))
+
+    @classmethod
+    def iter_by_drive(cls, drive_id: str, include_deleted: bool = False) -> Iterator[Document]:
+        """Yield the documents of a specific drive in path order."""
         db = get_db()
         cursor = db.cursor()
-        query = """
-            SELECT id, sharepoint_item_id, sharepoint_drive_id, name, path,
-                   mime_type, file_size, web_url, created_by, last_modified_by,
-                   sharepoint_created_at, sharepoint_modified_at, quickxor_hash,
-                   file_blob_id, is_deleted, synced_at, created_at, updated_at
-            FROM document WHERE sharepoint_drive_id = ?
-        """
-        if not include_deleted:
-            query += " AND is_deleted = 0"
-        query += " ORDER BY path"
-        cursor.execute(query, (drive_id,))
-        return [cls.from_row(row) for row in cursor.fetchall()]
+        query = _SQL_BY_DRIVE_ALL if include_deleted else _SQL_BY_DRIVE_ACTIVE
+        for row in cursor.execute(query, (drive_id,)):
+            yield cls.from_row(row)
@@ -8,7 +8,7 @@ from typing import Any
 from sharepoint_mirror.db import get_db, transaction
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentMetadata:
     """A single metadata field value for a document."""
 
@@ -19,12 +19,7 @@ class DocumentMetadata:
 
     @staticmethod
     def from_row(row: tuple) -> DocumentMetadata:
-        return DocumentMetadata(
-            id=row[0],
-            document_id=row[1],
-            field_name=row[2],
-            field_value=row[3],
-        )
+        return DocumentMetadata(row[0], row[1], row[2], row[3])
 
     @staticmethod
     def replace_for_document(document_id: int, fields: dict[str, Any]) -> None:
@@ -1,12 +1,22 @@
 """Drive model for SharePoint document library lookup."""
 
+import time
+from collections.abc import Mapping
 from dataclasses import dataclass
-from datetime import UTC, datetime
+from types import MappingProxyType
 
-from sharepoint_mirror.db import get_db, transaction
+from flask import current_app
 
+from sharepoint_mirror.db import get_db, transaction, utc_now_iso
 
-@dataclass
+# Read-only {drive id: Drive} maps keyed by database path. Drives only change
+# during a sync (upsert clears this); the TTL bounds staleness when the sync
+# runs in another process (the background worker).
+_DRIVES_CACHE: dict[str, tuple[float, Mapping[str, Drive]]] = {}
+_DRIVES_CACHE_TTL = 300.0
+
+
+@dataclass(slots=True)
 class Drive:
     """Stores drive ID to library name mapping."""
 
@@ -17,33 +27,20 @@ class Drive:
 
     @classmethod
     def from_row(cls, row: tuple) -> Drive:
-        """Create a Drive from a database row."""
-        return cls(
-            id=row[0],
-            name=row[1],
-            web_url=row[2],
-            updated_at=row[3],
-        )
+        """Create a Drive from a database row (columns in field order)."""
+        return cls(row[0], row[1], row[2], row[3])
 
     @classmethod
     def get_by_id(cls, drive_id: str) -> Drive | None:
-        """Get drive by ID."""
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT id, name, web_url, updated_at
-            FROM drive WHERE id = ?
-            """,
-            (drive_id,),
-        )
-        row = cursor.fetchone()
-        return cls.from_row(row) if row else None
+        """Get drive by ID (served from the cached drive map)."""
+        return cls.get_all_cached().get(drive_id)
 
     @classmethod
-    def upsert(cls, drive_id: str, name: str, web_url: str | None = None) -> Drive:
+    def upsert(
+        cls, drive_id: str, name: str, web_url: str | None = None, now: str | None = None
+    ) -> Drive:
         """Create or update drive record."""
-        now = datetime.now(UTC).isoformat()
+        now = now or utc_now_iso()
 
         with transaction() as cursor:
             cursor.execute(
@@ -57,10 +54,9 @@ class Drive:
                 """,
                 (drive_id, name, web_url, now),
             )
+        cls.invalidate_cache()
 
-        result = cls.get_by_id(drive_id)
-        assert result is not None
-        return result
+        return cls(id=drive_id, name=name, web_url=web_url, updated_at=now)
 
     @classmethod
     def get_all(cls) -> list[Drive]:
@@ -73,4 +69,22 @@ class Drive:
             FROM drive ORDER BY name
             """
         )
-        return [cls.from_row(row) for row in cursor.fetchall()]
+        return [cls.from_row(row) for row in cursor]
+
+    @classmethod
+    def get_all_cached(cls) -> Mapping[str, Drive]:
+        """Get a read-only {drive id: Drive} map, cached between syncs."""
+        key = current_app.config["DATABASE_PATH"]
+        now = time.monotonic()
+        cached = _DRIVES_CACHE.get(key)
+        if cached is not None and now - cached[0] < _DRIVES_CACHE_TTL:
+            return cached[1]
+
+        drives = MappingProxyType({d.id: d for d in cls.get_all()})
+        _DRIVES_CACHE[key] = (now, drives)
+        return drives
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """Drop cached drive maps (called when drives are added or renamed)."""
+        _DRIVES_CACHE.clear()
@@ -1,15 +1,21 @@
 """File blob model for content-addressed storage."""
 
+import functools
 from dataclasses import dataclass
-from datetime import UTC, datetime
 from pathlib import Path
 
 from flask import current_app
 
-from sharepoint_mirror.db import get_db, transaction
+from sharepoint_mirror.db import get_db, get_stat, transaction, utc_now_iso
 
 
-@dataclass
+@functools.lru_cache(maxsize=8)
+def _blobs_root(blobs_directory: str) -> Path:
+    """Parse the configured blobs directory once per distinct setting."""
+    return Path(blobs_directory)
+
+
+@dataclass(slots=True)
 class FileBlob:
     """Represents a deduplicated file blob stored by content hash."""
 
@@ -22,15 +28,8 @@ class FileBlob:
 
     @classmethod
     def from_row(cls, row: tuple) -> FileBlob:
-        """Create a FileBlob from a database row."""
-        return cls(
-            id=row[0],
-            sha256_hash=row[1],
-            file_size=row[2],
-            mime_type=row[3],
-            reference_count=row[4],
-            created_at=row[5],
-        )
+        """Create a FileBlob from a database row (columns in field order)."""
+        return cls(row[0], row[1], row[2], row[3], row[4], row[5])
 
     @classmethod
     def get_by_id(cls, blob_id: int) -> FileBlob | None:
@@ -65,39 +64,21 @@ class FileBlob:
     @classmethod
     def create(cls, sha256_hash: str, file_size: int, mime_type: str) -> FileBlob:
         """Create a new blob record or increment reference count if exists."""
-        now = datetime.now(UTC).isoformat()
+        now = utc_now_iso()
 
         with transaction() as cursor:
-            # Try to find existing blob
-            cursor.execute(
-                "SELECT id FROM file_blob WHERE sha256_hash = ?",
-                (sha256_hash,),
-            )
-            existing = cursor.fetchone()
-
-            if existing:
-                # Increment reference count
-                cursor.execute(
-                    "UPDATE file_blob SET reference_count = reference_count + 1 WHERE id = ?",
-                    (existing[0],),
-                )
-                blob_id = existing[0]
-            else:
-                # Create new blob
-                cursor.execute(
-                    """
-                    INSERT INTO file_blob (sha256_hash, file_size, mime_type, reference_count, created_at)
-                    VALUES (?, ?, ?, 1, ?)
-                    """,
-                    (sha256_hash, file_size, mime_type, now),
-                )
-                row = cursor.execute("SELECT last_insert_rowid()").fetchone()
-                assert row is not None
-                blob_id = row[0]
-
-        result = cls.get_by_id(blob_id)
-        assert result is not None
-        return result
+            # Insert, or bump the reference count of the existing blob with this hash
+            row = cursor.execute(
+                """
+                INSERT INTO file_blob (sha256_hash, file_size, mime_type, reference_count, created_at)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT(sha256_hash) DO UPDATE SET reference_count = reference_count + 1
+                RETURNING id, sha256_hash, file_size, mime_type, reference_count, created_at
+                """,
+                (sha256_hash, file_size, mime_type, now),
+            ).fetchone()
+
+        return cls.from_row(row)
 
     def decrement_reference(self) -> bool:
         """
@@ -105,12 +86,13 @@ class FileBlob:
         (reference count reached 0).
         """
         with transaction() as cursor:
-            cursor.execute(
-                "UPDATE file_blob SET reference_count = reference_count - 1 WHERE id = ?",
+            row = cursor.execute(
+                """
+                UPDATE file_blob SET reference_count = reference_count - 1 WHERE id = ?
+                RETURNING reference_count
+                """,
                 (self.id,),
-            )
-            cursor.execute("SELECT reference_count FROM file_blob WHERE id = ?", (self.id,))
-            row = cursor.fetchone()
+            ).fetchone()
             return row is not None and row[0] <= 0
 
     def delete(self) -> None:
@@ -120,32 +102,22 @@ class FileBlob:
 
     def get_path(self) -> Path:
         """Get the filesystem path for this blob."""
-        blobs_dir = Path(current_app.config["BLOBS_DIRECTORY"])
-        # Use 2-level directory structure: {hash[:2]}/{hash[2:4]}/{hash}
-        return blobs_dir / self.sha256_hash[:2] / self.sha256_hash[2:4] / self.sha256_hash
+        return self.get_path_for_hash(self.sha256_hash)
 
     @classmethod
     def get_path_for_hash(cls, sha256_hash: str) -> Path:
         """Get the filesystem path for a given hash (static method)."""
-        blobs_dir = Path(current_app.config["BLOBS_DIRECTORY"])
-        return blobs_dir / sha256_hash[:2] / sha256_hash[2:4] / sha256_hash
+        # Use 2-level directory structure: {hash[:2]}/{hash[2:4]}/{hash}
+        return _blobs_root(current_app.config["BLOBS_DIRECTORY"]).joinpath(
+            sha256_hash[:2], sha256_hash[2:4], sha256_hash
+        )
 
     @classmethod
     def count_all(cls) -> int:
-        """Count total number of blobs."""
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT COUNT(*) FROM file_blob")
-        row = cursor.fetchone()
-        assert row is not None
-        return int(row[0])
+        """Count total number of blobs (from the stats table)."""
+        return get_stat("blob_count")
 
     @classmethod
     def total_size(cls) -> int:
-        """Get total size of all blobs."""
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT COALESCE(SUM(file_size), 0) FROM file_blob")
-        row = cursor.fetchone()
-        assert row is not None
-        return int(row[0])
+        """Get total size of all blobs (from the stats table)."""
+        return get_stat("blob_size")
@@ -1,12 +1,25 @@
 """Sync event model for tracking individual file changes."""
 
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
-from datetime import UTC, datetime
 
-from sharepoint_mirror.db import get_db, transaction
+from sharepoint_mirror.db import get_db, transaction, utc_now_iso
 
+_SQL_BY_RUN = """
+    SELECT id, sync_run_id, document_id, event_type, sharepoint_item_id,
+           name, path, file_size, file_blob_id, logged_at
+    FROM sync_event WHERE sync_run_id = ?
+    ORDER BY logged_at
+"""
+_SQL_BY_RUN_AND_TYPE = """
+    SELECT id, sync_run_id, document_id, event_type, sharepoint_item_id,
+           name, path, file_size, file_blob_id, logged_at
+    FROM sync_event WHERE sync_run_id = ? AND event_type = ?
+    ORDER BY logged_at
+"""
 
-@dataclass
+
+@dataclass(slots=True)
 class SyncEvent:
     """Represents an individual sync event (add/remove/modify)."""
 
@@ -23,19 +36,8 @@ class SyncEvent:
 
     @classmethod
     def from_row(cls, row: tuple) -> SyncEvent:
-        """Create a SyncEvent from a database row."""
-        return cls(
-            id=row[0],
-            sync_run_id=row[1],
-            document_id=row[2],
-            event_type=row[3],
-            sharepoint_item_id=row[4],
-            name=row[5],
-            path=row[6],
-            file_size=row[7],
-            file_blob_id=row[8],
-            logged_at=row[9],
-        )
+        """Create a SyncEvent from a database row (columns in field order)."""
+        return cls(row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8], row[9])
 
     @classmethod
     def get_by_id(cls, event_id: int) -> SyncEvent | None:
@@ -66,15 +68,17 @@ class SyncEvent:
         file_blob_id: int | None = None,
     ) -> SyncEvent:
         """Create a new sync event."""
-        now = datetime.now(UTC).isoformat()
+        now = utc_now_iso()
 
         with transaction() as cursor:
-            cursor.execute(
+            row = cursor.execute(
                 """
                 INSERT INTO sync_event (
                     sync_run_id, document_id, event_type, sharepoint_item_id,
                     name, path, file_size, file_blob_id, logged_at
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING id, sync_run_id, document_id, event_type, sharepoint_item_id,
+                          name, path, file_size, file_blob_id, logged_at
                 """,
                 (
                     sync_run_id,
@@ -87,43 +91,62 @@ class SyncEvent:
                     file_blob_id,
                     now,
                 ),
-            )
-            row = cursor.execute("SELECT last_insert_rowid()").fetchone()
-            assert row is not None
-            event_id = row[0]
+            ).fetchone()
 
-        result = cls.get_by_id(event_id)
-        assert result is not None
-        return result
+        return cls.from_row(row)
+
+    @classmethod
+    def create_many(cls, sync_run_id: int, events: Iterable[dict]) -> None:
+        """Create several sync events for a run in one transaction.
+
+        Each event is a dict of the keyword arguments accepted by create().
+        """
+        now = utc_now_iso()
+
+        with transaction() as cursor:
+            cursor.executemany(
+                """
+                INSERT INTO sync_event (
+                    sync_run_id, document_id, event_type, sharepoint_item_id,
+                    name, path, file_size, file_blob_id, logged_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    (
+                        sync_run_id,
+                        event.get("document_id"),
+                        event["event_type"],
+                        event["sharepoint_item_id"],
+                        event["name"],
+                        event["path"],
+                        event.get("file_size"),
+                        event.get("file_blob_id"),
+                        now,
+                    )
+                    for event in events
+                ),
+            )
 
     @classmethod
     def get_by_sync_run(cls, sync_run_id: int, event_type: str | None = None) -> list[SyncEvent]:
         """Get all events for a sync run, optionally filtered by type."""
+        return list(cls.iter_by_sync_run(sync_run_id, event_type))
+
+    @classmethod
+    def iter_by_sync_run(
+        cls, sync_run_id: int, event_type: str | None = None
+    ) -> Iterator[SyncEvent]:
+        """Yield the events of a sync run in logged order, optionally filtered by type."""
         db = get_db()
         cursor = db.cursor()
 
         if event_type:
-            cursor.execute(
-                """
-                SELECT id, sync_run_id, document_id, event_type, sharepoint_item_id,
-                       name, path, file_size, file_blob_id, logged_at
-                FROM sync_event WHERE sync_run_id = ? AND event_type = ?
-                ORDER BY logged_at
-                """,
-                (sync_run_id, event_type),
-            )
+            cursor.execute(_SQL_BY_RUN_AND_TYPE, (sync_run_id, event_type))
         else:
-            cursor.execute(
-                """
-                SELECT id, sync_run_id, document_id, event_type, sharepoint_item_id,
-                       name, path, file_size, file_blob_id, logged_at
-                FROM sync_event WHERE sync_run_id = ?
-                ORDER BY logged_at
-                """,
-                (sync_run_id,),
-            )
+            cursor.execute(_SQL_BY_RUN, (sync_run_id,))
 
-        return [cls.from_row(row) for row in cursor.fetchall()]
+        for row in cursor:
+            yield cls.from_row(row)
 
     @classmethod
     def get_recent(cls, limit: int = 50) -> list[SyncEvent]:
@@ -138,7 +161,7 @@ class SyncEvent:
             """,
             (limit,),
         )
-        return [cls.from_row(row) for row in cursor.fetchall()]
+        return [cls.from_row(row) for row in cursor]
 
     @classmethod
     def count_by_type(cls, sync_run_id: int) -> dict[str, int]:
@@ -152,8 +175,4 @@ class SyncEvent:
             """,
             (sync_run_id,),
         )
-        result: dict[str, int] = {}
-        for row in cursor.fetchall():
-            if row[0] is not None and row[1] is not None:
-                result[str(row[0])] = int(row[1])
-        return result
+        return dict(cursor)
@@ -1,12 +1,72 @@
 """Sync run model for tracking sync operations."""
 
-from dataclasses import dataclass
-from datetime import UTC, datetime
+import time
+from dataclasses import dataclass, field
 
-from sharepoint_mirror.db import get_db, transaction
+from sharepoint_mirror.db import get_db, transaction, utc_now_iso
 
+# Buffered counter increments are written once this many files have been
+# counted, or once this many seconds have passed since the last write.
+FLUSH_EVERY = 1000
+FLUSH_INTERVAL = 1.0
 
-@dataclass
+# Columns in SyncRun field order, shared by every query that builds a SyncRun
+_COLUMNS = """id, status, started_at, completed_at, is_full_sync, sync_type,
+    files_added, files_modified, files_removed, files_unchanged,
+    files_skipped, bytes_downloaded, error_message"""
+_SELECT = f"SELECT {_COLUMNS} FROM sync_run"
+_SQL_CREATE = f"""
+    INSERT INTO sync_run (status, started_at, is_full_sync, sync_type)
+    VALUES ('running', ?, ?, ?)
+    RETURNING {_COLUMNS}
+"""
+_SQL_COMPLETE = f"""
+    UPDATE sync_run SET
+        status = 'completed',
+        completed_at = ?,
+        files_added = ?,
+        files_modified = ?,
+        files_removed = ?,
+        files_unchanged = ?,
+        files_skipped = ?,
+        bytes_downloaded = ?
+    WHERE id = ?
+    RETURNING {_COLUMNS}
+"""
+_SQL_FAIL = f"""
+    UPDATE sync_run SET
+        status = 'failed',
+        completed_at = ?,
+        error_message = ?
+    WHERE id = ?
+    RETURNING {_COLUMNS}
+"""
+_SQL_GET_BY_ID = _SELECT + " WHERE id = ?"
+_SQL_GET_LATEST = _SELECT + " ORDER BY started_at DESC LIMIT 1"
+_SQL_GET_RUNNING = _SELECT + " WHERE status = 'running' ORDER BY started_at DESC LIMIT 1"
+_SQL_RECENT_BEFORE = (
+    _SELECT
+    + " WHERE (started_at, id) < (SELECT started_at, id FROM sync_run WHERE id = ?)"
+    + " ORDER BY started_at DESC, id DESC LIMIT ?"
+)
+_SQL_RECENT = _SELECT + " ORDER BY started_at DESC, id DESC LIMIT ? OFFSET ?"
+
+
+@dataclass(slots=True)
+class _CounterBuffer:
+    """Counter increments not yet written to the sync_run row."""
+
+    added: int = 0
+    modified: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    bytes_downloaded: int = 0
+    pending: int = 0
+    last_flush: float = field(default_factory=time.monotonic)
+
+
+@dataclass(slots=True)
 class SyncRun:
     """Represents a sync operation run."""
 
@@ -23,24 +83,27 @@ class SyncRun:
     files_skipped: int
     bytes_downloaded: int
     error_message: str | None
+    _counts: _CounterBuffer = field(
+        default_factory=_CounterBuffer, init=False, repr=False, compare=False
+    )
 
     @classmethod
     def from_row(cls, row: tuple) -> SyncRun:
-        """Create a SyncRun from a database row."""
+        """Create a SyncRun from a database row (columns in field order)."""
         return cls(
-            id=row[0],
-            status=row[1],
-            started_at=row[2],
-            completed_at=row[3],
-            is_full_sync=bool(row[4]),
-            sync_type=row[5],
-            files_added=row[6],
-            files_modified=row[7],
-            files_removed=row[8],
-            files_unchanged=row[9],
-            files_skipped=row[10],
-            bytes_downloaded=row[11],
-            error_message=row[12],
+            row[0],
+            row[1],
+            row[2],
+            row[3],
+            bool(row[4]),
+            row[5],
+            row[6],
+            row[7],
+            row[8],
+            row[9],
+            row[10],
+            row[11],
+            row[12],
         )
 
     @classmethod
@@ -48,38 +111,19 @@ class SyncRun:
         """Get a sync run by ID."""
         db = get_db()
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT id, status, started_at, completed_at, is_full_sync, sync_type,
-                   files_added, files_modified, files_removed, files_unchanged,
-                   files_skipped, bytes_downloaded, error_message
-            FROM sync_run WHERE id = ?
-            """,
-            (run_id,),
-        )
+        cursor.execute(_SQL_GET_BY_ID, (run_id,))
         row = cursor.fetchone()
         return cls.from_row(row) if row else None
 
     @classmethod
     def create(cls, is_full_sync: bool = False, sync_type: str = "sync") -> SyncRun:
         """Create a new sync run."""
-        now = datetime.now(UTC).isoformat()
+        now = utc_now_iso()
 
         with transaction() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO sync_run (status, started_at, is_full_sync, sync_type)
-                VALUES ('running', ?, ?, ?)
-                """,
-                (now, 1 if is_full_sync else 0, sync_type),
-            )
-            row = cursor.execute("SELECT last_insert_rowid()").fetchone()
-            assert row is not None
-            run_id = row[0]
-
-        result = cls.get_by_id(run_id)
-        assert result is not None
-        return result
+            row = cursor.execute(_SQL_CREATE, (now, is_full_sync, sync_type)).fetchone()
+
+        return cls.from_row(row)
 
     def complete(
         self,
@@ -90,23 +134,16 @@ class SyncRun:
         files_skipped: int = 0,
         bytes_downloaded: int = 0,
     ) -> SyncRun:
-        """Mark sync run as completed."""
-        now = datetime.now(UTC).isoformat()
+        """Mark sync run as completed.
+
+        The given totals replace any counter increments still buffered.
+        """
+        self._counts = _CounterBuffer()
+        now = utc_now_iso()
 
         with transaction() as cursor:
-            cursor.execute(
-                """
-                UPDATE sync_run SET
-                    status = 'completed',
-                    completed_at = ?,
-                    files_added = ?,
-                    files_modified = ?,
-                    files_removed = ?,
-                    files_unchanged = ?,
-                    files_skipped = ?,
-                    bytes_downloaded = ?
-                WHERE id = ?
-                """,
+            row = cursor.execute(
+                _SQL_COMPLETE,
                 (
                     now,
                     files_added,
@@ -117,31 +154,21 @@ class SyncRun:
                     bytes_downloaded,
                     self.id,
                 ),
-            )
+            ).fetchone()
 
-        result = self.get_by_id(self.id)
-        assert result is not None
-        return result
+        assert row is not None
+        return self.from_row(row)
 
     def fail(self, error_message: str) -> SyncRun:
         """Mark sync run as failed."""
-        now = datetime.now(UTC).isoformat()
+        self.flush()
+        now = utc_now_iso()
 
         with transaction() as cursor:
-            cursor.execute(
-                """
-                UPDATE sync_run SET
-                    status = 'failed',
-                    completed_at = ?,
-                    error_message = ?
-                WHERE id = ?
-                """,
-                (now, error_message, self.id),
-            )
-
-        result = self.get_by_id(self.id)
-        assert result is not None
-        return result
+            row = cursor.execute(_SQL_FAIL, (now, error_message, self.id)).fetchone()
+
+        assert row is not None
+        return self.from_row(row)
 
     def increment_counts(
         self,
@@ -152,35 +179,66 @@ class SyncRun:
         skipped: int = 0,
         bytes_downloaded: int = 0,
     ) -> None:
-        """Increment counters during sync."""
-        with transaction() as cursor:
-            cursor.execute(
-                """
-                UPDATE sync_run SET
-                    files_added = files_added + ?,
-                    files_modified = files_modified + ?,
-                    files_removed = files_removed + ?,
-                    files_unchanged = files_unchanged + ?,
-                    files_skipped = files_skipped + ?,
-                    bytes_downloaded = bytes_downloaded + ?
-                WHERE id = ?
-                """,
-                (added, modified, removed, unchanged, skipped, bytes_downloaded, self.id),
-            )
+        """Increment counters during sync.
+
+        Increments are applied to this instance immediately and buffered for
+        the database, which is updated every FLUSH_EVERY files or
+        FLUSH_INTERVAL seconds so progress stays visible without a write
+        transaction per file.
+        """
+        self.files_added += added
+        self.files_modified += modified
+        self.files_removed += removed
+        self.files_unchanged += unchanged
+        self.files_skipped += skipped
+        self.bytes_downloaded += bytes_downloaded
+
+        buf = self._counts
+        buf.added += added
+        buf.modified += modified
+        buf.removed += removed
+        buf.unchanged += unchanged
+        buf.skipped += skipped
+        buf.bytes_downloaded += bytes_downloaded
+        buf.pending += 1
+
+        if buf.pending >= FLUSH_EVERY or time.monotonic() - buf.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered counter increments to the database."""
+        buf = self._counts
+        if buf.pending:
+            with transaction() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE sync_run SET
+                        files_added = files_added + ?,
+                        files_modified = files_modified + ?,
+                        files_removed = files_removed + ?,
+                        files_unchanged = files_unchanged + ?,
+                        files_skipped = files_skipped + ?,
+                        bytes_downloaded = bytes_downloaded + ?
+                    WHERE id = ?
+                    """,
+                    (
+                        buf.added,
+                        buf.modified,
+                        buf.removed,
+                        buf.unchanged,
+                        buf.skipped,
+                        buf.bytes_downloaded,
+                        self.id,
+                    ),
+                )
+        self._counts = _CounterBuffer()
 
     @classmethod
     def get_latest(cls) -> SyncRun | None:
         """Get the most recent sync run."""
         db = get_db()
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT id, status, started_at, completed_at, is_full_sync, sync_type,
-                   files_added, files_modified, files_removed, files_unchanged,
-                   files_skipped, bytes_downloaded, error_message
-            FROM sync_run ORDER BY started_at DESC LIMIT 1
-            """
-        )
+        cursor.execute(_SQL_GET_LATEST)
         row = cursor.fetchone()
         return cls.from_row(row) if row else None
 
@@ -189,14 +247,7 @@ class SyncRun:
         """Get currently running sync run if any."""
         db = get_db()
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT id, status, started_at, completed_at, is_full_sync, sync_type,
-                   files_added, files_modified, files_removed, files_unchanged,
-                   files_skipped, bytes_downloaded, error_message
-            FROM sync_run WHERE status = 'running' ORDER BY started_at DESC LIMIT 1
-            """
-        )
+        cursor.execute(_SQL_GET_RUNNING)
         row = cursor.fetchone()
         return cls.from_row(row) if row else None
 
@@ -211,20 +262,21 @@ class SyncRun:
         return int(row[0])
 
     @classmethod
-    def get_recent(cls, limit: int = 10, offset: int = 0) -> list[SyncRun]:
-        """Get recent sync runs."""
+    def get_recent(
+        cls, limit: int = 10, offset: int = 0, before_id: int | None = None
+    ) -> list[SyncRun]:
+        """Get recent sync runs, newest first.
+
+        Pass ``before_id`` (the id of the last run on the previous page) to
+        seek directly to the next page instead of skipping ``offset`` rows.
+        """
         db = get_db()
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT id, status, started_at, completed_at, is_full_sync, sync_type,
-                   files_added, files_modified, files_removed, files_unchanged,
-                   files_skipped, bytes_downloaded, error_message
-            FROM sync_run ORDER BY started_at DESC LIMIT ? OFFSET ?
-            """,
-            (limit, offset),
-        )
-        return [cls.from_row(row) for row in cursor.fetchall()]
+        if before_id is not None:
+            cursor.execute(_SQL_RECENT_BEFORE, (before_id, limit))
+        else:
+            cursor.execute(_SQL_RECENT, (limit, offset))
+        return list(map(cls.from_row, cursor))
 
     @classmethod
     def is_sync_in_progress(cls) -> bool:
@@ -8,68 +8,79 @@ Reference: Microsoft C# implementation in the OneDrive SDK.
 """
 
 import base64
-import struct
 
 WIDTH_IN_BITS = 160
 SHIFT = 11
-NUM_CELLS = (WIDTH_IN_BITS - 1) // 64 + 1  # 3
-BITS_IN_LAST_CELL = WIDTH_IN_BITS % 64  # 32
 HASH_SIZE = WIDTH_IN_BITS // 8  # 20 bytes
 
+# The shift pattern repeats every WIDTH_IN_BITS input bytes (SHIFT * 160 is a
+# multiple of 160), so bytes at the same position within each 160-byte block
+# land on the same bits and can be XOR-folded together before shifting.
+BLOCK_SIZE = WIDTH_IN_BITS
+BLOCK_BITS = BLOCK_SIZE * 8
+# Blocks folded per big-int pass, bounding the temporary ints to ~1 MiB
+FOLD_BLOCKS = 8192
+STATE_MASK = (1 << WIDTH_IN_BITS) - 1
+# digest() XORs the 64-bit length into the top 8 bytes of the hash
+LENGTH_MASK = (1 << 64) - 1
+LENGTH_SHIFT = WIDTH_IN_BITS - 64
+
+
+def _fold_blocks(data: memoryview) -> int:
+    """XOR every BLOCK_SIZE-byte block of *data* together (little-endian int)."""
+    blocks = -(-len(data) // BLOCK_SIZE)
+    value = int.from_bytes(data, "little")
+    # Halve the number of blocks each pass; an odd count gets an implicit zero block
+    while blocks > 1:
+        blocks = (blocks + 1) // 2
+        half_bits = blocks * BLOCK_BITS
+        value = (value & ((1 << half_bits) - 1)) ^ (value >> half_bits)
+    return value
+
 
 class QuickXorHash:
     """Hashlib-style interface for QuickXorHash."""
 
     def __init__(self) -> None:
-        self._data: list[int] = [0] * NUM_CELLS
+        # The three cells (64, 64 and 32 bits) form one 160-bit circular register
+        self._state: int = 0
         self._length_so_far: int = 0
         self._shift_so_far: int = 0
 
     def update(self, data: bytes | bytearray | memoryview) -> None:
         """Feed data into the hash."""
-        current_shift = self._shift_so_far
-
-        for byte in data:
-            index = current_shift // 64
-            offset = current_shift % 64
-
-            self._data[index] ^= byte << offset
-
-            # The last cell is only 32 bits wide, so its overflow threshold
-            # is 24 (32-8), not 56 (64-8) like the full-width cells.
-            is_last_cell = index == NUM_CELLS - 1
-            bits_in_cell = BITS_IN_LAST_CELL if is_last_cell else 64
-            if offset > bits_in_cell - 8:
-                self._data[(index + 1) % NUM_CELLS] ^= byte >> (bits_in_cell - offset)
-
-            current_shift = (current_shift + SHIFT) % WIDTH_IN_BITS
-
-        self._shift_so_far = current_shift
-        self._length_so_far += len(data)
+        view = memoryview(data).cast("B")
+        length = len(view)
+        if not length:
+            return
+
+        # Fold the input into one block, a bounded slice at a time
+        folded = 0
+        step = BLOCK_SIZE * FOLD_BLOCKS
+        for start in range(0, length, step):
+            folded ^= _fold_blocks(view[start : start + step])
+
+        # Byte i of the block is XORed in at bit (shift + SHIFT * i) mod 160,
+        # rotating bits that run past the top of the register back to bit 0
+        state = self._state
+        shift = self._shift_so_far
+        for byte in folded.to_bytes(BLOCK_SIZE, "little")[: min(length, BLOCK_SIZE)]:
+            if byte:
+                state ^= byte << shift
+            shift += SHIFT
+            if shift >= WIDTH_IN_BITS:
+                shift -= WIDTH_IN_BITS
+        self._state = (state & STATE_MASK) ^ (state >> WIDTH_IN_BITS)
+
+        self._shift_so_far = (self._shift_so_far + SHIFT * length) % WIDTH_IN_BITS
+        self._length_so_far += length
 
     def digest(self) -> bytes:
         """Return the 20-byte hash value."""
-        result = bytearray(HASH_SIZE)
-
-        # Pack first two full 64-bit cells
-        for i in range(NUM_CELLS - 1):
-            struct.pack_into("<Q", result, i * 8, self._data[i] & 0xFFFFFFFFFFFFFFFF)
-
-        # Last cell: only BITS_IN_LAST_CELL/8 = 4 bytes
-        struct.pack_into(
-            "<I",
-            result,
-            (NUM_CELLS - 1) * 8,
-            self._data[NUM_CELLS - 1] & 0xFFFFFFFF,
-        )
-
-        # XOR the file length (8 bytes LE) into the last 8 bytes of the hash
-        length_bytes = struct.pack("<Q", self._length_so_far & 0xFFFFFFFFFFFFFFFF)
-        offset = HASH_SIZE - len(length_bytes)  # 20 - 8 = 12
-        for i in range(len(length_bytes)):
-            result[offset + i] ^= length_bytes[i]
-
-        return bytes(result)
+        # The register as 20 LE bytes, with the file length (8 bytes LE) XORed
+        # into the last 8 bytes, i.e. at bit 96
+        length = self._length_so_far & LENGTH_MASK
+        return (self._state ^ (length << LENGTH_SHIFT)).to_bytes(HASH_SIZE, "little")
 
     def hexdigest(self) -> str:
         """Return the hash as a hex string."""
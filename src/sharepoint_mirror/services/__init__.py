@@ -1,7 +1,30 @@
-"""Services for SharePoint Mirror."""
+"""Services for SharePoint Mirror.
 
-from sharepoint_mirror.services.sharepoint import SharePointClient
-from sharepoint_mirror.services.storage import StorageService
-from sharepoint_mirror.services.sync import SyncService
+The service classes are loaded on first attribute access (PEP 562), so
+importing one of them does not pull in the others' dependencies.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sharepoint_mirror.services.sharepoint import SharePointClient
+    from sharepoint_mirror.services.storage import StorageService
+    from sharepoint_mirror.services.sync import SyncService
+
+_SUBMODULES = {
+    "SharePointClient": "sharepoint_mirror.services.sharepoint",
+    "StorageService": "sharepoint_mirror.services.storage",
+    "SyncService": "sharepoint_mirror.services.sync",
+}
 
 __all__ = ["SharePointClient", "StorageService", "SyncService"]
+
+
+def __getattr__(name: str) -> Any:
+    module = _SUBMODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
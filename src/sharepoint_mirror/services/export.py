@@ -1,20 +1,84 @@
-"""XLSX export helper."""
-
-import tempfile
-from typing import Any
-
-from openpyxl import Workbook
-
-
-def write_xlsx(headers: list[str], rows: list[list[Any]], filename: str) -> str:
-    """Write rows to a temp XLSX file, return the path."""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = filename.removesuffix(".xlsx")
-    ws.append(headers)
-    for row in rows:
-        ws.append(row)
-    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
-    tmp.close()
-    wb.save(tmp.name)
-    return tmp.name
+"""XLSX export helpers.
+
+xlsxwriter is imported on first use rather than with the module, which the
+SQL blueprint loads at app startup; later calls find it in sys.modules.
+"""
+
+from collections.abc import Iterable
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sharepoint_mirror.models import Document
+
+CATALOG_HEADERS = [
+    "Library",
+    "Name",
+    "Path",
+    "MIME Type",
+    "File Size",
+    "Web URL",
+    "Created By",
+    "Last Modified By",
+    "SP Created",
+    "SP Modified",
+    "Synced At",
+    "QuickXor Hash",
+    "SharePoint Item ID",
+    "SharePoint Drive ID",
+]
+
+
+def catalog_row(doc: Document) -> list[Any]:
+    """Catalog columns for a document, in CATALOG_HEADERS order."""
+    return [
+        doc.drive_name or doc.sharepoint_drive_id,
+        doc.name,
+        doc.path,
+        doc.mime_type,
+        doc.file_size,
+        doc.web_url,
+        doc.created_by,
+        doc.last_modified_by,
+        doc.sharepoint_created_at,
+        doc.sharepoint_modified_at,
+        doc.synced_at,
+        doc.quickxor_hash,
+        doc.sharepoint_item_id,
+        doc.sharepoint_drive_id,
+    ]
+
+
+def write_xlsx(
+    file: str | IO[bytes],
+    sheet_name: str,
+    headers: list[str],
+    rows: Iterable[Iterable[Any]],
+) -> int:
+    """Write a single-sheet workbook with a bold, filtered header row.
+
+    Uses xlsxwriter's constant_memory mode, which flushes each row to disk as
+    soon as the next one starts, so rows can be streamed from a generator.
+    Returns the number of data rows written.
+    """
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(
+        file,
+        {
+            "constant_memory": True,
+            "use_zip64": True,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        },
+    )
+    try:
+        ws = wb.add_worksheet(sheet_name)
+        ws.write_row(0, 0, headers, wb.add_format({"bold": True}))
+        count = 0
+        for count, row in enumerate(rows, start=1):
+            ws.write_row(count, 0, row)
+        if headers:
+            ws.autofilter(0, 0, count, len(headers) - 1)
+    finally:
+        wb.close()
+    return count
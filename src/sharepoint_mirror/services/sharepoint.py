@@ -1,5 +1,7 @@
 """SharePoint client using Microsoft Graph API."""
 
+import threading
+from collections.abc import Iterator
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from typing import Any
@@ -7,6 +9,41 @@ from typing import Any
 import httpx
 from flask import current_app
 
+# Bytes per chunk when streaming file downloads
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Connection pool for the shared HTTP client (Graph API + download hosts)
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32)
+# Retries for failed connection attempts (never for requests that got a response)
+HTTP_CONNECT_RETRIES = 2
+
+# Shared by every SharePointClient in the process, since one is built per
+# request/sync: (tenant_id, client_id) -> (access token, expiry) and
+# (site hostname, site path) -> site ID
+_TOKEN_CACHE: dict[tuple[str, str], tuple[str, datetime]] = {}
+_SITE_ID_CACHE: dict[tuple[str, str], str] = {}
+_TOKEN_LOCK = threading.Lock()
+
+# Pooled HTTP clients, likewise shared process-wide (keyed by timeout) so the
+# per-sync SharePointClient instances never each leave a connection pool open
+_HTTP_CLIENTS: dict[float, httpx.Client] = {}
+_HTTP_LOCK = threading.Lock()
+
+
+def _shared_http_client(timeout: float) -> httpx.Client:
+    """Return the process-wide pooled HTTP client for *timeout*, creating it once."""
+    client = _HTTP_CLIENTS.get(timeout)
+    if client is None:
+        with _HTTP_LOCK:
+            client = _HTTP_CLIENTS.get(timeout)
+            if client is None:
+                client = _HTTP_CLIENTS[timeout] = httpx.Client(
+                    timeout=timeout,
+                    follow_redirects=True,
+                    transport=httpx.HTTPTransport(limits=HTTP_LIMITS, retries=HTTP_CONNECT_RETRIES),
+                )
+    return client
+
 
 @dataclass
 class DriveItem:
@@ -59,41 +96,48 @@ class SharePointClient:
         self.site_hostname = site_hostname or current_app.config["SHAREPOINT_SITE_HOSTNAME"]
         self.site_path = site_path or current_app.config["SHAREPOINT_SITE_PATH"]
 
-        self._access_token: str | None = None
-        self._token_expires_at: datetime | None = None
-        self._site_id: str | None = None
-
         self.timeout = current_app.config.get("SYNC_DOWNLOAD_TIMEOUT", 300)
 
+    @property
+    def _http(self) -> httpx.Client:
+        """HTTP client shared by all requests, so connections are kept alive and reused.
+
+        Created on first use: many callers only read local status and never
+        contact SharePoint.
+        """
+        return _shared_http_client(self.timeout)
+
     def _get_access_token(self) -> str:
         """Get or refresh access token using client credentials flow."""
-        # Check if we have a valid token
-        if (
-            self._access_token
-            and self._token_expires_at
-            and datetime.now(UTC) < self._token_expires_at - timedelta(minutes=5)
-        ):
-            return self._access_token
-
-        # Get new token
-        auth_url = self.AUTH_URL.format(tenant_id=self.tenant_id)
-        data = {
-            "grant_type": "client_credentials",
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-            "scope": "https://graph.microsoft.com/.default",
-        }
-
-        with httpx.Client(timeout=30) as client:
-            response = client.post(auth_url, data=data)
+        key = (self.tenant_id, self.client_id)
+        cached = _TOKEN_CACHE.get(key)
+        if cached and datetime.now(UTC) < cached[1] - timedelta(minutes=5):
+            return cached[0]
+
+        with _TOKEN_LOCK:
+            # Another thread may have refreshed it while we waited
+            cached = _TOKEN_CACHE.get(key)
+            if cached and datetime.now(UTC) < cached[1] - timedelta(minutes=5):
+                return cached[0]
+
+            # Get new token
+            auth_url = self.AUTH_URL.format(tenant_id=self.tenant_id)
+            data = {
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": "https://graph.microsoft.com/.default",
+            }
+
+            response = self._http.post(auth_url, data=data, timeout=30)
             response.raise_for_status()
             result = response.json()
 
-        self._access_token = result["access_token"]
-        expires_in = result.get("expires_in", 3600)
-        self._token_expires_at = datetime.now(UTC) + timedelta(seconds=expires_in)
+            access_token = result["access_token"]
+            expires_in = result.get("expires_in", 3600)
+            _TOKEN_CACHE[key] = (access_token, datetime.now(UTC) + timedelta(seconds=expires_in))
 
-        return self._access_token
+        return access_token
 
     def _request(
         self,
@@ -108,23 +152,24 @@ class SharePointClient:
 
         timeout = kwargs.pop("timeout", self.timeout)
 
-        with httpx.Client(timeout=timeout, follow_redirects=True) as client:
-            response = client.request(method, url, headers=headers, **kwargs)
-            response.raise_for_status()
-            return response
+        response = self._http.request(method, url, headers=headers, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response
 
     def _get_site_id(self) -> str:
         """Get the SharePoint site ID."""
-        if self._site_id:
-            return self._site_id
+        key = (self.site_hostname, self.site_path)
+        site_id = _SITE_ID_CACHE.get(key)
+        if site_id:
+            return site_id
 
         # Build site identifier: hostname:path
         site_identifier = f"{self.site_hostname}:{self.site_path}"
         url = f"{self.GRAPH_BASE_URL}/sites/{site_identifier}"
 
         response = self._request("GET", url)
-        self._site_id = response.json()["id"]
-        return self._site_id
+        site_id = _SITE_ID_CACHE[key] = response.json()["id"]
+        return site_id
 
     def get_drives(self) -> list[Drive]:
         """Get all document libraries (drives) for the site."""
@@ -153,14 +198,14 @@ class SharePointClient:
                 return drive
         return None
 
-    def get_drive_items_delta(
+    def iter_drive_items_delta(
         self,
         drive_id: str,
         delta_link: str | None = None,
-    ) -> tuple[list[DriveItem], str]:
+    ) -> Iterator[tuple[list[DriveItem], str]]:
         """
-        Get changed items using delta query.
-        Returns (items, new_delta_link).
+        Get changed items using delta query, one page at a time.
+        Yields (items, new_delta_link); new_delta_link is "" until the last page.
         """
         if delta_link:
             url: str | None = delta_link
@@ -168,12 +213,11 @@ class SharePointClient:
             # Initial sync - get all items
             url = f"{self.GRAPH_BASE_URL}/drives/{drive_id}/root/delta"
 
-        items: list[DriveItem] = []
-        new_delta_link: str = ""
         while url:
             response = self._request("GET", url)
             data = response.json()
 
+            items: list[DriveItem] = []
             for item in data.get("value", []):
                 # Delta responses can include items without a name
                 # (e.g. deleted items, root folder entries) — skip them.
@@ -183,11 +227,8 @@ class SharePointClient:
 
             # Check for next page or delta link
             url = data.get("@odata.nextLink")
-            if not url:
-                # No more pages, get the delta link for next sync
-                new_delta_link = data.get("@odata.deltaLink", "")
-
-        return items, new_delta_link
+            # No more pages: the delta link is for the next sync
+            yield items, "" if url else data.get("@odata.deltaLink", "")
 
     def _parse_drive_item(self, item: dict, drive_id: str) -> DriveItem:
         """Parse a drive item from Graph API response."""
@@ -254,19 +295,19 @@ class SharePointClient:
         response = self._request("GET", url)
         return response.json().get("value", [])
 
-    def download_file(self, drive_id: str, item_id: str) -> bytes:
-        """Download file content."""
+    def iter_file(self, drive_id: str, item_id: str) -> Iterator[bytes]:
+        """Stream file content in chunks instead of loading it into memory."""
         url = f"{self.GRAPH_BASE_URL}/drives/{drive_id}/items/{item_id}/content"
-        response = self._request("GET", url, timeout=self.timeout)
-        return response.content
-
-    def download_file_by_url(self, download_url: str) -> bytes:
-        """Download file using pre-authenticated download URL."""
-        # Download URLs are pre-authenticated, no need for our token
-        with httpx.Client(timeout=self.timeout) as client:
-            response = client.get(download_url)
+        headers = {"Authorization": f"Bearer {self._get_access_token()}"}
+        with self._http.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            yield from response.iter_bytes(DOWNLOAD_CHUNK_SIZE)
+
+    def iter_file_by_url(self, download_url: str) -> Iterator[bytes]:
+        """Stream a file from its pre-authenticated download URL in chunks."""
+        with self._http.stream("GET", download_url) as response:
             response.raise_for_status()
-            return response.content
+            yield from response.iter_bytes(DOWNLOAD_CHUNK_SIZE)
 
     def test_connection(self) -> dict:
         """Test the connection and return site info."""
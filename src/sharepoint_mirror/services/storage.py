@@ -1,11 +1,35 @@
 """Storage service for content-addressed blob storage."""
 
 import hashlib
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
 from pathlib import Path
 
 from flask import current_app
 
+from sharepoint_mirror.db import transaction
 from sharepoint_mirror.models import FileBlob
+from sharepoint_mirror.quickxorhash import QuickXorHash
+
+# Leading bytes kept from a staged download for MIME sniffing (libmagic's
+# default read limit, so detection matches sniffing the whole content)
+HEAD_SIZE = 1024 * 1024
+
+# Permissions for stored blob files
+BLOB_FILE_MODE = 0o644
+
+
+@dataclass
+class StagedContent:
+    """Content streamed to a temporary file, hashed but not yet stored as a blob."""
+
+    path: Path
+    sha256_hash: str
+    size: int
+    head: bytes
+    quickxor_hash: str | None = None
 
 
 class StorageService:
@@ -15,42 +39,74 @@ class StorageService:
         """Initialize storage service."""
         self.blobs_directory = Path(blobs_directory or current_app.config["BLOBS_DIRECTORY"])
 
-    def store_content(self, content: bytes, mime_type: str) -> FileBlob:
+    def stage(self, chunks: Iterable[bytes], quickxor: bool = False) -> StagedContent:
         """
-        Store content and return the FileBlob record.
-        Content is deduplicated by SHA256 hash.
+        Stream chunks to a temporary file under blobs_directory/.tmp, hashing
+        as they arrive. Pass the result to store_staged() or discard().
         """
-        # Calculate hash
-        sha256_hash = hashlib.sha256(content).hexdigest()
-        file_size = len(content)
-
-        # Check if blob already exists
-        existing = FileBlob.get_by_hash(sha256_hash)
-        if existing:
-            # File already stored, just increment reference
-            return FileBlob.create(sha256_hash, file_size, mime_type)
-
-        # Store the file
-        blob_path = self._get_blob_path(sha256_hash)
-        blob_path.parent.mkdir(parents=True, exist_ok=True)
-        blob_path.write_bytes(content)
-
-        # Create database record
-        return FileBlob.create(sha256_hash, file_size, mime_type)
+        tmp_dir = self.blobs_directory / ".tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        sha256 = hashlib.sha256()
+        qxh = QuickXorHash() if quickxor else None
+        head = bytearray()
+        size = 0
+
+        fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            # mkstemp creates 0600; blobs may be served by another user (X-Sendfile)
+            os.fchmod(fd, BLOB_FILE_MODE)
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    sha256.update(chunk)
+                    if qxh is not None:
+                        qxh.update(chunk)
+                    if len(head) < HEAD_SIZE:
+                        head += chunk[: HEAD_SIZE - len(head)]
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+        return StagedContent(
+            path=Path(tmp_name),
+            sha256_hash=sha256.hexdigest(),
+            size=size,
+            head=bytes(head),
+            quickxor_hash=qxh.base64digest() if qxh is not None else None,
+        )
+
+    def store_staged(self, staged: StagedContent, mime_type: str) -> FileBlob:
+        """
+        Store staged content and return the FileBlob record. The temporary
+        file is moved into place for a new blob and removed for a duplicate.
+        """
+        try:
+            with transaction():
+                blob = FileBlob.create(staged.sha256_hash, staged.size, mime_type)
+                if blob.reference_count == 1:
+                    blob_path = self._get_blob_path(staged.sha256_hash)
+                    blob_path.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(staged.path, blob_path)
+        finally:
+            self.discard(staged)
+        return blob
+
+    def discard(self, staged: StagedContent) -> None:
+        """Remove a staged temporary file (no-op once it has been stored)."""
+        staged.path.unlink(missing_ok=True)
 
     def get_content(self, blob: FileBlob) -> bytes | None:
         """Get content for a blob."""
-        blob_path = self._get_blob_path(blob.sha256_hash)
-        if blob_path.exists():
-            return blob_path.read_bytes()
-        return None
+        return self.get_content_by_hash(blob.sha256_hash)
 
     def get_content_by_hash(self, sha256_hash: str) -> bytes | None:
         """Get content by hash directly."""
-        blob_path = self._get_blob_path(sha256_hash)
-        if blob_path.exists():
-            return blob_path.read_bytes()
-        return None
+        # Read without a separate exists() stat; a missing file is the rare case
+        try:
+            return self._get_blob_path(sha256_hash).read_bytes()
+        except FileNotFoundError:
+            return None
 
     def delete_blob(self, blob: FileBlob) -> bool:
         """
@@ -76,10 +132,15 @@ class StorageService:
         """Get the filesystem path for a blob."""
         return self._get_blob_path(blob.sha256_hash)
 
+    def get_blob_relative_path(self, blob: FileBlob) -> str:
+        """Get a blob's path relative to blobs_directory, with / separators."""
+        sha256_hash = blob.sha256_hash
+        return f"{sha256_hash[:2]}/{sha256_hash[2:4]}/{sha256_hash}"
+
     def _get_blob_path(self, sha256_hash: str) -> Path:
         """Get the filesystem path for a given hash."""
         # Use 2-level directory structure: {hash[:2]}/{hash[2:4]}/{hash}
-        return self.blobs_directory / sha256_hash[:2] / sha256_hash[2:4] / sha256_hash
+        return self.blobs_directory.joinpath(sha256_hash[:2], sha256_hash[2:4], sha256_hash)
 
     def _cleanup_empty_dirs(self, path: Path) -> None:
         """Remove empty directories up to blobs_directory."""
@@ -90,17 +151,9 @@ class StorageService:
             except OSError:
                 break  # Directory not empty
 
-    def calculate_hash(self, content: bytes) -> str:
-        """Calculate SHA256 hash of content."""
-        return hashlib.sha256(content).hexdigest()
-
     def get_total_size(self) -> int:
-        """Get total size of all stored blobs."""
-        total = 0
-        for blob_file in self.blobs_directory.rglob("*"):
-            if blob_file.is_file():
-                total += blob_file.stat().st_size
-        return total
+        """Get total size of all stored blobs (from blob records, not a disk walk)."""
+        return FileBlob.total_size()
 
     def verify_integrity(self) -> list[dict]:
         """
@@ -109,11 +162,14 @@ class StorageService:
         """
         issues = []
 
-        # Check database records have matching files
+        # Walk the blob tree once; existence checks are then set lookups
         db_blobs = self._get_all_blob_hashes()
+        fs_files = {entry.path: entry.name for entry in self._iter_blob_files()}
+
+        # Check database records have matching files
         for sha256_hash in db_blobs:
             path = self._get_blob_path(sha256_hash)
-            if not path.exists():
+            if str(path) not in fs_files:
                 issues.append(
                     {
                         "type": "missing_file",
@@ -123,7 +179,8 @@ class StorageService:
                 )
             else:
                 # Verify hash matches content
-                actual_hash = hashlib.sha256(path.read_bytes()).hexdigest()
+                with path.open("rb") as f:
+                    actual_hash = hashlib.file_digest(f, "sha256").hexdigest()
                 if actual_hash != sha256_hash:
                     issues.append(
                         {
@@ -135,21 +192,36 @@ class StorageService:
                     )
 
         # Check for orphaned files (files without database records)
-        for blob_file in self.blobs_directory.rglob("*"):
-            if blob_file.is_file():
-                file_hash = blob_file.name
-                if file_hash not in db_blobs:
-                    issues.append(
-                        {
-                            "type": "orphaned_file",
-                            "hash": file_hash,
-                            "path": str(blob_file),
-                            "message": f"File exists but no database record: {file_hash}",
-                        }
-                    )
+        for file_path, file_hash in fs_files.items():
+            if file_hash not in db_blobs:
+                issues.append(
+                    {
+                        "type": "orphaned_file",
+                        "hash": file_hash,
+                        "path": file_path,
+                        "message": f"File exists but no database record: {file_hash}",
+                    }
+                )
 
         return issues
 
+    def _iter_blob_files(self) -> Iterator[os.DirEntry[str]]:
+        """Yield stored blob files, skipping in-progress downloads in .tmp."""
+        root = str(self.blobs_directory)
+        tmp_dir = os.path.join(root, ".tmp")
+        stack = [root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path != tmp_dir:
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+            except FileNotFoundError:
+                continue
+
     def _get_all_blob_hashes(self) -> set[str]:
         """Get all blob hashes from database."""
         from sharepoint_mirror.db import get_db
@@ -1,13 +1,19 @@
 """Sync service for orchestrating SharePoint synchronization."""
 
 import logging
+import re
+import threading
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
 from dataclasses import dataclass, field
-from fnmatch import fnmatch
-from pathlib import PurePosixPath
+from fnmatch import translate
+from queue import Full, Queue
 
-import magic
 from flask import current_app
 
+from sharepoint_mirror.db import get_db, transaction, utc_now_iso
 from sharepoint_mirror.models import (
     DeltaToken,
     Document,
@@ -17,7 +23,6 @@ from sharepoint_mirror.models import (
     SyncEvent,
     SyncRun,
 )
-from sharepoint_mirror.quickxorhash import quickxorhash
 from sharepoint_mirror.services.sharepoint import (
     Drive as SharePointDrive,
 )
@@ -25,10 +30,71 @@ from sharepoint_mirror.services.sharepoint import (
     DriveItem,
     SharePointClient,
 )
-from sharepoint_mirror.services.storage import StorageService
+from sharepoint_mirror.services.storage import StagedContent, StorageService
 
 logger = logging.getLogger(__name__)
 
+# Consecutive items that only touch the database (removals, renames, skips)
+# share one transaction, committed after at most this many items
+LOCAL_BATCH_SIZE = 500
+
+# Drives whose delta queries are paged through concurrently
+DELTA_FETCH_WORKERS = 4
+
+# Delta pages fetched ahead per drive before its producer waits for the
+# sync thread, so drives not yet being applied stay bounded in memory
+DELTA_QUEUE_PAGES = 4
+
+
+def _glob_segment_to_regex(segment: str) -> str:
+    """Translate one path segment of a glob (*, ?, [...]) without crossing '/'."""
+    parts = []
+    i, n = 0, len(segment)
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == "*":
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            j = i
+            if j < n and segment[j] in "!^":
+                j += 1
+            if j < n and segment[j] == "]":
+                j += 1
+            j = segment.find("]", j)
+            if j < 0:
+                parts.append(re.escape(c))
+                continue
+            body = segment[i:j].replace("\\", "\\\\")
+            if body.startswith(("!", "^")):
+                body = "^/" + body[1:]
+            parts.append(f"[{body}]")
+            i = j + 1
+        else:
+            parts.append(re.escape(c))
+    return "".join(parts)
+
+
+def _glob_to_regex(pattern: str) -> re.Pattern[str]:
+    """
+    Compile a path glob to a regex for fullmatch against an item path.
+
+    A ** segment matches any number of folders, * and ? stay within one
+    segment. Relative patterns match at any depth, like PurePosixPath.match;
+    patterns starting with / are anchored at the library root.
+    """
+    segments = pattern.strip("/").split("/")
+    regex = "/" if pattern.startswith("/") else ("" if segments[0] == "**" else "(?:.*/)?")
+    for index, segment in enumerate(segments):
+        last = index == len(segments) - 1
+        if segment == "**":
+            regex += ".*" if last else "(?:.*/)?"
+        else:
+            regex += _glob_segment_to_regex(segment) + ("" if last else "/")
+    return re.compile(regex, re.DOTALL)
+
 
 @dataclass
 class SyncStats:
@@ -55,25 +121,26 @@ class SyncService:
         self.sharepoint = sharepoint_client or SharePointClient()
         self.storage = storage_service or StorageService()
 
-        # Configuration
-        self.max_file_size = current_app.config.get("SYNC_MAX_FILE_SIZE_MB", 100) * 1024 * 1024
-        self.include_extensions = self._parse_extensions(
-            current_app.config.get("SYNC_INCLUDE_EXTENSIONS", "")
-        )
-        self.exclude_extensions = self._parse_extensions(
-            current_app.config.get("SYNC_EXCLUDE_EXTENSIONS", "")
-        )
-        self.include_paths = self._parse_include_paths(
-            current_app.config.get("SYNC_INCLUDE_PATHS", "")
-        )
-        self.path_patterns = self._parse_path_patterns(
-            current_app.config.get("SYNC_PATH_PATTERNS", "")
-        )
-        self.metadata_only = current_app.config.get("SYNC_METADATA_ONLY", False)
-        self.verify_quickxor = current_app.config.get("SYNC_VERIFY_QUICKXOR_HASH", False)
+        # Configuration (read once; current_app is a context-local proxy)
+        config = current_app.config
+        self.max_file_size = config.get("SYNC_MAX_FILE_SIZE_MB", 100) * 1024 * 1024
+        self._size_skip_reason = f"size exceeds {self.max_file_size // (1024 * 1024)}MB"
+        self.include_extensions = self._parse_extensions(config.get("SYNC_INCLUDE_EXTENSIONS", ""))
+        self.exclude_extensions = self._parse_extensions(config.get("SYNC_EXCLUDE_EXTENSIONS", ""))
+        self.include_paths = self._parse_include_paths(config.get("SYNC_INCLUDE_PATHS", ""))
+        # Slash-terminated prefixes, for a single str.startswith per item
+        self._include_prefixes = tuple(p + "/" for p in self.include_paths)
+        self.path_patterns = self._parse_path_patterns(config.get("SYNC_PATH_PATTERNS", ""))
+        self._has_include_patterns = any(inc for inc, *_ in self.path_patterns)
+        self.metadata_only = config.get("SYNC_METADATA_ONLY", False)
+        self.verify_quickxor = config.get("SYNC_VERIFY_QUICKXOR_HASH", False)
+        self.library_name = config.get("SHAREPOINT_LIBRARY_NAME", "")
+        self.download_workers = config.get("SYNC_DOWNLOAD_WORKERS", 4)
         self.exclude_metadata_fields = self._parse_exclude_metadata_fields(
-            current_app.config.get("SYNC_EXCLUDE_METADATA_FIELDS", "")
+            config.get("SYNC_EXCLUDE_METADATA_FIELDS", "")
         )
+        # Downloads started ahead of _process_item, by SharePoint item ID
+        self._prefetched: dict[str, Future[StagedContent]] = {}
 
     # Known noisy internal SharePoint fields excluded by default
     DEFAULT_EXCLUDE_METADATA_FIELDS = {
@@ -96,11 +163,13 @@ class SyncService:
         configured = {f.strip() for f in value.split(",") if f.strip()} if value else set()
         return self.DEFAULT_EXCLUDE_METADATA_FIELDS | configured
 
-    def _parse_extensions(self, ext_string: str) -> set[str]:
-        """Parse comma-separated extensions string."""
+    def _parse_extensions(self, ext_string: str) -> tuple[str, ...]:
+        """Parse comma-separated extensions string (a tuple, for str.endswith)."""
         if not ext_string:
-            return set()
-        return {ext.strip().lower() for ext in ext_string.split(",") if ext.strip()}
+            return ()
+        return tuple(
+            dict.fromkeys(ext.strip().lower() for ext in ext_string.split(",") if ext.strip())
+        )
 
     def _parse_multiline(self, value: str) -> list[str]:
         """Split a multi-line config value into trimmed, non-empty lines."""
@@ -118,19 +187,25 @@ class SyncService:
             result.append(p)
         return result
 
-    def _parse_path_patterns(self, value: str) -> list[tuple[bool, str]]:
+    def _parse_path_patterns(self, value: str) -> list[tuple[bool, str, re.Pattern[str], bool]]:
         """
-        Parse SYNC_PATH_PATTERNS into (is_include, pattern) tuples.
+        Parse SYNC_PATH_PATTERNS into (is_include, pattern, regex, is_path) tuples.
 
         Patterns prefixed with ! are exclusions; others are inclusions.
+        Patterns are compiled once here; is_path says whether the regex
+        matches the full item path or just the filename.
         """
         lines = self._parse_multiline(value)
         result = []
         for line in lines:
-            if line.startswith("!"):
-                result.append((False, line[1:].strip()))
+            is_include = not line.startswith("!")
+            pattern = line if is_include else line[1:].strip()
+            if "**" in pattern or "/" in pattern:
+                # Path pattern, with ** recursive globs
+                result.append((is_include, pattern, _glob_to_regex(pattern), True))
             else:
-                result.append((True, line))
+                # Simple filename pattern (e.g. *.pdf); same as fnmatch on POSIX
+                result.append((is_include, pattern, re.compile(translate(pattern)), False))
         return result
 
     def _matches_include_paths(self, item_path: str) -> bool:
@@ -142,17 +217,16 @@ class SyncService:
 
         Returns True if no include paths are configured (i.e. no filtering).
         """
-        if not self.include_paths:
+        if not self._include_prefixes:
             return True
-        for prefix in self.include_paths:
-            if item_path == prefix or item_path.startswith(prefix + "/"):
-                return True
-        return False
+        return (item_path + "/").startswith(self._include_prefixes)
 
-    def _matches_path_patterns(self, item_path: str) -> tuple[bool, str]:
+    def _matches_path_patterns(self, item_path: str, name: str) -> tuple[bool, str]:
         """
         Evaluate item_path against configured glob patterns (first-match-wins).
 
+        name is the item's filename, used for simple patterns such as *.pdf.
+
         Returns (should_include, reason).
         If only exclude patterns exist, default is include.
         If any include patterns exist, default is exclude.
@@ -160,15 +234,11 @@ class SyncService:
         if not self.path_patterns:
             return True, ""
 
-        name = PurePosixPath(item_path).name
-
-        for is_include, pattern in self.path_patterns:
-            # Support ** recursive globs via PurePosixPath.match
-            if "**" in pattern or "/" in pattern:
-                matched = PurePosixPath(item_path).match(pattern)
+        for is_include, pattern, regex, is_path in self.path_patterns:
+            if is_path:
+                matched = regex.fullmatch(item_path) is not None
             else:
-                # Simple filename pattern (e.g. *.pdf)
-                matched = fnmatch(name, pattern)
+                matched = regex.match(name) is not None
 
             if matched:
                 if is_include:
@@ -176,8 +246,7 @@ class SyncService:
                 return False, f"excluded by pattern !{pattern}"
 
         # Default: if any include patterns exist, items not matching anything are excluded
-        has_includes = any(inc for inc, _ in self.path_patterns)
-        if has_includes:
+        if self._has_include_patterns:
             return False, "no include pattern matched"
         return True, ""
 
@@ -188,25 +257,25 @@ class SyncService:
 
         # Check size
         if item.size and item.size > self.max_file_size:
-            return False, f"size exceeds {self.max_file_size // (1024 * 1024)}MB"
+            return False, self._size_skip_reason
 
         # Check include paths
         if not self._matches_include_paths(item.path):
             return False, "path not in include paths"
 
         # Check path patterns
-        pattern_ok, pattern_reason = self._matches_path_patterns(item.path)
+        pattern_ok, pattern_reason = self._matches_path_patterns(item.path, item.name)
         if not pattern_ok:
             return False, pattern_reason
 
         # Check extension filters
         name_lower = item.name.lower()
         if self.include_extensions:
-            if not any(name_lower.endswith(ext) for ext in self.include_extensions):
+            if not name_lower.endswith(self.include_extensions):
                 return False, "extension not in include list"
 
         if self.exclude_extensions:
-            if any(name_lower.endswith(ext) for ext in self.exclude_extensions):
+            if name_lower.endswith(self.exclude_extensions):
                 return False, "extension in exclude list"
 
         return True, ""
@@ -241,7 +310,7 @@ class SyncService:
                 logger.info("Full sync requested, cleared all delta tokens")
 
             # Get drives to sync
-            library_name = library_name or current_app.config.get("SHAREPOINT_LIBRARY_NAME", "")
+            library_name = library_name or self.library_name
             if library_name:
                 drive = self.sharepoint.get_drive_by_name(library_name)
                 if not drive:
@@ -252,20 +321,46 @@ class SyncService:
 
             logger.info(f"Syncing {len(drives)} drive(s)")
 
-            # Process each drive
-            for drive in drives:
-                drive_stats = self._sync_drive(
-                    drive=drive,
-                    sync_run=sync_run,
-                    dry_run=dry_run,
-                )
-                stats.added += drive_stats.added
-                stats.modified += drive_stats.modified
-                stats.removed += drive_stats.removed
-                stats.unchanged += drive_stats.unchanged
-                stats.skipped += drive_stats.skipped
-                stats.bytes_downloaded += drive_stats.bytes_downloaded
-                stats.errors.extend(drive_stats.errors)
+            # Page through every drive's delta query concurrently, then apply
+            # the drives one at a time, each page as soon as it has arrived
+            pool = ThreadPoolExecutor(
+                max_workers=max(min(len(drives), DELTA_FETCH_WORKERS), 1),
+                thread_name_prefix="sync-delta",
+            )
+            stop = threading.Event()
+            try:
+                page_queues = []
+                for drive in drives:
+                    pages: Queue = Queue(maxsize=DELTA_QUEUE_PAGES)
+                    pool.submit(
+                        self._fetch_delta_pages,
+                        drive.id,
+                        self._get_delta_link(drive.id),
+                        pages,
+                        stop,
+                    )
+                    page_queues.append(pages)
+
+                # Process each drive
+                for drive, pages in zip(drives, page_queues, strict=True):
+                    drive_stats = self._sync_drive(
+                        drive=drive,
+                        pages=self._iter_queued_pages(pages),
+                        sync_run=sync_run,
+                        dry_run=dry_run,
+                    )
+                    stats.added += drive_stats.added
+                    stats.modified += drive_stats.modified
+                    stats.removed += drive_stats.removed
+                    stats.unchanged += drive_stats.unchanged
+                    stats.skipped += drive_stats.skipped
+                    stats.bytes_downloaded += drive_stats.bytes_downloaded
+                    stats.errors.extend(drive_stats.errors)
+            finally:
+                # On failure, stop producers still paging (they check between
+                # pages) and don't wait for them
+                stop.set()
+                pool.shutdown(wait=False, cancel_futures=True)
 
             # Complete sync run
             if not dry_run:
@@ -277,6 +372,8 @@ class SyncService:
                     files_skipped=stats.skipped,
                     bytes_downloaded=stats.bytes_downloaded,
                 )
+                # Refresh planner statistics for tables the sync changed a lot
+                deque(get_db().execute("PRAGMA optimize"), maxlen=0)
 
             logger.info(
                 f"Sync completed: added={stats.added}, modified={stats.modified}, "
@@ -291,78 +388,181 @@ class SyncService:
                 sync_run.fail(str(e))
             raise
 
+        finally:
+            Document.invalidate_count_cache()
+            Drive.invalidate_cache()
+
+    def _get_delta_link(self, drive_id: str) -> str | None:
+        """Get the stored delta link for a drive (None = fetch everything)."""
+        delta_token = DeltaToken.get_by_drive_id(drive_id)
+        return delta_token.delta_link if delta_token else None
+
+    def _fetch_delta_pages(
+        self, drive_id: str, delta_link: str | None, pages: Queue, stop: threading.Event
+    ) -> None:
+        """Put each delta page on *pages*, then None (or the exception that stopped it).
+
+        Returns early, without fetching further pages, once *stop* is set.
+        """
+        try:
+            for page in self.sharepoint.iter_drive_items_delta(drive_id, delta_link):
+                if not self._put_page(pages, page, stop):
+                    return
+        except Exception as e:
+            self._put_page(pages, e, stop)
+        else:
+            self._put_page(pages, None, stop)
+
+    @staticmethod
+    def _put_page(pages: Queue, page: object, stop: threading.Event) -> bool:
+        """Put *page* on the bounded queue, waiting for room; False if *stop* was set."""
+        while not stop.is_set():
+            try:
+                pages.put(page, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
+    @staticmethod
+    def _iter_queued_pages(pages: Queue) -> Iterator[tuple[list[DriveItem], str]]:
+        """Yield the pages put by _fetch_delta_pages, re-raising its exception."""
+        while (page := pages.get()) is not None:
+            if isinstance(page, Exception):
+                raise page
+            yield page
+
     def _sync_drive(
         self,
         drive: SharePointDrive,
+        pages: Iterable[tuple[list[DriveItem], str]],
         sync_run: SyncRun,
         dry_run: bool = False,
     ) -> SyncStats:
-        """Sync a single drive."""
+        """Apply a drive's delta pages as they arrive, then store its new delta link."""
         stats = SyncStats()
         drive_id = drive.id
 
         logger.info(f"Syncing drive: {drive.name} ({drive_id})")
 
         if not dry_run:
-            Drive.upsert(drive_id, drive.name, drive.web_url)
+            Drive.upsert(drive_id, drive.name, drive.web_url, now=utc_now_iso())
+
+        received = 0
+        new_delta_link = ""
+        with (
+            ThreadPoolExecutor(
+                max_workers=max(self.download_workers, 1), thread_name_prefix="sync-download"
+            ) as pool,
+            ExitStack() as batch,
+        ):
+            try:
+                for items, page_delta_link in pages:
+                    received += len(items)
+                    new_delta_link = page_delta_link or new_delta_link
+                    # One timestamp per page: a drive's sync can run for hours
+                    now = utc_now_iso()
+                    self._apply_page(items, drive_id, sync_run, stats, now, dry_run, pool, batch)
+                    # Commit before waiting on the next page
+                    batch.close()
+            finally:
+                for item_id in list(self._prefetched):
+                    self._discard_prefetched(item_id)
+
+        logger.info(f"Received {received} items from delta query")
 
-        # Get delta token
-        delta_token = DeltaToken.get_by_drive_id(drive_id)
-        delta_link = delta_token.delta_link if delta_token else None
+        # Save new delta token
+        if not dry_run and new_delta_link:
+            DeltaToken.upsert(drive_id, new_delta_link)
 
-        # Get changes from SharePoint
-        items, new_delta_link = self.sharepoint.get_drive_items_delta(drive_id, delta_link)
+        return stats
 
-        logger.info(f"Received {len(items)} items from delta query")
+    def _apply_page(
+        self,
+        items: list[DriveItem],
+        drive_id: str,
+        sync_run: SyncRun,
+        stats: SyncStats,
+        now: str,
+        dry_run: bool,
+        pool: ThreadPoolExecutor,
+        batch: ExitStack,
+    ) -> None:
+        """Process one page of delta items in order."""
+        # Look up the stored documents for all items in one query. An item can
+        # appear more than once in a delta feed, so repeats re-read the database
+        # to see what the earlier occurrence wrote.
+        existing_docs = Document.get_by_item_ids(drive_id, [item.id for item in items])
+        seen: set[str] = set()
+
+        # Items that will need their content downloaded, in delta order. Repeated
+        # items are left out: only processing them in order shows what they need.
+        counts = Counter(item.id for item in items)
+        to_prefetch: deque[DriveItem] = deque()
+        if not dry_run and self.download_workers > 1:
+            to_prefetch.extend(
+                item
+                for item in items
+                if counts[item.id] == 1 and self._needs_download(item, existing_docs.get(item.id))
+            )
 
+        batched = 0
         for item in items:
+            # Keep downloads running on worker threads a few items ahead of
+            # the database work, which stays on this thread
+            while to_prefetch and len(self._prefetched) < 2 * self.download_workers:
+                ahead = to_prefetch.popleft()
+                self._prefetched[ahead.id] = pool.submit(self._stage_download, ahead, drive_id)
             try:
+                if item.id in seen:
+                    existing = Document.get_by_item_id(item.id, drive_id)
+                else:
+                    existing = existing_docs.get(item.id)
+                    seen.add(item.id)
+                # Items that wait on SharePoint commit on their own, so the
+                # write lock is never held across a network call
+                if not dry_run:
+                    local = self._is_local_only(item, existing)
+                    if batched and (not local or batched >= LOCAL_BATCH_SIZE):
+                        batch.close()
+                        batched = 0
+                    if local:
+                        if not batched:
+                            batch.enter_context(transaction())
+                        batched += 1
                 self._process_item(
                     item=item,
+                    existing=existing,
                     drive_id=drive_id,
                     sync_run=sync_run,
                     stats=stats,
+                    now=now,
                     dry_run=dry_run,
                 )
             except Exception as e:
                 error_msg = f"Error processing {item.path}: {e}"
                 logger.error(error_msg)
                 stats.errors.append(error_msg)
-
-        # Save new delta token
-        if not dry_run and new_delta_link:
-            DeltaToken.upsert(drive_id, new_delta_link)
-
-        return stats
+            finally:
+                self._discard_prefetched(item.id)
 
     def _process_item(
         self,
         item: DriveItem,
+        existing: Document | None,
         drive_id: str,
         sync_run: SyncRun,
         stats: SyncStats,
+        now: str,
         dry_run: bool = False,
     ) -> None:
-        """Process a single drive item."""
-        # Get existing document (composite key lookup)
-        existing = Document.get_by_item_id(item.id, drive_id)
-
+        """Process a single drive item against its stored document (if any)."""
         # Handle deletion
         if item.is_deleted:
             if existing and not existing.is_deleted:
-                logger.info(f"Removing: {existing.path}")
+                logger.info("Removing: %s", existing.path)
                 if not dry_run:
-                    existing.soft_delete()
-                    SyncEvent.create(
-                        sync_run_id=sync_run.id,
-                        event_type="remove",
-                        sharepoint_item_id=item.id,
-                        name=existing.name,
-                        path=existing.path,
-                        document_id=existing.id,
-                        file_size=existing.file_size,
-                        file_blob_id=existing.file_blob_id,
-                    )
+                    self._remove_document(existing, item, sync_run, now)
                 stats.removed += 1
             return
 
@@ -373,85 +573,64 @@ class SyncService:
         # Determine if the item is within configured paths
         item_in_scope = self._matches_include_paths(item.path)
         if item_in_scope:
-            pattern_ok, _ = self._matches_path_patterns(item.path)
+            pattern_ok, _ = self._matches_path_patterns(item.path, item.name)
             item_in_scope = pattern_ok
 
         # Handle existing document that moved out of scope
         if existing and not existing.is_deleted and not item_in_scope:
-            logger.info(f"Removing (moved out of scope): {existing.path}")
+            logger.info("Removing (moved out of scope): %s", existing.path)
             if not dry_run:
-                existing.soft_delete()
-                SyncEvent.create(
-                    sync_run_id=sync_run.id,
-                    event_type="remove",
-                    sharepoint_item_id=item.id,
-                    name=existing.name,
-                    path=existing.path,
-                    document_id=existing.id,
-                    file_size=existing.file_size,
-                    file_blob_id=existing.file_blob_id,
-                )
+                self._remove_document(existing, item, sync_run, now)
             stats.removed += 1
             return
 
         # Check full eligibility (size, extensions, etc.) for in-scope items
         should_process, skip_reason = self._should_process_file(item)
         if not should_process:
-            logger.debug(f"Skipping {item.path}: {skip_reason}")
+            logger.debug("Skipping %s: %s", item.path, skip_reason)
             stats.skipped += 1
             return
 
         # Handle new file (or previously deleted doc now back in scope)
         if not existing or existing.is_deleted:
-            logger.info(f"Adding: {item.path}")
+            logger.info("Adding: %s", item.path)
             if not dry_run:
-                self._add_document(item, drive_id, sync_run, stats)
+                self._add_document(item, drive_id, sync_run, stats, now)
             else:
                 stats.added += 1
             return
 
+        # Checked up front: a rename below updates the document's modified time
+        content_changed = existing.sharepoint_modified_at != item.modified_at
+
         # Detect path change (rename or move)
         if existing.path != item.path:
-            logger.info(f"Path changed: {existing.path} -> {item.path}")
+            logger.info("Path changed: %s -> %s", existing.path, item.path)
             if not dry_run:
-                # Emit remove for old path, add for new path
-                SyncEvent.create(
-                    sync_run_id=sync_run.id,
-                    event_type="modify_remove",
-                    sharepoint_item_id=item.id,
-                    name=existing.name,
-                    path=existing.path,
-                    document_id=existing.id,
-                    file_size=existing.file_size,
-                    file_blob_id=existing.file_blob_id,
-                )
-                SyncEvent.create(
-                    sync_run_id=sync_run.id,
-                    event_type="modify_add",
-                    sharepoint_item_id=item.id,
-                    name=item.name,
-                    path=item.path,
-                    document_id=existing.id,
-                    file_size=existing.file_size,
-                    file_blob_id=existing.file_blob_id,
-                )
-                existing.update(
-                    name=item.name,
-                    path=item.path,
-                    web_url=item.web_url,
-                    last_modified_by=item.last_modified_by,
-                    sharepoint_modified_at=item.modified_at,
-                )
-            stats.modified += 1
-            # If content also changed, fall through to the modification check
-            if existing.sharepoint_modified_at == item.modified_at:
+                # Emit remove for old path, add for new path (one transaction with the update)
+                with transaction():
+                    self._log_modify(
+                        sync_run, existing, item, existing.file_size, existing.file_blob_id
+                    )
+                    existing.update(
+                        name=item.name,
+                        path=item.path,
+                        web_url=item.web_url,
+                        last_modified_by=item.last_modified_by,
+                        sharepoint_modified_at=item.modified_at,
+                        now=now,
+                    )
+            # If content also changed, fall through to the modification check,
+            # which counts the item (as modified, or unchanged if the bytes match)
+            if not content_changed:
+                stats.modified += 1
                 return
 
         # Handle existing file - check if modified
-        if existing.sharepoint_modified_at != item.modified_at:
-            logger.info(f"Modifying: {item.path}")
+        if content_changed:
+            logger.info("Modifying: %s", item.path)
             if not dry_run:
-                self._update_document(existing, item, sync_run, stats)
+                self._update_document(existing, item, sync_run, stats, now)
             else:
                 stats.modified += 1
             return
@@ -459,6 +638,23 @@ class SyncService:
         # No changes
         stats.unchanged += 1
 
+    def _remove_document(
+        self, existing: Document, item: DriveItem, sync_run: SyncRun, now: str
+    ) -> None:
+        """Soft-delete a document and log its removal in one transaction."""
+        with transaction():
+            existing.soft_delete(now=now)
+            SyncEvent.create(
+                sync_run_id=sync_run.id,
+                event_type="remove",
+                sharepoint_item_id=item.id,
+                name=existing.name,
+                path=existing.path,
+                document_id=existing.id,
+                file_size=existing.file_size,
+                file_blob_id=existing.file_blob_id,
+            )
+
     def _sync_metadata(self, document_id: int, drive_id: str, item_id: str) -> None:
         """Fetch listItem.fields from SharePoint and store as document metadata."""
         try:
@@ -468,30 +664,159 @@ class SyncService:
         except Exception as e:
             logger.warning("Failed to fetch metadata for item %s: %s", item_id, e)
 
+    def _is_local_only(self, item: DriveItem, existing: Document | None) -> bool:
+        """Check whether _process_item handles this item without contacting SharePoint."""
+        if item.is_deleted or item.is_folder:
+            return True
+        if not self._should_process_file(item)[0]:
+            return True
+        return (
+            existing is not None
+            and not existing.is_deleted
+            and existing.sharepoint_modified_at == item.modified_at
+        )
+
+    def _needs_download(self, item: DriveItem, existing: Document | None) -> bool:
+        """Check whether _process_item will download this item's content."""
+        if self.metadata_only or item.is_deleted:
+            return False
+        if not self._should_process_file(item)[0]:
+            return False
+        if existing is None or existing.is_deleted:
+            return True
+        return existing.sharepoint_modified_at != item.modified_at and not self._same_content_hash(
+            existing, item
+        )
+
+    def _same_content_hash(self, existing: Document, item: DriveItem) -> bool:
+        """Check whether SharePoint's quickXorHash shows the stored content is current."""
+        return (
+            existing.file_blob_id is not None
+            and item.quickxor_hash is not None
+            and existing.quickxor_hash == item.quickxor_hash
+        )
+
+    def _discard_prefetched(self, item_id: str) -> None:
+        """Drop a prefetched download that was not used, removing its staged file."""
+        future = self._prefetched.pop(item_id, None)
+        if future is None or future.cancel():
+            return
+        try:
+            self.storage.discard(future.result())
+        except Exception:
+            pass
+
+    def _download(self, item: DriveItem, drive_id: str) -> StagedContent:
+        """Get an item's content as a staged file, prefetched if possible."""
+        future = self._prefetched.pop(item.id, None)
+        if future is not None:
+            return future.result()
+        return self._stage_download(item, drive_id)
+
+    def _stage_download(self, item: DriveItem, drive_id: str) -> StagedContent:
+        """Stream an item's content into a staged file."""
+        if item.download_url:
+            chunks = self.sharepoint.iter_file_by_url(item.download_url)
+        else:
+            chunks = self.sharepoint.iter_file(drive_id, item.id)
+        return self.storage.stage(
+            chunks, quickxor=self.verify_quickxor and bool(item.quickxor_hash)
+        )
+
+    def _detect_mime_type(self, item: DriveItem, staged: StagedContent) -> str:
+        """Use SharePoint's MIME type, sniffing the content only if it has none."""
+        if item.mime_type:
+            return item.mime_type
+        # Graph sets file.mimeType for nearly every file, so libmagic is loaded lazily
+        import magic
+
+        logger.debug("No MIME type from SharePoint for %s, sniffing content", item.path)
+        return magic.from_buffer(staged.head, mime=True)
+
+    def _check_quickxor(self, item: DriveItem, staged: StagedContent) -> None:
+        """Log a warning if the streamed quickXorHash differs from SharePoint's."""
+        if staged.quickxor_hash is not None and staged.quickxor_hash != item.quickxor_hash:
+            logger.warning(
+                "QuickXorHash mismatch for %s: expected %s, got %s",
+                item.path,
+                item.quickxor_hash,
+                staged.quickxor_hash,
+            )
+
     def _add_document(
         self,
         item: DriveItem,
         drive_id: str,
         sync_run: SyncRun,
         stats: SyncStats,
+        now: str,
     ) -> None:
         """Add a new document."""
         if self.metadata_only:
+            with transaction():
+                doc = Document.create(
+                    sharepoint_item_id=item.id,
+                    sharepoint_drive_id=drive_id,
+                    name=item.name,
+                    path=item.path,
+                    mime_type=item.mime_type,
+                    file_size=item.size,
+                    web_url=item.web_url,
+                    created_by=item.created_by,
+                    last_modified_by=item.last_modified_by,
+                    sharepoint_created_at=item.created_at,
+                    sharepoint_modified_at=item.modified_at,
+                    quickxor_hash=item.quickxor_hash,
+                    file_blob_id=None,
+                    now=now,
+                )
+                SyncEvent.create(
+                    sync_run_id=sync_run.id,
+                    event_type="add",
+                    sharepoint_item_id=item.id,
+                    name=item.name,
+                    path=item.path,
+                    document_id=doc.id,
+                    file_size=item.size,
+                    file_blob_id=None,
+                )
+            self._sync_metadata(doc.id, drive_id, item.id)
+            stats.added += 1
+            return
+
+        # Download content to a staged file, hashing as it streams
+        staged = self._download(item, drive_id)
+        stats.bytes_downloaded += staged.size
+
+        # Detect MIME type
+        mime_type = self._detect_mime_type(item, staged)
+
+        self._check_quickxor(item, staged)
+
+        # Blob, document and event are written in one transaction
+        with transaction():
+            # Store blob
+            blob = self.storage.store_staged(staged, mime_type)
+
+            # Create document record
             doc = Document.create(
                 sharepoint_item_id=item.id,
                 sharepoint_drive_id=drive_id,
                 name=item.name,
                 path=item.path,
-                mime_type=item.mime_type,
-                file_size=item.size,
+                mime_type=mime_type,
+                file_size=staged.size,
                 web_url=item.web_url,
                 created_by=item.created_by,
                 last_modified_by=item.last_modified_by,
                 sharepoint_created_at=item.created_at,
                 sharepoint_modified_at=item.modified_at,
                 quickxor_hash=item.quickxor_hash,
-                file_blob_id=None,
+                file_blob_id=blob.id,
+                now=now,
             )
+
+            # Log event
             SyncEvent.create(
                 sync_run_id=sync_run.id,
                 event_type="add",
@@ -499,66 +824,9 @@ class SyncService:
                 name=item.name,
                 path=item.path,
                 document_id=doc.id,
-                file_size=item.size,
-                file_blob_id=None,
+                file_size=staged.size,
+                file_blob_id=blob.id,
             )
-            self._sync_metadata(doc.id, drive_id, item.id)
-            stats.added += 1
-            return
-
-        # Download content
-        if item.download_url:
-            content = self.sharepoint.download_file_by_url(item.download_url)
-        else:
-            content = self.sharepoint.download_file(drive_id, item.id)
-
-        stats.bytes_downloaded += len(content)
-
-        # Detect MIME type
-        mime_type = item.mime_type or magic.from_buffer(content, mime=True)
-
-        # Verify quickXorHash if enabled
-        if self.verify_quickxor and item.quickxor_hash:
-            computed = quickxorhash(content)
-            if computed != item.quickxor_hash:
-                logger.warning(
-                    "QuickXorHash mismatch for %s: expected %s, got %s",
-                    item.path,
-                    item.quickxor_hash,
-                    computed,
-                )
-
-        # Store blob
-        blob = self.storage.store_content(content, mime_type)
-
-        # Create document record
-        doc = Document.create(
-            sharepoint_item_id=item.id,
-            sharepoint_drive_id=drive_id,
-            name=item.name,
-            path=item.path,
-            mime_type=mime_type,
-            file_size=len(content),
-            web_url=item.web_url,
-            created_by=item.created_by,
-            last_modified_by=item.last_modified_by,
-            sharepoint_created_at=item.created_at,
-            sharepoint_modified_at=item.modified_at,
-            quickxor_hash=item.quickxor_hash,
-            file_blob_id=blob.id,
-        )
-
-        # Log event
-        SyncEvent.create(
-            sync_run_id=sync_run.id,
-            event_type="add",
-            sharepoint_item_id=item.id,
-            name=item.name,
-            path=item.path,
-            document_id=doc.id,
-            file_size=len(content),
-            file_blob_id=blob.id,
-        )
 
         self._sync_metadata(doc.id, drive_id, item.id)
         stats.added += 1
@@ -569,6 +837,7 @@ class SyncService:
         item: DriveItem,
         sync_run: SyncRun,
         stats: SyncStats,
+        now: str,
     ) -> None:
         """Update an existing document."""
         if self.metadata_only:
@@ -581,94 +850,107 @@ class SyncService:
                 last_modified_by=item.last_modified_by,
                 sharepoint_modified_at=item.modified_at,
                 quickxor_hash=item.quickxor_hash,
+                now=now,
             )
             self._sync_metadata(existing.id, existing.sharepoint_drive_id, item.id)
             stats.modified += 1
             return
 
-        # Download new content
-        if item.download_url:
-            content = self.sharepoint.download_file_by_url(item.download_url)
-        else:
-            content = self.sharepoint.download_file(existing.sharepoint_drive_id, item.id)
-
-        stats.bytes_downloaded += len(content)
-
-        # Verify quickXorHash if enabled
-        if self.verify_quickxor and item.quickxor_hash:
-            computed = quickxorhash(content)
-            if computed != item.quickxor_hash:
-                logger.warning(
-                    "QuickXorHash mismatch for %s: expected %s, got %s",
-                    item.path,
-                    item.quickxor_hash,
-                    computed,
-                )
+        # Same quickXorHash as the stored content: skip the download entirely
+        if self._same_content_hash(existing, item):
+            self._update_unchanged_content(existing, item, stats, now)
+            return
+
+        # Download new content to a staged file, hashing as it streams
+        staged = self._download(item, existing.sharepoint_drive_id)
+        stats.bytes_downloaded += staged.size
 
-        # Calculate hash to check if content actually changed
-        new_hash = self.storage.calculate_hash(content)
+        self._check_quickxor(item, staged)
+
+        # Check if content actually changed
         old_blob = existing.get_blob()
 
-        if old_blob and old_blob.sha256_hash == new_hash:
-            # Content unchanged, just update metadata
+        if old_blob and old_blob.sha256_hash == staged.sha256_hash:
+            self.storage.discard(staged)
+            self._update_unchanged_content(existing, item, stats, now)
+            return
+
+        # Detect MIME type
+        mime_type = self._detect_mime_type(item, staged)
+
+        # Events, new blob and document update are written in one transaction
+        with transaction():
+            # Store new blob (old blob kept for reference tracking)
+            new_blob = self.storage.store_staged(staged, mime_type)
+
+            # Log the removal of the old version and the addition of the new one
+            self._log_modify(sync_run, existing, item, staged.size, new_blob.id)
+
+            # Update document
             existing.update(
                 name=item.name,
                 path=item.path,
+                mime_type=mime_type,
+                file_size=staged.size,
                 web_url=item.web_url,
                 last_modified_by=item.last_modified_by,
                 sharepoint_modified_at=item.modified_at,
                 quickxor_hash=item.quickxor_hash,
+                file_blob_id=new_blob.id,
+                now=now,
             )
-            self._sync_metadata(existing.id, existing.sharepoint_drive_id, item.id)
-            stats.unchanged += 1
-            stats.modified -= 1  # Adjust since we thought it was modified
-            return
-
-        # Log the removal of old version
-        SyncEvent.create(
-            sync_run_id=sync_run.id,
-            event_type="modify_remove",
-            sharepoint_item_id=item.id,
-            name=existing.name,
-            path=existing.path,
-            document_id=existing.id,
-            file_size=existing.file_size,
-            file_blob_id=existing.file_blob_id,
-        )
 
-        # Detect MIME type
-        mime_type = item.mime_type or magic.from_buffer(content, mime=True)
+        self._sync_metadata(existing.id, existing.sharepoint_drive_id, item.id)
+        stats.modified += 1
 
-        # Store new blob (old blob kept for reference tracking)
-        new_blob = self.storage.store_content(content, mime_type)
+    def _log_modify(
+        self,
+        sync_run: SyncRun,
+        existing: Document,
+        item: DriveItem,
+        file_size: int | None,
+        file_blob_id: int | None,
+    ) -> None:
+        """Log a modify_remove/modify_add event pair; call before existing.update()."""
+        SyncEvent.create_many(
+            sync_run.id,
+            (
+                {
+                    "event_type": "modify_remove",
+                    "sharepoint_item_id": item.id,
+                    "name": existing.name,
+                    "path": existing.path,
+                    "document_id": existing.id,
+                    "file_size": existing.file_size,
+                    "file_blob_id": existing.file_blob_id,
+                },
+                {
+                    "event_type": "modify_add",
+                    "sharepoint_item_id": item.id,
+                    "name": item.name,
+                    "path": item.path,
+                    "document_id": existing.id,
+                    "file_size": file_size,
+                    "file_blob_id": file_blob_id,
+                },
+            ),
+        )
 
-        # Update document
+    def _update_unchanged_content(
+        self, existing: Document, item: DriveItem, stats: SyncStats, now: str
+    ) -> None:
+        """Update a document whose content is unchanged (metadata only)."""
         existing.update(
             name=item.name,
             path=item.path,
-            mime_type=mime_type,
-            file_size=len(content),
             web_url=item.web_url,
             last_modified_by=item.last_modified_by,
             sharepoint_modified_at=item.modified_at,
             quickxor_hash=item.quickxor_hash,
-            file_blob_id=new_blob.id,
+            now=now,
         )
-
-        # Log the addition of new version
-        SyncEvent.create(
-            sync_run_id=sync_run.id,
-            event_type="modify_add",
-            sharepoint_item_id=item.id,
-            name=item.name,
-            path=item.path,
-            document_id=existing.id,
-            file_size=len(content),
-            file_blob_id=new_blob.id,
-        )
-
         self._sync_metadata(existing.id, existing.sharepoint_drive_id, item.id)
-        stats.modified += 1
+        stats.unchanged += 1
 
     def run_metadata_refresh(self) -> SyncRun:
         """Refresh metadata for all non-deleted documents.
@@ -676,14 +958,14 @@ class SyncService:
         Creates a SyncRun with sync_type='metadata', fetches listItem.fields
         for each document, and returns the completed run.
         """
-        docs = Document.get_all(include_deleted=False)
         doc_refs = [
             (doc.id, doc.sharepoint_drive_id, doc.sharepoint_item_id, doc.name)
-            for doc in docs
+            for doc in Document.iter_all(include_deleted=False)
         ]
 
         sync_run = SyncRun.create(sync_type="metadata")
         sync_run.increment_counts(unchanged=len(doc_refs))
+        sync_run.flush()
 
         try:
             errors = 0
@@ -0,0 +1,29 @@
+"""Shared fixtures: an app on a throwaway database and blobs directory."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+from sharepoint_mirror import create_app
+
+
+@pytest.fixture
+def app(tmp_path: Path) -> Flask:
+    """App with a fresh schema in tmp_path (created by create_app on startup)."""
+    return create_app(
+        {
+            "TESTING": True,
+            "SECRET_KEY": "test",
+            "DATABASE_PATH": str(tmp_path / "test.sqlite3"),
+            "BLOBS_DIRECTORY": str(tmp_path / "blobs"),
+        }
+    )
+
+
+@pytest.fixture
+def app_ctx(app: Flask) -> Iterator[Flask]:
+    """Run the test inside an app context, so get_db() and the models work."""
+    with app.app_context():
+        yield app
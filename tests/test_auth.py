@@ -0,0 +1,50 @@
+"""Tests for the login_required decorator, with and without Gatekeeper."""
+
+import pytest
+from flask import Flask, g
+
+from sharepoint_mirror.blueprints.auth import login_required
+
+
+def test_login_required_preserves_view_metadata() -> None:
+    def view() -> str:
+        """Docstring."""
+        return "ok"
+
+    wrapped = login_required(view)
+    assert wrapped.__name__ == "view"
+    assert wrapped.__doc__ == "Docstring."
+    assert wrapped.__wrapped__ is view
+
+
+def test_open_access_without_gatekeeper(app: Flask) -> None:
+    client = app.test_client()
+    assert client.get("/").status_code == 200
+    assert client.get("/documents/").status_code == 200
+    assert client.get("/", headers={"HX-Request": "true"}).status_code == 200
+
+
+@pytest.fixture
+def gated_app(app: Flask) -> Flask:
+    """The app with a Gatekeeper client configured but no user signed in."""
+    app.config["GATEKEEPER_CLIENT"] = object()
+    return app
+
+
+def test_anonymous_user_is_redirected_to_login(gated_app: Flask) -> None:
+    response = gated_app.test_client().get("/documents/?search=a%20b")
+    assert response.status_code == 302
+    assert response.location == "/auth/login?next=%2Fdocuments%2F%3Fsearch%3Da%2520b"
+
+
+def test_anonymous_htmx_request_gets_401(gated_app: Flask) -> None:
+    response = gated_app.test_client().get("/documents/", headers={"HX-Request": "true"})
+    assert response.status_code == 401
+
+
+def test_signed_in_user_passes(gated_app: Flask) -> None:
+    @gated_app.before_request
+    def sign_in() -> None:
+        g.user = object()
+
+    assert gated_app.test_client().get("/documents/").status_code == 200
@@ -0,0 +1,111 @@
+"""Tests for transaction() nesting and the trigger-maintained stats table."""
+
+import pytest
+
+from sharepoint_mirror.db import get_db, get_stat, transaction
+from sharepoint_mirror.models import Document, FileBlob
+
+pytestmark = pytest.mark.usefixtures("app_ctx")
+
+
+def _drive_ids() -> list[str]:
+    return [row[0] for row in get_db().execute("SELECT id FROM drive ORDER BY id")]
+
+
+def _insert_drive(cursor, drive_id: str) -> None:
+    cursor.execute(
+        "INSERT INTO drive (id, name, updated_at) VALUES (?, ?, '')",
+        (drive_id, drive_id),
+    )
+
+
+def test_transaction_commits() -> None:
+    with transaction() as cursor:
+        _insert_drive(cursor, "a")
+    assert not get_db().in_transaction
+    assert _drive_ids() == ["a"]
+
+
+def test_transaction_rolls_back_on_error() -> None:
+    with pytest.raises(RuntimeError), transaction() as cursor:
+        _insert_drive(cursor, "a")
+        raise RuntimeError
+    assert not get_db().in_transaction
+    assert _drive_ids() == []
+
+
+def test_nested_transaction_rolls_back_only_inner_block() -> None:
+    with transaction() as cursor:
+        _insert_drive(cursor, "outer")
+        with pytest.raises(RuntimeError), transaction() as inner:
+            _insert_drive(inner, "inner")
+            raise RuntimeError
+        # Still inside the outer transaction; nothing committed yet
+        assert get_db().in_transaction
+    assert _drive_ids() == ["outer"]
+
+
+def test_nested_transaction_commits_with_outer_block() -> None:
+    with pytest.raises(RuntimeError), transaction() as cursor:
+        _insert_drive(cursor, "outer")
+        with transaction() as inner:
+            _insert_drive(inner, "inner")
+        raise RuntimeError
+    assert _drive_ids() == []
+
+
+def _assert_stats_match_tables() -> None:
+    """Every stats row equals the aggregate it replaces."""
+    db = get_db()
+    expected = {
+        "document_count": "SELECT COUNT(*) FROM document WHERE is_deleted = 0",
+        "document_size": "SELECT COALESCE(SUM(file_size), 0) FROM document WHERE is_deleted = 0",
+        "document_count_all": "SELECT COUNT(*) FROM document",
+        "document_size_all": "SELECT COALESCE(SUM(file_size), 0) FROM document",
+        "blob_count": "SELECT COUNT(*) FROM file_blob",
+        "blob_size": "SELECT COALESCE(SUM(file_size), 0) FROM file_blob",
+    }
+    for key, query in expected.items():
+        assert get_stat(key) == next(db.execute(query))[0], key
+
+
+def test_stats_triggers_track_documents() -> None:
+    _assert_stats_match_tables()
+    docs = [
+        Document.create(f"item-{i}", "drive", f"doc{i}.pdf", f"/doc{i}.pdf", file_size=size)
+        for i, size in enumerate([100, None, 2500, 7])
+    ]
+    _assert_stats_match_tables()
+
+    docs[0].update(file_size=150)
+    docs[1].update(file_size=42)
+    _assert_stats_match_tables()
+
+    docs[2].soft_delete()
+    _assert_stats_match_tables()
+    docs[2].update(is_deleted=False)
+    _assert_stats_match_tables()
+    docs[2].update(is_deleted=True, file_size=10)
+    _assert_stats_match_tables()
+
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM document WHERE id IN (?, ?)", (docs[0].id, docs[2].id))
+    _assert_stats_match_tables()
+    assert Document.count_all() == 2
+    assert Document.count_all(include_deleted=True) == 2
+    assert Document.total_size() == 49
+
+
+def test_stats_triggers_track_blobs() -> None:
+    blob = FileBlob.create("a" * 64, 1000, "text/plain")
+    FileBlob.create("b" * 64, 24, "text/plain")
+    # A duplicate only bumps the reference count
+    FileBlob.create("a" * 64, 1000, "text/plain")
+    _assert_stats_match_tables()
+    assert (FileBlob.count_all(), FileBlob.total_size()) == (2, 1024)
+
+    assert not blob.decrement_reference()
+    assert blob.decrement_reference()
+    blob.delete()
+    _assert_stats_match_tables()
+    assert (FileBlob.count_all(), FileBlob.total_size()) == (1, 24)
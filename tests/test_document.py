@@ -0,0 +1,61 @@
+"""Tests for Document listing: keyset (after_id) paging against offset paging."""
+
+import pytest
+
+from sharepoint_mirror.models import Document
+
+pytestmark = pytest.mark.usefixtures("app_ctx")
+
+
+@pytest.fixture
+def documents(app_ctx) -> list[Document]:
+    """Documents in two drives, with repeated paths so ids break the ties."""
+    docs = []
+    for i in range(23):
+        path = f"/folder{i % 4}/report{i % 5}.pdf"
+        drive = "drive-b" if i % 3 else "drive-a"
+        docs.append(Document.create(f"item-{i}", drive, path.rsplit("/", 1)[1], path))
+    for doc in docs[::7]:
+        doc.soft_delete()
+    return docs
+
+
+def _ids(docs: list[Document]) -> list[int]:
+    return [doc.id for doc in docs]
+
+
+def _keyset_pages(limit: int, **filters) -> list[list[int]]:
+    pages = []
+    after_id = None
+    while page := Document.get_all(limit=limit, after_id=after_id, **filters):
+        pages.append(_ids(page))
+        after_id = page[-1].id
+    return pages
+
+
+@pytest.mark.usefixtures("documents")
+@pytest.mark.parametrize("limit", [1, 4, 7, 50])
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"include_deleted": True},
+        {"search": "report1"},
+        {"search": "folder2", "include_deleted": True},
+    ],
+)
+def test_keyset_pages_match_offset_pages(limit: int, filters: dict) -> None:
+    everything = _ids(Document.get_all(**filters))
+    offset_pages = [
+        _ids(Document.get_all(limit=limit, offset=offset, **filters))
+        for offset in range(0, len(everything), limit)
+    ]
+    assert _keyset_pages(limit, **filters) == offset_pages
+    assert [doc_id for page in offset_pages for doc_id in page] == everything
+
+
+def test_get_all_orders_by_path_then_id(documents: list[Document]) -> None:
+    active = [doc for doc in documents if not doc.is_deleted]
+    expected = sorted(active, key=lambda doc: (doc.path, doc.id))
+    assert _ids(Document.get_all()) == _ids(expected)
+    assert _ids(list(Document.iter_all())) == _ids(expected)
@@ -0,0 +1,93 @@
+"""Tests for serving document blobs and the text viewer."""
+
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+from sharepoint_mirror import create_app
+from sharepoint_mirror.blueprints import viewer
+from sharepoint_mirror.models import Document
+from sharepoint_mirror.services import StorageService
+
+
+def _add_document(app: Flask, name: str, content: bytes, mime_type: str) -> int:
+    with app.app_context():
+        storage = StorageService()
+        blob = storage.store_staged(storage.stage([content]), mime_type)
+        doc = Document.create(
+            f"item-{name}", "drive", name, f"/{name}", mime_type, len(content), file_blob_id=blob.id
+        )
+        return doc.id
+
+
+@pytest.fixture
+def accel_app(tmp_path: Path) -> Flask:
+    return create_app(
+        {
+            "TESTING": True,
+            "SECRET_KEY": "test",
+            "DATABASE_PATH": str(tmp_path / "test.sqlite3"),
+            "BLOBS_DIRECTORY": str(tmp_path / "blobs"),
+            "BLOBS_X_ACCEL_REDIRECT": "/protected-blobs/",
+        }
+    )
+
+
+def test_download_sends_blob(app: Flask) -> None:
+    doc_id = _add_document(app, "a.pdf", b"%PDF-1.4 body", "application/pdf")
+    response = app.test_client().get(f"/documents/{doc_id}/download")
+    assert response.status_code == 200
+    assert response.data == b"%PDF-1.4 body"
+    assert "attachment" in response.headers["Content-Disposition"]
+    assert "X-Sendfile" not in response.headers
+
+
+def test_accel_redirect_applies_to_blobs_only(accel_app: Flask) -> None:
+    doc_id = _add_document(accel_app, "a.pdf", b"%PDF-1.4 body", "application/pdf")
+    client = accel_app.test_client()
+
+    response = client.get(f"/documents/{doc_id}/content")
+    assert response.data == b""
+    assert "X-Sendfile" not in response.headers
+    assert response.headers["X-Accel-Redirect"].startswith("/protected-blobs/")
+    assert response.headers["ETag"]
+
+    static = client.get("/static/css/app.css")
+    assert static.status_code == 200
+    assert static.data
+    assert "X-Sendfile" not in static.headers
+    assert "X-Accel-Redirect" not in static.headers
+
+
+def test_large_text_file_is_served_as_plain_text(
+    app: Flask, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    doc_id = _add_document(app, "page.html", b"<script>alert(1)</script>", "text/html")
+    client = app.test_client()
+
+    preview = client.get(f"/viewer/text/{doc_id}")
+    assert preview.status_code == 200
+    assert b"&lt;script&gt;" in preview.data
+
+    monkeypatch.setattr(viewer, "TEXT_VIEWER_MAX_BYTES", 10)
+    response = client.get(f"/viewer/text/{doc_id}")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/plain; charset=utf-8"
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+    assert response.data == b"<script>alert(1)</script>"
+
+
+@pytest.mark.parametrize("cursor", ["last", "missing"])
+def test_stale_cursor_falls_back_to_offset(app: Flask, cursor: str) -> None:
+    with app.app_context():
+        ids = [
+            Document.create(f"item-{i}", "drive", f"{i:02}.pdf", f"/{i:02}.pdf").id
+            for i in range(51)
+        ]
+    cursor_id = ids[-1] if cursor == "last" else max(ids) + 1
+
+    response = app.test_client().get(f"/documents/?page=1&cursor={cursor_id}")
+    assert response.status_code == 200
+    assert b"/00.pdf" in response.data
+    assert f"cursor={ids[49]}".encode() in response.data
@@ -0,0 +1,67 @@
+"""Tests for the config.ini reader against configparser."""
+
+import configparser
+from pathlib import Path
+
+import pytest
+
+from sharepoint_mirror.fastini import parse_bool, parse_ini
+
+SAMPLE = """\
+# comment
+[server]
+HOST = 0.0.0.0
+Port: 5000
+; another comment
+SECRET_KEY = abc%%def
+EMPTY =
+URL = http://example.com/a=b
+
+[sync]
+PATH_PATTERNS =
+    *.pdf
+    !**/drafts/**
+INCLUDE_PATHS = /Projects
+    /Archive/100%%
+"""
+
+
+def _configparser_sections(text: str) -> dict[str, dict[str, str]]:
+    parser = configparser.ConfigParser()
+    parser.read_string(text)
+    return {
+        name: {key.upper(): value for key, value in parser[name].items()}
+        for name in parser.sections()
+    }
+
+
+@pytest.mark.parametrize(
+    "text",
+    [SAMPLE, (Path(__file__).parent.parent / "config.ini.example").read_text()],
+    ids=["sample", "config.ini.example"],
+)
+def test_parse_ini_matches_configparser(text: str) -> None:
+    assert parse_ini(text) == _configparser_sections(text)
+
+
+def test_parse_ini_values() -> None:
+    server = parse_ini(SAMPLE)["server"]
+    assert server["PORT"] == "5000"
+    assert server["SECRET_KEY"] == "abc%def"
+    assert server["URL"] == "http://example.com/a=b"
+
+
+@pytest.mark.parametrize("value", ["yes", " ON ", "true", "1"])
+def test_parse_bool_true(value: str) -> None:
+    assert parse_bool(value) is True
+
+
+@pytest.mark.parametrize("value", ["no", "False", "off", "0"])
+def test_parse_bool_false(value: str) -> None:
+    assert parse_bool(value) is False
+
+
+@pytest.mark.parametrize("value", ["", "maybe", "2"])
+def test_parse_bool_rejects_other_values(value: str) -> None:
+    with pytest.raises(ValueError, match="Not a boolean"):
+        parse_bool(value)
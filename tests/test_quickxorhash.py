@@ -0,0 +1,57 @@
+"""Tests for QuickXorHash against a byte-at-a-time reference implementation."""
+
+import base64
+import random
+
+import pytest
+
+from sharepoint_mirror.quickxorhash import QuickXorHash, quickxorhash
+
+
+def _reference_quickxorhash(data: bytes) -> str:
+    """Straight port of the OneDrive SDK algorithm: three cells of 64, 64 and 32 bits."""
+    cells = [0, 0, 0]
+    shift = 0
+    for byte in data:
+        index, offset = divmod(shift, 64)
+        cells[index] ^= byte << offset
+        bits_in_cell = 32 if index == 2 else 64
+        if offset > bits_in_cell - 8:
+            cells[(index + 1) % 3] ^= byte >> (bits_in_cell - offset)
+        shift = (shift + 11) % 160
+    digest = bytearray(
+        (cells[0] & (2**64 - 1)).to_bytes(8, "little")
+        + (cells[1] & (2**64 - 1)).to_bytes(8, "little")
+        + (cells[2] & (2**32 - 1)).to_bytes(4, "little")
+    )
+    for i, byte in enumerate(len(data).to_bytes(8, "little")):
+        digest[12 + i] ^= byte
+    return base64.b64encode(digest).decode("ascii")
+
+
+def test_empty_input() -> None:
+    assert quickxorhash(b"") == "AAAAAAAAAAAAAAAAAAAAAAAAAAA="
+
+
+@pytest.mark.parametrize("size", [1, 7, 8, 159, 160, 161, 320, 1000, 4096, 65537])
+def test_matches_reference(size: int) -> None:
+    data = random.Random(size).randbytes(size)
+    assert quickxorhash(data) == _reference_quickxorhash(data)
+
+
+def test_chunked_updates_match_reference_on_3mb_input() -> None:
+    rng = random.Random(3)
+    data = rng.randbytes(3 * 1024 * 1024 + 17)
+    expected = _reference_quickxorhash(data)
+
+    assert quickxorhash(data) == expected
+
+    # Uneven chunk sizes, including empty ones and ones shorter than a block
+    h = QuickXorHash()
+    start = 0
+    while start < len(data):
+        size = rng.choice([0, 1, 11, 159, 160, 4093, 65536, 1 << 20])
+        h.update(memoryview(data)[start : start + size])
+        start += size
+    assert h.base64digest() == expected
+    assert h.hexdigest() == base64.b64decode(expected).hex()
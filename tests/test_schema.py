@@ -0,0 +1,127 @@
+"""Tests that schema.sql and the migrations describe the same database."""
+
+import re
+from collections import deque
+from pathlib import Path
+
+import apsw
+import pytest
+
+DATABASE_DIR = Path(__file__).parent.parent / "database"
+STATS_MIGRATIONS = ("007_stats.sql", "009_document_stats_when.sql")
+
+_STATS_OBJECTS_SQL = """
+    SELECT type, name, sql FROM sqlite_master
+    WHERE name = 'stats' OR (type = 'trigger' AND name LIKE '%\\_stats\\_%' ESCAPE '\\')
+    ORDER BY type, name
+"""
+
+_STATS_AGGREGATES = {
+    "document_count": "SELECT COUNT(*) FROM document WHERE is_deleted = 0",
+    "document_size": "SELECT COALESCE(SUM(file_size), 0) FROM document WHERE is_deleted = 0",
+    "document_count_all": "SELECT COUNT(*) FROM document",
+    "document_size_all": "SELECT COALESCE(SUM(file_size), 0) FROM document",
+    "blob_count": "SELECT COUNT(*) FROM file_blob",
+    "blob_size": "SELECT COALESCE(SUM(file_size), 0) FROM file_blob",
+}
+
+
+def _run_script(db: apsw.Connection, path: Path) -> None:
+    deque(db.execute(path.read_text()), maxlen=0)
+
+
+def _stats_objects(db: apsw.Connection) -> list[tuple[str, str, str]]:
+    """The stats table and its triggers, with whitespace normalised."""
+    return [
+        (kind, name, re.sub(r"\s+", " ", sql).strip())
+        for kind, name, sql in db.execute(_STATS_OBJECTS_SQL)
+    ]
+
+
+def _insert_rows(db: apsw.Connection) -> None:
+    db.execute(
+        """
+        INSERT INTO file_blob (sha256_hash, file_size, mime_type, reference_count, created_at)
+        VALUES ('a', 10, 'text/plain', 1, ''), ('b', 32, 'text/plain', 2, '')
+        """
+    )
+    db.execute(
+        """
+        INSERT INTO document (sharepoint_item_id, sharepoint_drive_id, name, path, file_size,
+                              is_deleted, synced_at, created_at, updated_at)
+        VALUES ('1', 'd', 'a', '/a', 100, 0, '', '', ''),
+               ('2', 'd', 'b', '/b', NULL, 0, '', '', ''),
+               ('3', 'd', 'c', '/c', 7, 1, '', '', '')
+        """
+    )
+
+
+@pytest.fixture
+def fresh_db(tmp_path: Path) -> apsw.Connection:
+    db = apsw.Connection(str(tmp_path / "fresh.sqlite3"))
+    _run_script(db, DATABASE_DIR / "schema.sql")
+    return db
+
+
+@pytest.fixture
+def migrated_db(tmp_path: Path) -> apsw.Connection:
+    """schema.sql with the stats objects removed, existing rows, then the stats migrations."""
+    db = apsw.Connection(str(tmp_path / "migrated.sqlite3"))
+    _run_script(db, DATABASE_DIR / "schema.sql")
+    for kind, name, _ in _stats_objects(db):
+        db.execute(f"DROP {kind} {name}")
+    _insert_rows(db)
+    for migration in STATS_MIGRATIONS:
+        _run_script(db, DATABASE_DIR / "migrations" / migration)
+    return db
+
+
+def test_schema_and_migration_define_the_same_stats_objects(
+    fresh_db: apsw.Connection, migrated_db: apsw.Connection
+) -> None:
+    objects = _stats_objects(fresh_db)
+    assert [name for _, name, _ in objects] == [
+        "stats",
+        "document_stats_ad",
+        "document_stats_ai",
+        "document_stats_au",
+        "file_blob_stats_ad",
+        "file_blob_stats_ai",
+        "file_blob_stats_au",
+    ]
+    assert _stats_objects(migrated_db) == objects
+
+
+@pytest.mark.parametrize("db_fixture", ["fresh_db", "migrated_db"])
+def test_stats_match_aggregates(db_fixture: str, request: pytest.FixtureRequest) -> None:
+    db: apsw.Connection = request.getfixturevalue(db_fixture)
+    if db_fixture == "fresh_db":
+        _insert_rows(db)
+    # Rows inserted before the migration are backfilled, later ones go through the triggers
+    db.execute("UPDATE document SET is_deleted = 1 - is_deleted, file_size = 5 WHERE path = '/b'")
+    db.execute("DELETE FROM file_blob WHERE sha256_hash = 'a'")
+
+    stats = dict(db.execute("SELECT key, value FROM stats"))
+    assert stats == {key: next(db.execute(query))[0] for key, query in _STATS_AGGREGATES.items()}
+
+
+@pytest.mark.parametrize("db_fixture", ["fresh_db", "migrated_db"])
+def test_document_update_leaves_stats_alone(
+    db_fixture: str, request: pytest.FixtureRequest
+) -> None:
+    db: apsw.Connection = request.getfixturevalue(db_fixture)
+    if db_fixture == "fresh_db":
+        _insert_rows(db)
+
+    def changes(sql: str) -> int:
+        """Rows changed by *sql*, counting the ones its triggers touch."""
+        before = db.totalchanges()
+        db.execute(sql)
+        return db.totalchanges() - before
+
+    # Document.update() sets every column; unchanged is_deleted/file_size must not touch stats
+    rename_only = changes("UPDATE document SET name = 'x' WHERE id = 1")
+    full_update = changes(
+        "UPDATE document SET name = 'y', is_deleted = 0, file_size = 100 WHERE id = 1"
+    )
+    assert full_update == rename_only
@@ -0,0 +1,91 @@
+"""Tests for staging content and storing it as deduplicated blobs."""
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from sharepoint_mirror.models import FileBlob
+from sharepoint_mirror.quickxorhash import quickxorhash
+from sharepoint_mirror.services import StorageService
+
+pytestmark = pytest.mark.usefixtures("app_ctx")
+
+
+def _tmp_files(storage: StorageService) -> list[Path]:
+    return list((storage.blobs_directory / ".tmp").iterdir())
+
+
+def test_stage_hashes_content() -> None:
+    storage = StorageService()
+    chunks = [b"hello ", b"world" * 1000]
+    content = b"".join(chunks)
+
+    staged = storage.stage(chunks, quickxor=True)
+
+    assert staged.sha256_hash == hashlib.sha256(content).hexdigest()
+    assert staged.quickxor_hash == quickxorhash(content)
+    assert staged.size == len(content)
+    assert staged.head == content
+    assert staged.path.read_bytes() == content
+
+    storage.discard(staged)
+    assert _tmp_files(storage) == []
+
+
+def test_store_staged_moves_file_into_place() -> None:
+    storage = StorageService()
+    staged = storage.stage([b"content"])
+
+    blob = storage.store_staged(staged, "text/plain")
+
+    assert blob.reference_count == 1
+    assert blob.sha256_hash == staged.sha256_hash
+    assert (blob.file_size, blob.mime_type) == (7, "text/plain")
+    assert storage.get_content(blob) == b"content"
+    assert storage.get_blob_path(blob) == blob.get_path()
+    assert not staged.path.exists()
+    assert _tmp_files(storage) == []
+
+
+def test_store_staged_duplicate_bumps_reference_count() -> None:
+    storage = StorageService()
+    first = storage.store_staged(storage.stage([b"same"]), "text/plain")
+    duplicate = storage.stage([b"sa", b"me"])
+
+    blob = storage.store_staged(duplicate, "text/plain")
+
+    assert blob.id == first.id
+    assert blob.reference_count == 2
+    assert not duplicate.path.exists()
+    assert _tmp_files(storage) == []
+    assert FileBlob.count_all() == 1
+
+
+def test_delete_blob_removes_file_with_last_reference() -> None:
+    storage = StorageService()
+    storage.store_staged(storage.stage([b"shared"]), "text/plain")
+    blob = storage.store_staged(storage.stage([b"shared"]), "text/plain")
+    path = storage.get_blob_path(blob)
+
+    assert not storage.delete_blob(blob)
+    assert path.exists()
+    assert storage.delete_blob(blob)
+    assert not path.exists()
+    assert FileBlob.get_by_hash(blob.sha256_hash) is None
+    # Emptied fan-out directories are removed too
+    assert not path.parent.exists()
+
+
+def test_verify_integrity_reports_problems() -> None:
+    storage = StorageService()
+    assert storage.verify_integrity() == []
+
+    blob = storage.store_staged(storage.stage([b"original"]), "text/plain")
+    storage.get_blob_path(blob).write_bytes(b"tampered")
+    orphan = storage.blobs_directory / "ab" / "cd" / ("abcd" + "0" * 60)
+    orphan.parent.mkdir(parents=True)
+    orphan.write_bytes(b"orphan")
+
+    issues = {issue["type"]: issue["hash"] for issue in storage.verify_integrity()}
+    assert issues == {"hash_mismatch": blob.sha256_hash, "orphaned_file": orphan.name}
@@ -0,0 +1,89 @@
+"""Tests for SyncService run counters, against a fake SharePoint client."""
+
+from collections.abc import Iterator
+
+import pytest
+
+from sharepoint_mirror.models import SyncRun
+from sharepoint_mirror.quickxorhash import quickxorhash
+from sharepoint_mirror.services import StorageService, SyncService
+from sharepoint_mirror.services.sharepoint import Drive, DriveItem
+
+pytestmark = pytest.mark.usefixtures("app_ctx")
+
+
+class FakeSharePointClient:
+    """One drive whose delta always returns the current items."""
+
+    def __init__(self) -> None:
+        self.items: list[DriveItem] = []
+        self.content: dict[str, bytes] = {}
+
+    def get_drives(self) -> list[Drive]:
+        return [Drive("drive", "Documents", None)]
+
+    def get_drive_by_name(self, name: str) -> Drive | None:
+        return next((d for d in self.get_drives() if d.name == name), None)
+
+    def iter_drive_items_delta(
+        self, drive_id: str, delta_link: str | None
+    ) -> Iterator[tuple[list[DriveItem], str]]:
+        yield list(self.items), "delta-link"
+
+    def iter_file_by_url(self, url: str) -> Iterator[bytes]:
+        yield self.content[url]
+
+    def get_item_fields(self, drive_id: str, item_id: str) -> dict:
+        return {}
+
+
+def _item(path: str, content: bytes, modified_at: str) -> DriveItem:
+    return DriveItem(
+        id="item-1",
+        name=path.rsplit("/", 1)[1],
+        path=path,
+        is_folder=False,
+        size=len(content),
+        mime_type="text/plain",
+        web_url=None,
+        created_by=None,
+        last_modified_by=None,
+        created_at="2024-01-01T00:00:00Z",
+        modified_at=modified_at,
+        quickxor_hash=quickxorhash(content),
+        download_url=f"https://download/{modified_at}",
+    )
+
+
+@pytest.fixture
+def client() -> FakeSharePointClient:
+    return FakeSharePointClient()
+
+
+def _sync(client: FakeSharePointClient, *items: DriveItem) -> SyncRun:
+    client.items = list(items)
+    for item in items:
+        client.content[item.download_url] = b"hello"
+    run = SyncService(sharepoint_client=client, storage_service=StorageService()).run_sync()
+    return SyncRun.get_by_id(run.id)
+
+
+def _counts(run: SyncRun) -> tuple[int, int, int]:
+    return run.files_added, run.files_modified, run.files_unchanged
+
+
+def test_same_hash_counts_as_unchanged(client: FakeSharePointClient) -> None:
+    assert _counts(_sync(client, _item("/a.txt", b"hello", "t1"))) == (1, 0, 0)
+    assert _counts(_sync(client, _item("/a.txt", b"hello", "t2"))) == (0, 0, 1)
+
+
+@pytest.mark.parametrize(
+    ("modified_at", "expected"),
+    [("t1", (0, 1, 0)), ("t2", (0, 0, 1))],
+    ids=["rename", "rename-and-touch"],
+)
+def test_rename_is_counted_once(
+    client: FakeSharePointClient, modified_at: str, expected: tuple[int, int, int]
+) -> None:
+    _sync(client, _item("/a.txt", b"hello", "t1"))
+    assert _counts(_sync(client, _item("/b.txt", b"hello", modified_at))) == expected
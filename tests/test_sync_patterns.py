@@ -0,0 +1,102 @@
+"""Tests for SYNC_PATH_PATTERNS glob compilation."""
+
+import re
+from fnmatch import fnmatch, translate
+from pathlib import PurePosixPath
+
+import pytest
+
+from sharepoint_mirror.services.sync import _glob_to_regex
+
+PATHS = [
+    "/report.pdf",
+    "/drafts/report.pdf",
+    "/Projects/report.pdf",
+    "/Projects/Active/report.pdf",
+    "/Projects/Active/drafts/report.pdf",
+    "/Projects/Active/drafts/old/report.pdf",
+    "/Projects/Archive/2023/summary.txt",
+    "/Archive/notes.txt",
+    "/a/b/c/d/e.docx",
+    "/a/b/archive/x.pdf",
+    "/weird[name]/file.pdf",
+    "/dots/.hidden",
+]
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        "drafts/*.pdf",
+        "Active/*/*.pdf",
+        "/Projects/*/report.pdf",
+        "/report.pdf",
+        "/*.pdf",
+        "*/archive/*",
+        "Projects/Archive/????/*.txt",
+        "[AP]*/*.txt",
+        "/[!P]*/*.txt",
+        "b/*/x.pdf",
+        "dots/*",
+    ],
+)
+def test_patterns_without_double_star_match_like_purepath(pattern: str) -> None:
+    regex = _glob_to_regex(pattern)
+    for path in PATHS:
+        pure = PurePosixPath(path)
+        # Python versions disagree on whether a relative pattern longer than the
+        # path may match the root; the sync never relied on that case
+        if not pattern.startswith("/") and pattern.count("/") + 1 > len(pure.parts) - 1:
+            continue
+        assert (regex.fullmatch(path) is not None) == pure.match(pattern), (pattern, path)
+
+
+@pytest.mark.parametrize(
+    ("pattern", "matches"),
+    [
+        (
+            "**/drafts/**",
+            {
+                "/drafts/report.pdf",
+                "/Projects/Active/drafts/report.pdf",
+                "/Projects/Active/drafts/old/report.pdf",
+            },
+        ),
+        (
+            "/Projects/**",
+            {
+                "/Projects/report.pdf",
+                "/Projects/Active/report.pdf",
+                "/Projects/Active/drafts/report.pdf",
+                "/Projects/Active/drafts/old/report.pdf",
+                "/Projects/Archive/2023/summary.txt",
+            },
+        ),
+        ("/Projects/**/*.txt", {"/Projects/Archive/2023/summary.txt"}),
+        ("**/*.txt", {"/Projects/Archive/2023/summary.txt", "/Archive/notes.txt"}),
+        ("a/**/e.docx", {"/a/b/c/d/e.docx"}),
+        ("/**/archive/*", {"/a/b/archive/x.pdf"}),
+    ],
+)
+def test_double_star_matches_any_number_of_folders(pattern: str, matches: set[str]) -> None:
+    regex = _glob_to_regex(pattern)
+    assert {path for path in PATHS if regex.fullmatch(path)} == matches
+
+
+def test_single_star_stays_within_one_segment() -> None:
+    assert not _glob_to_regex("/Projects/*.pdf").fullmatch("/Projects/Active/report.pdf")
+    assert not _glob_to_regex("/Projects/?/x.pdf").fullmatch("/Projects/a/b/x.pdf")
+
+
+def test_unclosed_bracket_is_literal() -> None:
+    regex = _glob_to_regex("/weird[name/*")
+    assert regex.fullmatch("/weird[name/file.pdf")
+    assert not regex.fullmatch("/weirdn/file.pdf")
+
+
+@pytest.mark.parametrize("pattern", ["*.pdf", "report?.pdf", "*.[tT][xX][tT]", "[!.]*", ".*"])
+def test_filename_patterns_match_like_fnmatch(pattern: str) -> None:
+    regex = re.compile(translate(pattern))
+    for path in PATHS:
+        name = PurePosixPath(path).name
+        assert (regex.match(name) is not None) == fnmatch(name, pattern), (pattern, name)
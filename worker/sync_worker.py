@@ -2,6 +2,7 @@
 
 import logging
 import signal
+import threading
 import time
 from datetime import UTC, datetime
 
@@ -11,13 +12,12 @@ logging.basicConfig(
 )
 log = logging.getLogger("sharepoint_mirror.worker")
 
-_running = True
+_stop = threading.Event()
 
 
 def _handle_signal(signum: int, frame: object) -> None:
-    global _running
     log.info("Received signal %s, shutting down...", signum)
-    _running = False
+    _stop.set()
 
 
 signal.signal(signal.SIGINT, _handle_signal)
@@ -26,20 +26,18 @@ signal.signal(signal.SIGTERM, _handle_signal)
 
 def _recover_stuck_runs() -> None:
     """Mark any running sync_run records as failed (from a previous crash)."""
-    from sharepoint_mirror.db import get_db, transaction
+    from sharepoint_mirror.db import transaction
 
-    cursor = get_db().cursor()
-    cursor.execute("SELECT COUNT(*) FROM sync_run WHERE status = 'running'")
-    row = cursor.fetchone()
-    stuck = int(row[0]) if row else 0
-    if stuck:
-        with transaction() as cur:
+    with transaction() as cur:
+        stuck = len(
             cur.execute(
                 "UPDATE sync_run SET status = 'failed', "
                 "completed_at = ?, error_message = 'Interrupted (recovered on worker startup)' "
-                "WHERE status = 'running'",
+                "WHERE status = 'running' RETURNING id",
                 (datetime.now(UTC).isoformat(),),
-            )
+            ).fetchall()
+        )
+    if stuck:
         log.info("Recovered %d stuck sync run(s)", stuck)
 
 
@@ -64,7 +62,7 @@ def run() -> None:
         metadata_interval,
     )
 
-    while _running:
+    while not _stop.is_set():
         with app.app_context():
             try:
                 from sharepoint_mirror.models import SyncRun
@@ -100,11 +98,8 @@ def run() -> None:
             except Exception:
                 log.exception("Error in sync worker loop")
 
-        # Sleep in small increments so we can respond to signals
-        for _ in range(interval * 10):
-            if not _running:
-                break
-            time.sleep(0.1)
+        # Wait out the interval, waking immediately on a shutdown signal
+        _stop.wait(interval)
 
     log.info("Sync worker stopped.")
 